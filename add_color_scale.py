@@ -2,12 +2,16 @@
 """
 Excel 色阶添加脚本
 功能：为指定Excel文件的sheet1中指定范围的单元格添加色阶
+      CSV文件以流式方式写为xlsx并添加色阶（适用于百万行级别的导出文件）
 """
 
 import argparse
 import sys
+from pathlib import Path
 from openpyxl import load_workbook
 from openpyxl.formatting.rule import ColorScaleRule
+from utils.color_schemes import get_scheme_registry
+from utils.csv_color_writer import stream_csv_with_color_scale
 
 
 def add_color_scale(file_path, cell_range):
@@ -64,6 +68,46 @@ def add_color_scale(file_path, cell_range):
         sys.exit(1)
 
 
+def add_color_scale_to_csv(file_path, cell_range, scale_type, color_scheme):
+    """
+    为CSV文件流式生成带色阶的xlsx
+
+    Args:
+        file_path: CSV文件路径
+        cell_range: 单元格范围，None则自动识别数值列
+        scale_type: 色阶类型
+        color_scheme: 色彩方案
+    """
+    registry = get_scheme_registry()
+    error = registry.validate(scale_type, color_scheme)
+    if error:
+        print(f"错误: {error}")
+        sys.exit(1)
+
+    path = Path(file_path)
+    output_file = str(path.parent / f"{path.stem}_colored.xlsx")
+    try:
+        print(f"正在流式转换文件: {file_path}")
+        result = stream_csv_with_color_scale(
+            file_path,
+            output_file,
+            lambda applied_range: [(applied_range, registry.build_rule(scale_type, color_scheme))],
+            cell_range
+        )
+    except FileNotFoundError:
+        print(f"错误: 找不到文件 '{file_path}'")
+        sys.exit(1)
+    except Exception as e:
+        print(f"错误: {str(e)}")
+        sys.exit(1)
+
+    if not result["applied_range"]:
+        print("错误: CSV中没有找到数值数据")
+        sys.exit(1)
+
+    print(f"✓ 完成！共 {result['total_rows']} 行，已为 {result['applied_range']} 添加色阶并保存到 {output_file}")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='为Excel文件的Sheet1添加色阶',
@@ -72,15 +116,26 @@ def main():
 示例:
   python add_color_scale.py Spend_Chart_Daily.xlsx B2:E10
   python add_color_scale.py data.xlsx A1:Z100
+  python add_color_scale.py export.csv                  # 自动识别数值列
+  python add_color_scale.py export.csv B2:E1000000 --scale-type two_color --color-scheme green_red
         """
     )
 
-    parser.add_argument('file', help='Excel文件路径')
-    parser.add_argument('range', help='单元格范围，格式如 A1:D10')
+    parser.add_argument('file', help='Excel或CSV文件路径')
+    parser.add_argument('range', nargs='?', help='单元格范围，格式如 A1:D10（CSV可省略，自动识别数值列）')
+    parser.add_argument('--scale-type', default='three_color', choices=get_scheme_registry().scale_types(),
+                        help='色阶类型（仅CSV），默认 three_color')
+    parser.add_argument('--color-scheme', default='red_yellow_green',
+                        help='色彩方案（仅CSV），默认 red_yellow_green')
 
     args = parser.parse_args()
 
-    add_color_scale(args.file, args.range)
+    if Path(args.file).suffix.lower() == '.csv':
+        add_color_scale_to_csv(args.file, args.range, args.scale_type, args.color_scheme)
+    else:
+        if not args.range:
+            parser.error('Excel文件需要指定单元格范围')
+        add_color_scale(args.file, args.range)
 
 
 if __name__ == '__main__':
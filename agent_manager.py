@@ -4,9 +4,98 @@ Agent管理器
 """
 from strands import Agent
 from strands.models.bedrock import BedrockModel
-from typing import List, Dict, Any, Iterator
-from tools.analyze_excel_tool import analyze_excel
+from strands.tools.executors import ConcurrentToolExecutor
+from strands.types.exceptions import ModelThrottledException
+import ast
+import json
+import os
+import time
+from typing import List, Dict, Any, Iterator, Optional
+from tools.analyze_excel_tool import analyze_all, analyze_excel
 from tools.color_scale_tool import apply_color_scale
+from tools.range_stats_tool import summarize_range
+from tools.revise_color_scale_tool import revise_color_scale
+from utils.rate_limiter import AdmissionLimiter, LimiterPool
+from utils.system_prompt import create_default_system_prompt  # noqa: F401  保留原导入路径
+from utils.tool_result import from_compact, is_compact
+
+
+# Bedrock调用准入控制参数（进程内按model_id共享，可通过环境变量调整）
+MODEL_RATE_PER_SECOND = float(os.environ.get("BEDROCK_RATE_PER_SECOND", "2"))
+MODEL_BURST = int(os.environ.get("BEDROCK_BURST", "4"))
+MODEL_MAX_CONCURRENCY = int(os.environ.get("BEDROCK_MAX_CONCURRENCY", "8"))
+
+# 单个会话的调用速率上限，避免个别会话占满模型配额
+SESSION_RATE_PER_SECOND = float(os.environ.get("SESSION_RATE_PER_SECOND", "0.5"))
+SESSION_BURST = int(os.environ.get("SESSION_BURST", "3"))
+
+# 进程内保留的会话限流器数量上限，超出后淘汰最久未使用的空闲会话
+SESSION_LIMITER_CACHE_SIZE = int(os.environ.get("SESSION_LIMITER_CACHE_SIZE", "1000"))
+
+_model_limiters = LimiterPool(lambda: AdmissionLimiter(
+    rate_per_second=MODEL_RATE_PER_SECOND,
+    burst=MODEL_BURST,
+    max_concurrency=MODEL_MAX_CONCURRENCY
+))
+_session_limiters = LimiterPool(lambda: AdmissionLimiter(
+    rate_per_second=SESSION_RATE_PER_SECOND,
+    burst=SESSION_BURST,
+    max_concurrency=1
+), max_size=SESSION_LIMITER_CACHE_SIZE)
+
+
+def get_model_limiter(model_id: str) -> AdmissionLimiter:
+    """获取model_id对应的共享限流器"""
+    return _model_limiters.get(model_id)
+
+
+def get_session_limiter(session_id: str) -> AdmissionLimiter:
+    """获取会话对应的限流器"""
+    return _session_limiters.get(session_id)
+
+
+def estimate_model_wait(model_id: str, session_id: Optional[str] = None) -> float:
+    """估算新一轮对话开始调用模型前的排队时间（秒）"""
+    wait = get_model_limiter(model_id).estimate_wait()
+    if session_id:
+        wait = max(wait, get_session_limiter(session_id).estimate_wait())
+    return wait
+
+
+class RateLimitedBedrockModel(BedrockModel):
+    """
+    带准入控制的BedrockModel
+
+    每次模型调用前依次获取会话和模型的许可；被限流时通知限流器退避后重新抛出，
+    由Strands的重试机制重试（重试时同样经过准入控制）
+    """
+
+    def __init__(self, *args, limiters: Optional[List[AdmissionLimiter]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limiters = limiters or []
+
+    async def stream(self, *args, **kwargs):
+        acquired = []
+        started = None
+        try:
+            for limiter in self.limiters:
+                await limiter.acquire()
+                acquired.append(limiter)
+
+            started = time.monotonic()
+            async for event in super().stream(*args, **kwargs):
+                yield event
+        except ModelThrottledException:
+            for limiter in self.limiters:
+                limiter.on_throttle()
+            raise
+        else:
+            for limiter in self.limiters:
+                limiter.on_success()
+        finally:
+            elapsed = None if started is None else time.monotonic() - started
+            for limiter in acquired:
+                limiter.release(elapsed)
 
 
 class ExcelColorAgent:
@@ -19,7 +108,9 @@ class ExcelColorAgent:
         selected_tools: List[str],
         scale_type: str = "three_color",
         color_scheme: str = "red_yellow_green",
-        max_tokens: int = 4096
+        max_tokens: int = 4096,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        session_id: Optional[str] = None
     ):
         """
         初始化Agent
@@ -31,6 +122,8 @@ class ExcelColorAgent:
             scale_type: 色阶类型
             color_scheme: 色彩方案
             max_tokens: 最大输出token数
+            messages: 可选的历史消息（Worker进程中恢复会话时使用）
+            session_id: 可选的会话ID，用于按会话限流
         """
         self.model_id = model_id
         self.scale_type = scale_type
@@ -43,25 +136,34 @@ class ExcelColorAgent:
         # 创建可用工具
         self.available_tools = {
             "analyze_excel": analyze_excel,
-            "apply_color_scale": apply_color_scale
+            "analyze_all": analyze_all,
+            "apply_color_scale": apply_color_scale,
+            "revise_color_scale": revise_color_scale,
+            "summarize_range": summarize_range
         }
 
         # 根据选择构建工具列表
         tools = [self.available_tools[tool_name] for tool_name in selected_tools if tool_name in self.available_tools]
 
-        # 创建Bedrock模型
-        model = BedrockModel(
+        # 创建Bedrock模型（同一model_id的所有会话共享限流器）
+        limiters = [get_model_limiter(model_id)]
+        if session_id:
+            limiters.insert(0, get_session_limiter(session_id))
+        model = RateLimitedBedrockModel(
             model_id=model_id,
             max_tokens=self.max_tokens,  # 使用配置的最大输出token数
-            temperature=0.7              # 设置温度参数
+            temperature=0.7,             # 设置温度参数
+            limiters=limiters
         )
 
-        # 创建Agent
+        # 创建Agent（同一轮中的多个工具调用并发执行，写同一输出文件的调用由工具内部串行化）
         self.agent = Agent(
             name="excel_color_agent",
             model=model,
             system_prompt=full_system_prompt,
-            tools=tools
+            tools=tools,
+            tool_executor=ConcurrentToolExecutor(),
+            messages=messages
         )
 
     def _build_system_prompt(self, base_prompt: str, scale_type: str, color_scheme: str) -> str:
@@ -107,56 +209,75 @@ class ExcelColorAgent:
             yield chunk
 
 
-def create_default_system_prompt() -> str:
-    """创建默认的system prompt"""
-    return """你是一个Excel数据处理专家助手，帮助用户为Excel表格添加色阶。
-
-你有以下工具：
-1. analyze_excel: 分析Excel文件结构，返回sheet信息和数据预览
-2. apply_color_scale: 为指定范围应用色阶
-
-**重要提示：用户已上传的Excel文件会自动传递给工具，你不需要提供file_path参数。**
-
-工作流程：
-1. 用户上传文件后，主动调用 analyze_excel 工具分析文件
-   - **不需要**传递file_path参数，已上传的文件会自动使用
-   - 只需传递 sheet_name（可选）和 preview_rows（可选）
-2. 仔细查看返回的 preview_rows 数据（前100行），判断：
-   - 哪一行是表头（通常是文本标签）
-   - 从哪一行开始是数值数据
-   - 哪些列包含需要刷色阶的数据（数值列）
-3. 根据用户需求（如"为Sheet1数据刷色阶"）和分析结果，确定：
-   - sheet_name: 用户指定的sheet
-   - cell_range: 数据范围（格式：B2:E150，要跳过表头）
-4. 调用 apply_color_scale 工具应用色阶
-   - **不需要**传递file_path参数，已上传的文件会自动使用
-   - 必需参数：sheet_name, cell_range, scale_type, color_scheme
-5. 完成后告知用户具体应用的范围和单元格数量
-
-注意事项：
-- 表头通常是第一行或多行，包含列标签文本
-- 数据区是纯数字的行，表头之后开始
-- 如果分析结果不清晰（如空行很多、数据分散），询问用户确认范围
-- 透视表通常左上角有多层表头，要小心识别
-- 必须跳过表头，只为数据单元格刷色阶
-- 只为包含数值的列应用色阶，文本列不适合
-
-示例对话：
-用户：为Sheet1的数据刷色阶
-
-你的操作：
-1. 调用 analyze_excel() - 不传file_path，系统会自动使用已上传的文件
-2. 查看 preview_rows，判断第1行是表头（包含"日期"、"金额"等文字）
-3. 判断第2行开始是数据（包含日期和数字）
-4. 确定数值列（如B、C、D列是金额数据）
-5. 调用 apply_color_scale(sheet_name="Sheet1", cell_range="B2:D100", scale_type="...", color_scheme="...")
-   - 跳过A列的日期，只刷数值列
-   - 不传file_path参数
-6. 告知用户已完成
-
-重要：
-- **从不要求用户提供文件路径**，文件已经上传到系统中
-- 在调用 apply_color_scale 时，scale_type 和 color_scheme 参数会根据用户在界面左侧栏的选择自动设置
-- 工具调用示例：analyze_excel() 或 analyze_excel(sheet_name="Sheet1")
-- 工具调用示例：apply_color_scale(sheet_name="Sheet1", cell_range="B2:D100", scale_type="three_color", color_scheme="red_yellow_green")
-"""
+def _parse_tool_output(tool_result: Dict[str, Any]) -> Any:
+    """从toolResult块中取出工具输出，字符串形式的输出尽量解析为字典"""
+    content = tool_result.get("content", [])
+    if not content:
+        return None
+
+    # content 是一个列表，通常第一个元素包含结果；可能是 {"json": {...}} 或 {"text": "..."}
+    first_content = content[0] if isinstance(content, list) else content
+    if isinstance(first_content, dict):
+        if "json" in first_content:
+            tool_output = first_content["json"]
+        elif "text" in first_content:
+            tool_output = first_content["text"]
+        else:
+            tool_output = first_content
+    else:
+        tool_output = first_content
+
+    if isinstance(tool_output, str):
+        try:
+            tool_output = json.loads(tool_output)
+        except ValueError:
+            try:
+                tool_output = ast.literal_eval(tool_output)
+            except (ValueError, SyntaxError):
+                pass  # 保持字符串
+
+    # 工具返回的精简格式还原为完整键名，界面按完整键名展示
+    if is_compact(tool_output):
+        tool_output = from_compact(tool_output)
+    return tool_output
+
+
+def extract_tool_calls(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    从消息历史中提取工具调用及其输出
+
+    Args:
+        messages: Agent的完整消息历史
+
+    Returns:
+        [{"name": ..., "input": ..., "output": ..., "tool_use_id": ...}, ...]
+    """
+    tool_calls = []
+    tool_use_map = {}  # 映射 toolUseId 到工具调用索引
+
+    for msg in messages or []:
+        # 注意：键名是 toolUse / toolResult (驼峰)
+        if msg.get("role") == "assistant":
+            for block in msg.get("content", []):
+                if "toolUse" in block:
+                    tool_use = block["toolUse"]
+                    tool_use_id = tool_use.get("toolUseId", "")
+                    tool_calls.append({
+                        "name": tool_use.get("name", ""),
+                        "input": tool_use.get("input", {}),
+                        "output": None,
+                        "tool_use_id": tool_use_id
+                    })
+                    if tool_use_id:
+                        tool_use_map[tool_use_id] = len(tool_calls) - 1
+
+        # 工具结果在 role=user 的消息中
+        elif msg.get("role") == "user":
+            for block in msg.get("content", []):
+                if "toolResult" in block:
+                    tool_result = block["toolResult"]
+                    tool_use_id = tool_result.get("toolUseId", "")
+                    if tool_use_id in tool_use_map:
+                        tool_calls[tool_use_map[tool_use_id]]["output"] = _parse_tool_output(tool_result)
+
+    return tool_calls
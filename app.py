@@ -3,11 +3,16 @@ Excel色阶处理Agent - Streamlit应用
 """
 import streamlit as st
 import uuid
-import json
-import asyncio
 from pathlib import Path
-from agent_manager import ExcelColorAgent, create_default_system_prompt
+from typing import Any, Dict, Optional, Tuple
+# 首次渲染只导入轻量模块；agent_manager、色阶预览等重依赖在用到时导入（见utils/lazy_modules.py）
+from utils.async_runtime import get_background_loop
+from utils.color_schemes import get_scheme_registry
 from utils.file_manager import FileManager
+from utils.job_queue import get_job_queue_from_env, job_wait_timeout_from_env
+from utils.lazy_modules import AGENT_MODULES, PREVIEW_MODULES, preload
+from utils.session_files import session_file_index
+from utils.system_prompt import create_default_system_prompt
 
 # 页面配置
 st.set_page_config(
@@ -16,6 +21,82 @@ st.set_page_config(
     layout="wide"
 )
 
+# ========== 缓存 ==========
+# 进程级资源用cache_resource（所有会话共享同一实例）；数据用cache_data，以文件内容哈希为键并限制TTL和条目数，
+# 文件内容变化后哈希随之变化，不会取到旧结果。页面重跑时内容未变化的部分只需一次stat
+CACHE_TTL_SECONDS = 3600
+# 输出文件内容只缓存不超过该大小的文件，缓存总量不超过 条目数 × 该大小
+OUTPUT_CACHE_MAX_BYTES = 8 * 1024 * 1024
+OUTPUT_CACHE_ENTRIES = 16
+
+
+@st.cache_resource(show_spinner=False)
+def get_file_manager() -> FileManager:
+    """进程共享的文件管理器（输出登记表的内存索引按session划分）"""
+    return FileManager()
+
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    """进程共享的任务队列（每次操作单独连接数据库，可在各会话线程中使用）"""
+    return get_job_queue_from_env()
+
+
+@st.cache_data(show_spinner=False)
+def get_default_system_prompt() -> str:
+    return create_default_system_prompt()
+
+
+@st.cache_data(show_spinner=False)
+def get_scheme_labels(scale_type: str) -> Dict[str, str]:
+    """色彩方案的显示名称 -> 方案名（注册表只在首次加载时读取配置文件）"""
+    return get_scheme_registry().labels(scale_type)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=64, show_spinner=False)
+def get_workbook_layout(content_hash: str, _file_path: str) -> Dict[str, Tuple[int, int]]:
+    """文件的sheet列表和维度（按内容哈希缓存，同一文件在不同会话中只读取一次）"""
+    from utils.sheet_reader import read_workbook_layout
+
+    return read_workbook_layout(_file_path)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=OUTPUT_CACHE_ENTRIES, show_spinner=False)
+def _read_cached_output(content_hash: str, _file_path: str) -> bytes:
+    with open(_file_path, "rb") as f:
+        return f.read()
+
+
+def read_output_bytes(file_path: str) -> bytes:
+    """
+    输出文件内容（下载按钮使用，聊天历史中的下载按钮每次重跑都需要）
+
+    小文件按内容哈希缓存；超过OUTPUT_CACHE_MAX_BYTES的文件每次直接读取，不在进程缓存中常驻
+    """
+    if Path(file_path).stat().st_size > OUTPUT_CACHE_MAX_BYTES:
+        with open(file_path, "rb") as f:
+            return f.read()
+    return _read_cached_output(st.session_state.file_manager.compute_file_hash(file_path), file_path)
+
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=128, show_spinner=False)
+def get_color_preview(
+    content_hash: str,
+    _file_path: str,
+    sheet_name: str,
+    cell_range: str,
+    scale_type: str,
+    color_scheme: str,
+    column_schemes: Optional[Dict[str, str]],
+    mode: str,
+    robust: bool
+) -> Dict[str, Any]:
+    """色阶预览（按输出文件内容和规则参数缓存）"""
+    from utils.color_preview import build_color_preview
+
+    return build_color_preview(_file_path, sheet_name, cell_range, scale_type, color_scheme, column_schemes, mode, robust)
+
+
 # 初始化session state
 if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
@@ -26,14 +107,21 @@ if "messages" not in st.session_state:
 if "uploaded_files" not in st.session_state:
     st.session_state.uploaded_files = {}
 
+if "source_files" not in st.session_state:
+    st.session_state.source_files = {}
+
 if "agent" not in st.session_state:
     st.session_state.agent = None
 
 if "file_manager" not in st.session_state:
-    st.session_state.file_manager = FileManager()
+    st.session_state.file_manager = get_file_manager()
+
+# 队列模式（设置JOB_QUEUE_DB环境变量时启用）：Agent在Worker进程中运行，会话历史保存在UI中
+if "job_queue" not in st.session_state:
+    st.session_state.job_queue = get_job_queue()
 
-if "output_files" not in st.session_state:
-    st.session_state.output_files = []
+if "agent_history" not in st.session_state:
+    st.session_state.agent_history = []
 
 
 def reset_session():
@@ -47,13 +135,16 @@ def reset_session():
     st.session_state.session_id = str(uuid.uuid4())
     st.session_state.messages = []
     st.session_state.uploaded_files = {}
+    st.session_state.source_files = {}
     st.session_state.agent = None
-    st.session_state.output_files = []
+    st.session_state.agent_history = []
     st.rerun()
 
 
 def create_agent(model_id: str, system_prompt: str, tools: list, scale_type: str, color_scheme: str, max_tokens: int = 4096):
     """创建或更新Agent"""
+    from agent_manager import ExcelColorAgent
+
     try:
         agent = ExcelColorAgent(
             model_id=model_id,
@@ -61,7 +152,8 @@ def create_agent(model_id: str, system_prompt: str, tools: list, scale_type: str
             selected_tools=tools,
             scale_type=scale_type,
             color_scheme=color_scheme,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            session_id=st.session_state.session_id
         )
         st.session_state.agent = agent
         return True
@@ -80,6 +172,228 @@ def display_tool_call(tool_name: str, tool_input: dict, tool_output: dict):
         })
 
 
+def run_agent_turn_streaming(prompt: str, invocation_state: dict):
+    """在当前进程中流式运行一轮Agent对话，返回 (完整文本, 工具调用列表)"""
+    from agent_manager import estimate_model_wait, extract_tool_calls
+
+    # 调用Agent（流式输出）
+    collected_chunks = []
+    # 存储文本段落：[{"type": "text", "content": "..."}, {"type": "tool", "name": "..."}]
+    text_segments = []
+    text_placeholder = st.empty()
+
+    # 模型调用有共享的准入控制，排队较久时提示预计等待时间
+    estimated_wait = estimate_model_wait(st.session_state.agent.model_id, st.session_state.session_id)
+    if estimated_wait >= 1:
+        st.caption(f"⏳ 模型调用排队中，预计等待约 {estimated_wait:.0f} 秒")
+
+    # 在进程常驻的后台事件循环中运行Agent流，脚本线程轮询并渲染每个chunk
+    agent_stream = st.session_state.agent.stream(prompt, invocation_state=invocation_state)
+    try:
+        for chunk in get_background_loop().iterate(agent_stream):
+            # 收集所有chunk
+            collected_chunks.append(chunk)
+
+            # 检查是否是完整的message
+            if isinstance(chunk, dict) and "message" in chunk:
+                message = chunk["message"]
+                role = message.get("role")
+
+                # 处理assistant角色的消息
+                if role == "assistant":
+                    content_blocks = message.get("content", [])
+
+                    # 遍历content数组，按顺序处理text和toolUse
+                    for block in content_blocks:
+                        if "text" in block:
+                            # 显示文本
+                            text = block["text"]
+                            text_segments.append(
+                                {"type": "text", "content": text})
+                            st.markdown(text)
+
+                        elif "toolUse" in block:
+                            # 显示工具调用
+                            tool_use = block["toolUse"]
+                            tool_name = tool_use.get("name", "")
+                            text_segments.append(
+                                {"type": "tool", "name": tool_name})
+                            st.info(f"🔧 调用工具: {tool_name}")
+
+                # 处理user角色的消息（工具返回结果）
+                elif role == "user":
+                    content_blocks = message.get("content", [])
+
+                    for block in content_blocks:
+                        if "toolResult" in block:
+                            # 工具返回结果，可以选择显示或不显示
+                            # 这里我们不显示，因为通常工具结果会被agent处理后再输出给用户
+                            pass
+
+    except Exception as e:
+        # 已输出部分内容时保留（如多次限流重试后失败），避免整轮回复丢失
+        if not text_segments:
+            raise
+        st.warning(f"⚠️ 回复未完成，已保留已生成的内容: {str(e)}")
+
+    # 清除占位符（不需要了，因为已经在stream中直接显示）
+    text_placeholder.empty()
+
+    # 提取完整文本（从text_segments中）
+    full_response = "".join(
+        [seg["content"] for seg in text_segments if seg["type"] == "text"])
+
+    # 流式完成后获取完整消息历史
+    messages = st.session_state.agent.agent.messages if hasattr(
+        st.session_state.agent.agent, 'messages') else []
+
+    # 从消息历史中提取工具调用信息
+    return full_response, extract_tool_calls(messages)
+
+
+def run_agent_turn_in_worker(prompt: str, invocation_state: dict, agent_config: dict):
+    """
+    队列模式：将一轮Agent对话提交给Worker进程执行，等待结果
+
+    会话历史保存在session_state中，随任务一起发送给Worker，返回 (完整文本, 工具调用列表)
+    """
+    job_queue = st.session_state.job_queue
+    job_id = job_queue.enqueue("agent_turn", {
+        **agent_config,
+        "prompt": prompt,
+        "invocation_state": invocation_state,
+        "messages": st.session_state.agent_history
+    })
+
+    timeout = job_wait_timeout_from_env()
+    with st.spinner(f"任务已提交，排队中的任务: {job_queue.pending_count()} 个..."):
+        try:
+            job = job_queue.wait(job_id, timeout=timeout)
+        except TimeoutError:
+            # 标记失败，仍在排队时不会再被领取，执行中的Worker结束后也不会再写入结果
+            job_queue.cancel(job_id, "UI等待超时")
+            raise RuntimeError(f"任务在 {timeout:.0f} 秒内未完成，请稍后重试")
+
+    if job["status"] != "done":
+        raise RuntimeError(job.get("error") or "Worker执行失败")
+
+    result = job["result"]
+    st.session_state.agent_history = result["messages"]
+    if result["text"]:
+        st.markdown(result["text"])
+    return result["text"], result["tool_calls"]
+
+
+def display_color_previews(tool_calls: list):
+    """为本轮成功应用/修改的色阶渲染预览（只流式读取前若干行，无需下载文件）"""
+    for tool_call in tool_calls:
+        output = tool_call.get("output")
+        if not isinstance(output, dict) or not output.get("success") or not output.get("output_file"):
+            continue
+
+        if tool_call["name"] == "apply_color_scale":
+            rules = [{
+                "sheet_name": output["sheet_name"],
+                "cell_range": output["applied_range"],
+                "scale_type": output["scale_type"],
+                "color_scheme": output["color_scheme"],
+                "mode": output.get("mode", "range"),
+                "robust": output.get("robust", False),
+                "column_schemes": (tool_call.get("input") or {}).get("column_schemes")
+            }]
+        elif tool_call["name"] == "revise_color_scale":
+            rules = output.get("rules", [])
+        else:
+            continue
+
+        for rule in rules:
+            try:
+                preview = get_color_preview(
+                    st.session_state.file_manager.compute_file_hash(output["output_file"]),
+                    output["output_file"],
+                    rule["sheet_name"],
+                    rule["cell_range"],
+                    rule["scale_type"],
+                    rule["color_scheme"],
+                    rule.get("column_schemes"),
+                    rule.get("mode", "range"),
+                    rule.get("robust", False)
+                )
+            except Exception as e:
+                print(f"警告: 生成色阶预览失败: {e}")
+                continue
+
+            title = f"🎨 预览: {rule['sheet_name']}!{preview['preview_range']}"
+            if preview["truncated"]:
+                title += "（仅显示前部分，颜色按显示的数据近似计算）"
+            with st.expander(title, expanded=True):
+                st.markdown(preview["html"], unsafe_allow_html=True)
+
+
+def finalize_assistant_turn(full_response: str, tool_calls: list):
+    """展示工具调用和下载按钮，并保存助手消息"""
+    # 调试信息
+    print("\n" + "="*60)
+    print(f"DEBUG: 流式输出完成")
+    print(f"DEBUG: 文本长度: {len(full_response)}")
+    print(f"DEBUG: 工具调用数量: {len(tool_calls)}")
+    print("="*60)
+
+    # 显示工具调用
+    for tool_call in tool_calls:
+        display_tool_call(
+            tool_call["name"],
+            tool_call["input"],
+            tool_call.get("output", {})
+        )
+
+    # 色阶效果预览
+    display_color_previews(tool_calls)
+
+    # 本轮工具调用生成的输出文件（工具写入后登记在会话的输出登记表中，按工具调用ID直接查询）
+    output_file = st.session_state.file_manager.find_output_for_tool_calls(
+        st.session_state.session_id,
+        [tool_call.get("tool_use_id") for tool_call in tool_calls]
+    )
+    if output_file:
+        print(f"✅ 找到输出文件: {output_file}")
+
+    # 保存助手消息
+    assistant_message = {
+        "role": "assistant",
+        # 存储时也限制长度
+        "content": full_response[:500] if len(full_response) > 500 else full_response,
+        "tool_calls": tool_calls
+    }
+
+    # 显示下载按钮（在保存消息之前）
+    if output_file:
+        assistant_message["output_file"] = output_file
+
+        try:
+            file_data = read_output_bytes(output_file)
+            file_name = Path(output_file).name
+
+            # 使用session时间戳确保key唯一
+            import time
+            download_key = f"download_{int(time.time() * 1000)}"
+
+            st.download_button(
+                label=f"📥 下载处理后的文件: {file_name}",
+                data=file_data,
+                file_name=file_name,
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key=download_key
+            )
+        except FileNotFoundError:
+            st.warning(f"⚠️ 输出文件未找到: {output_file}")
+        except Exception as download_error:
+            st.error(f"生成下载按钮时出错: {str(download_error)}")
+
+    # 最后保存消息（确保前面的显示都完成）
+    st.session_state.messages.append(assistant_message)
+
+
 def extract_text_from_chunk(chunk):
     """从Strands流式chunk中提取文本"""
     if isinstance(chunk, dict) and "event" in chunk:
@@ -119,69 +433,9 @@ def process_agent_response(agent_result, agent_messages=None):
 
     # 从完整消息历史中提取工具调用信息
     if agent_messages:
-        tool_use_map = {}  # 映射 toolUseId 到工具调用索引
-
-        for msg in agent_messages:
-            # 提取工具调用
-            if msg.get("role") == "assistant":
-                for block in msg.get("content", []):
-                    # 注意：键名是 toolUse (驼峰) 不是 tool_use (下划线)
-                    if "toolUse" in block:
-                        tool_use = block["toolUse"]
-                        tool_use_id = tool_use.get("toolUseId", "")
-                        tool_call = {
-                            "name": tool_use.get("name", ""),
-                            "input": tool_use.get("input", {}),
-                            "output": None
-                        }
-                        result["tool_calls"].append(tool_call)
-                        if tool_use_id:
-                            tool_use_map[tool_use_id] = len(
-                                result["tool_calls"]) - 1
-
-            # 提取工具结果
-            elif msg.get("role") == "user":
-                # 工具结果在 role=user 的消息中
-                for block in msg.get("content", []):
-                    # 注意：键名是 toolResult (驼峰) 不是 tool_result (下划线)
-                    if "toolResult" in block:
-                        tool_result = block["toolResult"]
-                        tool_use_id = tool_result.get("toolUseId", "")
-
-                        if tool_use_id in tool_use_map:
-                            idx = tool_use_map[tool_use_id]
-                            # 提取工具的实际输出
-                            content = tool_result.get("content", [])
-                            if content:
-                                # content 是一个列表，通常第一个元素包含结果
-                                first_content = content[0] if isinstance(
-                                    content, list) else content
-                                # 可能是 {"json": {...}} 或 {"text": "..."}
-                                tool_output = None
-                                if isinstance(first_content, dict):
-                                    if "json" in first_content:
-                                        tool_output = first_content["json"]
-                                    elif "text" in first_content:
-                                        tool_output = first_content["text"]
-                                    else:
-                                        tool_output = first_content
-                                else:
-                                    tool_output = first_content
-
-                                # 如果工具输出是字符串，尝试解析为字典
-                                if isinstance(tool_output, str):
-                                    try:
-                                        import json
-                                        tool_output = json.loads(tool_output)
-                                    except:
-                                        try:
-                                            import ast
-                                            tool_output = ast.literal_eval(
-                                                tool_output)
-                                        except:
-                                            pass  # 保持字符串
-
-                                result["tool_calls"][idx]["output"] = tool_output
+        from agent_manager import extract_tool_calls
+
+        result["tool_calls"] = extract_tool_calls(agent_messages)
 
     return result
 
@@ -217,7 +471,7 @@ with st.sidebar:
     st.subheader("System Prompt")
     system_prompt = st.text_area(
         "系统提示词",
-        value=create_default_system_prompt(),
+        value=get_default_system_prompt(),
         height=300,
         help="定义Agent的行为和工作流程"
     )
@@ -238,19 +492,8 @@ with st.sidebar:
     )
     scale_type = scale_type_options[scale_type_label]
 
-    # 根据色阶类型显示不同的配色方案
-    if scale_type == "two_color":
-        color_scheme_options = {
-            "红→绿 (成本：红高绿低)": "red_green",
-            "绿→红 (收益：绿高红低)": "green_red",
-            "蓝→红 (温度)": "blue_white_red"
-        }
-    else:  # three_color
-        color_scheme_options = {
-            "红→黄→绿 (传统)": "red_yellow_green",
-            "绿→黄→红 (反向)": "green_yellow_red",
-            "蓝→白→红 (温度)": "blue_white_red"
-        }
+    # 根据色阶类型显示不同的配色方案（来自方案注册表，包含配置文件中的自定义方案）
+    color_scheme_options = get_scheme_labels(scale_type)
 
     color_scheme_label = st.selectbox(
         "色彩方案",
@@ -265,8 +508,8 @@ with st.sidebar:
     st.subheader("工具选择")
     tools = st.multiselect(
         "可用工具",
-        options=["analyze_excel", "apply_color_scale"],
-        default=["analyze_excel", "apply_color_scale"],
+        options=["analyze_excel", "analyze_all", "apply_color_scale", "revise_color_scale", "summarize_range"],
+        default=["analyze_excel", "analyze_all", "apply_color_scale", "revise_color_scale", "summarize_range"],
         help="选择Agent可以使用的工具"
     )
 
@@ -280,31 +523,48 @@ st.title("Excel色阶处理助手")
 # 文件上传
 uploaded_file = st.file_uploader(
     "📎 上传Excel文件",
-    type=["xlsx", "xls"],
-    help="上传需要处理的Excel文件"
+    type=["xlsx", "xls", "csv"],
+    help="上传需要处理的Excel文件（.xls / .csv 会自动转换为 .xlsx）"
 )
 
 # 处理文件上传
 if uploaded_file is not None:
     file_name = uploaded_file.name
     if file_name not in st.session_state.uploaded_files:
-        # 保存文件
-        file_path = st.session_state.file_manager.save_uploaded_file(
-            uploaded_file,
-            st.session_state.session_id
-        )
-        st.session_state.uploaded_files[file_name] = file_path
-        st.success(f"✅ 文件已上传: {file_name}")
+        # 保存文件（.xls / .csv 在此转换，保证Agent运行前已是xlsx）
+        try:
+            file_path = st.session_state.file_manager.save_uploaded_file(
+                uploaded_file,
+                st.session_state.session_id
+            )
+            st.session_state.uploaded_files[file_name] = file_path
+            # CSV保留原始文件，apply_color_scale对CSV走流式写入路径
+            if file_name.lower().endswith(".csv"):
+                st.session_state.source_files[file_name] = st.session_state.file_manager.get_uploaded_path(
+                    file_name,
+                    st.session_state.session_id
+                )
+            st.success(f"✅ 文件已上传: {file_name}")
+        except Exception as e:
+            st.error(f"❌ 文件处理失败: {str(e)}")
 
 # 显示已上传的文件
 if st.session_state.uploaded_files:
     with st.expander("📁 已上传的文件", expanded=False):
-        for name, path in st.session_state.uploaded_files.items():
-            st.text(f"• {name}")
+        # 文件ID与工具的file_id参数一致，可在对话中直接引用（如"给f2刷色阶"）
+        # sheet列表和维度按文件内容哈希缓存，重跑时只需stat
+        for file_id, session_file in session_file_index({"uploaded_files": st.session_state.uploaded_files}).items():
+            try:
+                layout = get_workbook_layout(st.session_state.file_manager.compute_file_hash(session_file.path), session_file.path)
+                sheets = "，".join(f"{sheet}（{rows}行×{cols}列）" for sheet, (rows, cols) in layout.items())
+            except Exception:
+                sheets = ""
+            st.text(f"• {file_id}  {session_file.name}  {sheets}".rstrip())
 
 st.divider()
 
-# 聊天历史
+# 聊天历史（输出文件从登记表的内存索引中查询，不逐条检查文件是否存在）
+session_outputs = st.session_state.file_manager.get_outputs(st.session_state.session_id)
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
@@ -321,16 +581,16 @@ for message in st.session_state.messages:
         # 显示下载按钮
         if "output_file" in message:
             output_file = message["output_file"]
-            if Path(output_file).exists():
-                with open(output_file, "rb") as f:
-                    file_data = f.read()
-                    file_name = Path(output_file).name
-                    st.download_button(
-                        label=f"📥 下载处理后的文件: {file_name}",
-                        data=file_data,
-                        file_name=file_name,
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+            if output_file in session_outputs:
+                # 小文件的内容按哈希缓存，重跑时不再整个读取输出文件
+                file_data = read_output_bytes(output_file)
+                file_name = Path(output_file).name
+                st.download_button(
+                    label=f"📥 下载处理后的文件: {file_name}",
+                    data=file_data,
+                    file_name=file_name,
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
 
 # 用户输入
 if prompt := st.chat_input("输入您的需求..."):
@@ -339,7 +599,7 @@ if prompt := st.chat_input("输入您的需求..."):
         st.warning("⚠️ 请先上传Excel文件")
     else:
         # 创建Agent（如果还没有或配置变更）
-        if st.session_state.agent is None:
+        if st.session_state.agent is None and st.session_state.job_queue is None:
             with st.spinner("正在初始化Agent..."):
                 if not create_agent(model_id, system_prompt, tools, scale_type, color_scheme, max_tokens):
                     st.stop()
@@ -354,216 +614,34 @@ if prompt := st.chat_input("输入您的需求..."):
         # 构建调用状态（包含已上传文件的路径）
         invocation_state = {
             "uploaded_files": st.session_state.uploaded_files,
+            "source_files": st.session_state.source_files,
             "session_id": st.session_state.session_id
         }
 
         # Agent处理
         with st.chat_message("assistant"):
             try:
-                # 调用Agent（流式输出）
-                collected_chunks = []
-                # 存储文本段落：[{"type": "text", "content": "..."}, {"type": "tool", "name": "..."}]
-                text_segments = []
-                text_placeholder = st.empty()
-
-                async def stream_response():
-                    async for chunk in st.session_state.agent.stream(prompt, invocation_state=invocation_state):
-                        # 收集所有chunk
-                        collected_chunks.append(chunk)
-
-                        # 检查是否是完整的message
-                        if isinstance(chunk, dict) and "message" in chunk:
-                            message = chunk["message"]
-                            role = message.get("role")
-
-                            # 处理assistant角色的消息
-                            if role == "assistant":
-                                content_blocks = message.get("content", [])
-
-                                # 遍历content数组，按顺序处理text和toolUse
-                                for block in content_blocks:
-                                    if "text" in block:
-                                        # 显示文本
-                                        text = block["text"]
-                                        text_segments.append(
-                                            {"type": "text", "content": text})
-                                        st.markdown(text)
-
-                                    elif "toolUse" in block:
-                                        # 显示工具调用
-                                        tool_use = block["toolUse"]
-                                        tool_name = tool_use.get("name", "")
-                                        text_segments.append(
-                                            {"type": "tool", "name": tool_name})
-                                        st.info(f"🔧 调用工具: {tool_name}")
-
-                            # 处理user角色的消息（工具返回结果）
-                            elif role == "user":
-                                content_blocks = message.get("content", [])
-
-                                for block in content_blocks:
-                                    if "toolResult" in block:
-                                        # 工具返回结果，可以选择显示或不显示
-                                        # 这里我们不显示，因为通常工具结果会被agent处理后再输出给用户
-                                        pass
-
-                # 运行流式输出
-                asyncio.run(stream_response())
-
-                # 清除占位符（不需要了，因为已经在stream中直接显示）
-                text_placeholder.empty()
-
-                # 提取完整文本（从text_segments中）
-                full_response = "".join(
-                    [seg["content"] for seg in text_segments if seg["type"] == "text"])
-
-                # 流式完成后获取完整消息历史
-                messages = st.session_state.agent.agent.messages if hasattr(
-                    st.session_state.agent.agent, 'messages') else []
-
-                # 从消息历史中提取工具调用信息
-                processed = {"text": full_response, "tool_calls": []}
-                if messages:
-                    tool_use_map = {}
-                    for msg in messages:
-                        if msg.get("role") == "assistant":
-                            for block in msg.get("content", []):
-                                if "toolUse" in block:
-                                    tool_use = block["toolUse"]
-                                    tool_use_id = tool_use.get("toolUseId", "")
-                                    tool_call = {
-                                        "name": tool_use.get("name", ""),
-                                        "input": tool_use.get("input", {}),
-                                        "output": None
-                                    }
-                                    processed["tool_calls"].append(tool_call)
-                                    if tool_use_id:
-                                        tool_use_map[tool_use_id] = len(
-                                            processed["tool_calls"]) - 1
-                        elif msg.get("role") == "user":
-                            for block in msg.get("content", []):
-                                if "toolResult" in block:
-                                    tool_result = block["toolResult"]
-                                    tool_use_id = tool_result.get(
-                                        "toolUseId", "")
-                                    if tool_use_id in tool_use_map:
-                                        idx = tool_use_map[tool_use_id]
-                                        content = tool_result.get(
-                                            "content", [])
-                                        if content:
-                                            first_content = content[0] if isinstance(
-                                                content, list) else content
-                                            tool_output = None
-                                            if isinstance(first_content, dict):
-                                                if "json" in first_content:
-                                                    tool_output = first_content["json"]
-                                                elif "text" in first_content:
-                                                    tool_output = first_content["text"]
-                                                else:
-                                                    tool_output = first_content
-                                            else:
-                                                tool_output = first_content
-
-                                            # 解析字符串为字典
-                                            if isinstance(tool_output, str):
-                                                try:
-                                                    import json
-                                                    tool_output = json.loads(
-                                                        tool_output)
-                                                except:
-                                                    try:
-                                                        import ast
-                                                        tool_output = ast.literal_eval(
-                                                            tool_output)
-                                                    except:
-                                                        pass
-
-                                            processed["tool_calls"][idx]["output"] = tool_output
-
-                # 调试信息
-                print("\n" + "="*60)
-                print(f"DEBUG: 流式输出完成")
-                print(f"DEBUG: 文本长度: {len(full_response)}")
-                print(f"DEBUG: 工具调用数量: {len(processed['tool_calls'])}")
-                print("="*60)
-
-                # 显示工具调用
-                for tool_call in processed["tool_calls"]:
-                    display_tool_call(
-                        tool_call["name"],
-                        tool_call["input"],
-                        tool_call.get("output", {})
-                    )
-
-                # 检查是否有输出文件
-                output_file = None
-                for tool_call in processed["tool_calls"]:
-                    if tool_call["name"] == "apply_color_scale" and tool_call.get("output"):
-                        output = tool_call["output"]
-
-                        # 如果output是字符串，尝试解析为字典
-                        if isinstance(output, str):
-                            try:
-                                import json
-                                # 尝试JSON解析
-                                output = json.loads(output)
-                            except:
-                                # 如果JSON解析失败，尝试eval（不安全但可能是Python字典字符串）
-                                try:
-                                    import ast
-                                    output = ast.literal_eval(output)
-                                except:
-                                    print(f"警告: 无法解析工具输出: {output[:100]}")
-                                    continue
-
-                        # 现在检查是否为字典并提取output_file
-                        if isinstance(output, dict) and output.get("success"):
-                            output_file = output.get("output_file")
-                            print(f"✅ 找到输出文件: {output_file}")
-                            break
-
-                # 保存助手消息
-                assistant_message = {
-                    "role": "assistant",
-                    # 存储时也限制长度
-                    "content": full_response[:500] if len(full_response) > 500 else full_response,
-                    "tool_calls": processed["tool_calls"]
-                }
-
-                # 显示下载按钮（在保存消息之前）
-                if output_file:
-                    assistant_message["output_file"] = output_file
-                    if output_file not in st.session_state.output_files:
-                        st.session_state.output_files.append(output_file)
-
-                    try:
-                        if Path(output_file).exists():
-                            with open(output_file, "rb") as f:
-                                file_data = f.read()
-                            file_name = Path(output_file).name
-
-                            # 使用session时间戳确保key唯一
-                            import time
-                            download_key = f"download_{int(time.time() * 1000)}"
-
-                            st.download_button(
-                                label=f"📥 下载处理后的文件: {file_name}",
-                                data=file_data,
-                                file_name=file_name,
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                key=download_key
-                            )
-                        else:
-                            st.warning(f"⚠️ 输出文件未找到: {output_file}")
-                    except Exception as download_error:
-                        st.error(f"生成下载按钮时出错: {str(download_error)}")
-
-                # 最后保存消息（确保前面的显示都完成）
-                st.session_state.messages.append(assistant_message)
+                if st.session_state.job_queue is not None:
+                    full_response, tool_calls = run_agent_turn_in_worker(prompt, invocation_state, {
+                        "model_id": model_id,
+                        "system_prompt": system_prompt,
+                        "selected_tools": tools,
+                        "scale_type": scale_type,
+                        "color_scheme": color_scheme,
+                        "max_tokens": max_tokens
+                    })
+                else:
+                    # 本轮内analyze_excel和apply_color_scale共用一次工作簿解析
+                    from utils.workbook_cache import workbook_cache_scope
+
+                    with workbook_cache_scope(invocation_state):
+                        full_response, tool_calls = run_agent_turn_streaming(prompt, invocation_state)
+
+                finalize_assistant_turn(full_response, tool_calls)
 
             except Exception as e:
                 error_msg = f"❌ 处理出错: {str(e)}"
-                message_placeholder.error(error_msg)
+                st.error(error_msg)
                 st.session_state.messages.append({
                     "role": "assistant",
                     "content": error_msg
@@ -572,3 +650,6 @@ if prompt := st.chat_input("输入您的需求..."):
 # 页面底部信息
 st.divider()
 st.caption("💡 提示：先上传Excel文件，然后输入需求，例如：'为Sheet1的数据刷色阶'")
+
+# 页面已渲染完成，后台预热聊天时需要的重模块（每个进程只执行一次）
+preload(PREVIEW_MODULES if st.session_state.job_queue is not None else AGENT_MODULES + PREVIEW_MODULES)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+导入耗时基准
+在独立子进程中以 python -X importtime 导入各模块，解析stderr报告累计导入耗时和最慢的依赖，
+用于跟踪页面首次渲染（app.py顶层导入）和各重模块的冷启动开销
+
+用法：
+  python bench_import.py
+  python bench_import.py --modules agent_manager utils.color_preview --top 15
+  python bench_import.py --budget-ms 300   # app.py顶层导入超过阈值时返回非零
+"""
+import argparse
+import ast
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 页面渲染之后才按需导入的重模块
+HEAVY_MODULES = ("agent_manager", "utils.color_preview", "utils.workbook_cache", "tools.color_scale_tool")
+
+# 与app.py模块级导入相同的集合（不导入streamlit本身，它在任何方案下都是必需的）
+APP_ENTRY = "app_imports"
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def app_top_level_imports() -> List[str]:
+    """读取app.py的模块级import语句（函数内的延迟导入不计入）"""
+    with open(os.path.join(ROOT, "app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return [name for name in modules if name != "streamlit"]
+
+
+def measure(modules: List[str]) -> Tuple[float, List[Tuple[str, float, float]]]:
+    """
+    在新进程中导入模块并解析 -X importtime 输出
+
+    Returns:
+        (总耗时ms, [(模块, 自身ms, 累计ms)])
+    """
+    code = "\n".join(f"import {name}" for name in modules) or "pass"
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True, cwd=ROOT
+    ).stderr
+
+    entries = []
+    total_us = 0
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        entries.append((name, int(self_us) / 1000, int(cumulative_us) / 1000))
+        # 顶层（缩进最浅）条目的累计耗时之和即为总耗时
+        if len(indent) == 1:
+            total_us += int(cumulative_us)
+    return total_us / 1000, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模块导入耗时基准（python -X importtime）')
+    parser.add_argument('--modules', nargs='+', default=[APP_ENTRY, *HEAVY_MODULES],
+                        help=f'要测量的模块，{APP_ENTRY} 表示app.py的模块级导入')
+    parser.add_argument('--top', type=int, default=10, help='每个模块列出最慢的依赖数量')
+    parser.add_argument('--budget-ms', type=float, default=None, help='app.py模块级导入允许的总耗时')
+    args = parser.parse_args()
+
+    # 解释器启动时（site等）的导入也会出现在输出中，从各结果中扣除
+    baseline_ms, baseline_entries = measure([])
+    startup_modules = {name for name, _, _ in baseline_entries}
+    print(f"解释器启动基线: {baseline_ms:.1f} ms（已从下列结果中扣除）")
+
+    results: Dict[str, float] = {}
+    for module in args.modules:
+        targets = app_top_level_imports() if module == APP_ENTRY else [module]
+        total_ms, entries = measure(targets)
+        total_ms = max(total_ms - baseline_ms, 0.0)
+        entries = [entry for entry in entries if entry[0] not in startup_modules]
+        results[module] = total_ms
+
+        print(f"\n{module}: {total_ms:.1f} ms")
+        if module == APP_ENTRY:
+            print(f"  ({', '.join(targets)})")
+        for name, self_ms, cumulative_ms in sorted(entries, key=lambda e: e[2], reverse=True)[:args.top]:
+            print(f"  {cumulative_ms:>9.1f} ms  (自身 {self_ms:>7.1f})  {name}")
+
+    if args.budget_ms is not None and APP_ENTRY in results and results[APP_ENTRY] > args.budget_ms:
+        print(f"\n✗ app.py模块级导入 {results[APP_ENTRY]:.1f} ms 超过阈值 {args.budget_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+峰值内存基准
+生成大型合成xlsx，分别以 full / read_only / native / xml_patch 策略执行分析和色阶写入，
+每个场景在独立子进程中运行并报告峰值RSS
+
+用法：
+  python bench_memory.py --rows 200000 --cols 10
+  python bench_memory.py --rows 1000000 --max-peak-mb 512   # 流式策略峰值超过阈值时返回非零
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+CASES = ("analyze_full", "analyze_read_only", "analyze_native", "apply_full", "apply_xml_patch")
+STREAMING_CASES = ("analyze_read_only", "analyze_native", "apply_xml_patch")
+
+
+def generate_workbook(path: str, rows: int, cols: int):
+    """用write_only模式生成合成数据（生成过程本身不占用大量内存）"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Data")
+    ws.append([f"col_{i}" for i in range(cols)])
+    for r in range(rows):
+        ws.append([(r * 31 + c * 17) % 1000 + 0.5 for c in range(cols)])
+    wb.save(path)
+
+
+def run_case(case: str, path: str, rows: int, cols: int) -> float:
+    """在当前进程中执行一个场景，返回耗时（秒）"""
+    from openpyxl.utils import get_column_letter
+    from utils.excel_analyzer import ExcelAnalyzer
+
+    cell_range = f"A2:{get_column_letter(cols)}{rows + 1}"
+
+    started = time.perf_counter()
+    if case.startswith("analyze"):
+        with ExcelAnalyzer(path, read_only=case == "analyze_read_only", native=case == "analyze_native") as analyzer:
+            analyzer.analyze("Data", 100)
+    else:
+        from tools.color_scale_tool import _build_rule_targets, _scheme_registry
+        scheme = _scheme_registry.scheme_names("three_color")[0]
+        rule_targets = _build_rule_targets(cell_range, "three_color", scheme)
+        output = path.replace(".xlsx", f"_{case}.xlsx")
+        if case == "apply_full":
+            from openpyxl import load_workbook
+            wb = load_workbook(path)
+            for target_range, rule in rule_targets:
+                wb["Data"].conditional_formatting.add(target_range, rule)
+            wb.save(output)
+        else:
+            from utils.xlsx_patch import add_conditional_formatting
+            add_conditional_formatting(path, output, "Data", rule_targets)
+        os.remove(output)
+    return time.perf_counter() - started
+
+
+def peak_rss_mb() -> float:
+    # Linux下ru_maxrss单位为KB，macOS下为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='工作簿加载策略峰值内存基准')
+    parser.add_argument('--rows', type=int, default=200000, help='合成数据行数')
+    parser.add_argument('--cols', type=int, default=10, help='合成数据列数')
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=CASES, help='要运行的场景')
+    parser.add_argument('--max-peak-mb', type=float, default=None, help='流式策略（read_only/native/xml_patch）允许的峰值内存')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    parser.add_argument('--file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # 子进程：只执行一个场景并输出结果
+    if args.case:
+        import tools.color_scale_tool  # noqa: F401  先完成导入，基线不计入场景本身
+        baseline = peak_rss_mb()
+        elapsed = run_case(args.case, args.file, args.rows, args.cols)
+        print(f"{elapsed:.2f} {baseline:.1f} {peak_rss_mb():.1f}")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "synthetic.xlsx")
+        print(f"生成合成文件: {args.rows} 行 × {args.cols} 列 ...")
+        generate_workbook(path, args.rows, args.cols)
+        print(f"文件大小: {os.path.getsize(path) / 1024 / 1024:.1f} MB\n")
+
+        print(f"{'场景':<20}{'耗时(s)':>10}{'导入后(MB)':>14}{'峰值(MB)':>12}")
+        failed = []
+        for case in args.cases:
+            output = subprocess.run(
+                [sys.executable, __file__, '--case', case, '--file', path, '--rows', str(args.rows), '--cols', str(args.cols)],
+                capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+            ).stdout.split()
+            elapsed, baseline, peak = (float(v) for v in output[-3:])
+            print(f"{case:<20}{elapsed:>10.2f}{baseline:>14.1f}{peak:>12.1f}")
+            if args.max_peak_mb and case in STREAMING_CASES and peak > args.max_peak_mb:
+                failed.append(case)
+
+    if failed:
+        print(f"\n✗ 峰值内存超过 {args.max_peak_mb} MB: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+输出保存基准
+生成合成工作簿，比较openpyxl默认的wb.save与XlsxZipWriter在不同压缩级别、线程数下的保存耗时和文件大小，
+以及XML补丁路径（原样复制未修改成员 vs 全部解压再压缩）和已压缩媒体（存储 vs deflate）的差异
+
+用法：
+  python bench_save.py --rows 200000 --cols 10
+  python bench_save.py --levels 1 6 --threads 1 4 --sheets 4
+"""
+import argparse
+import os
+import secrets
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_workbook(rows: int, cols: int, sheets: int):
+    """在内存中构建多sheet的合成工作簿（数值 + 少量重复文本，接近实际报表）"""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    wb.remove(wb.active)
+    for index in range(sheets):
+        ws = wb.create_sheet(f"Data{index + 1}")
+        ws.append(["名称"] + [f"col_{c}" for c in range(cols - 1)])
+        for r in range(rows // sheets):
+            ws.append([f"item_{r % 500}"] + [(r * 31 + c * 17) % 1000 + 0.5 for c in range(cols - 1)])
+    return wb
+
+
+def timed(func) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def legacy_patch(source_path: str, output_path: str):
+    """改动前的补丁路径：每个成员都解压再按默认级别压缩（只计算复制开销，不插入规则）"""
+    with zipfile.ZipFile(source_path) as zin, zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            with zin.open(info) as src, zout.open(info.filename, "w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def raw_copy(source_path: str, output_path: str):
+    from utils.xlsx_writer import XlsxZipWriter
+
+    with zipfile.ZipFile(source_path) as zin, XlsxZipWriter(output_path) as zout:
+        for info in zin.infolist():
+            zout.copy_member(zin, info)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='输出保存耗时与文件大小基准')
+    parser.add_argument('--rows', type=int, default=200000, help='合成数据总行数')
+    parser.add_argument('--cols', type=int, default=10, help='合成数据列数')
+    parser.add_argument('--sheets', type=int, default=2, help='sheet数量（行数平均分配）')
+    parser.add_argument('--levels', type=int, nargs='+', default=[0, 1, 3, 6, 9], help='要比较的压缩级别')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4], help='要比较的压缩线程数')
+    parser.add_argument('--media-mb', type=int, default=20, help='媒体对比使用的已压缩数据大小')
+    args = parser.parse_args()
+
+    from utils.xlsx_writer import XlsxZipWriter, ZipWriteOptions, save_workbook
+
+    print(f"构建合成工作簿: {args.rows} 行 × {args.cols} 列，{args.sheets} 个sheet ...")
+    wb = build_workbook(args.rows, args.cols, args.sheets)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = os.path.join(tmp_dir, "out.xlsx")
+
+        print(f"\n{'保存方式':<28}{'耗时(s)':>10}{'大小(MB)':>12}{'相对耗时':>10}{'相对大小':>10}")
+        baseline_time = timed(lambda: wb.save(output))
+        baseline_size = os.path.getsize(output)
+        print(f"{'openpyxl wb.save':<28}{baseline_time:>10.2f}{baseline_size / 1024 / 1024:>12.2f}{1:>10.2f}{1:>10.2f}")
+        for level in args.levels:
+            for threads in args.threads:
+                options = ZipWriteOptions(compress_level=level, threads=threads)
+                elapsed = timed(lambda: save_workbook(wb, output, options))
+                size = os.path.getsize(output)
+                label = f"level={level} threads={threads}"
+                print(f"{label:<28}{elapsed:>10.2f}{size / 1024 / 1024:>12.2f}"
+                      f"{elapsed / baseline_time:>10.2f}{size / baseline_size:>10.2f}")
+
+        # XML补丁路径：未修改成员的复制方式
+        source = os.path.join(tmp_dir, "source.xlsx")
+        wb.save(source)
+        patched = os.path.join(tmp_dir, "patched.xlsx")
+        print(f"\n{'补丁路径（复制全部成员）':<28}{'耗时(s)':>10}")
+        print(f"{'解压后重新压缩（改动前）':<28}{timed(lambda: legacy_patch(source, patched)):>10.2f}")
+        print(f"{'原样复制压缩数据':<28}{timed(lambda: raw_copy(source, patched)):>10.2f}")
+
+        # 已压缩媒体：存储 vs deflate
+        media = secrets.token_bytes(args.media_mb * 1024 * 1024)
+        print(f"\n{'媒体成员（' + str(args.media_mb) + 'MB已压缩数据）':<28}{'耗时(s)':>10}{'大小(MB)':>12}")
+        for store_media in (False, True):
+            media_path = os.path.join(tmp_dir, "media.zip")
+
+            def write_media():
+                with XlsxZipWriter(media_path, ZipWriteOptions(compress_level=6, store_media=store_media)) as archive:
+                    archive.writestr("xl/media/image1.png", media)
+
+            elapsed = timed(write_media)
+            label = "存储" if store_media else "deflate"
+            print(f"{label:<28}{elapsed:>10.2f}{os.path.getsize(media_path) / 1024 / 1024:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+多文件并行分析测试：结果顺序与输入一致，单个文件出错不影响其他文件
+"""
+import asyncio
+import zipfile
+
+import pytest
+from openpyxl import Workbook
+
+import utils.analysis_pool as analysis_pool_module
+from utils.analysis_pool import analyze_files
+
+
+def _save(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    for r in range(rows):
+        ws.append([r, r * 2])
+    wb.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """每个测试使用新的两进程池，结束时关闭"""
+    monkeypatch.setenv("ANALYZE_WORKERS", "2")
+    monkeypatch.setattr(analysis_pool_module, "_pool", None)
+    yield
+    if analysis_pool_module._pool is not None:
+        analysis_pool_module._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def test_results_follow_input_order(tmp_path, pool):
+    small = _save(tmp_path / "small.xlsx", 5)
+    large = _save(tmp_path / "large.xlsx", 2000)
+    broken = tmp_path / "broken.xlsx"
+    broken.write_bytes(b"not a zip")
+    missing = str(tmp_path / "missing.xlsx")
+
+    # 大文件先提交，但结果按输入顺序返回；重复的路径只分析一次
+    results = asyncio.run(analyze_files([small, str(broken), missing, large, small], 3))
+
+    assert [result["sheet_data"]["Data"]["total_rows"] for result in (results[0], results[3], results[4])] == [5, 2000, 5]
+    assert isinstance(results[1], zipfile.BadZipFile)
+    assert isinstance(results[2], FileNotFoundError)
+    assert results[0] == results[4]
+
+
+def test_single_file_runs_without_pool(tmp_path, monkeypatch):
+    def no_pool():
+        raise AssertionError("单个文件不应启动进程池")
+
+    monkeypatch.setattr(analysis_pool_module, "get_analysis_pool", no_pool)
+    path = _save(tmp_path / "a.xlsx", 3)
+    [result] = asyncio.run(analyze_files([path], 2))
+    assert result["sheet_data"]["Data"]["total_rows"] == 3
+
+    [error] = asyncio.run(analyze_files([str(tmp_path / "missing.xlsx")], 2))
+    assert isinstance(error, FileNotFoundError)
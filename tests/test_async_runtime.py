@@ -0,0 +1,95 @@
+"""
+后台事件循环测试：协程结果、异步生成器的同步迭代、异常传递和提前停止时的取消
+"""
+import asyncio
+import threading
+
+import pytest
+
+from utils.async_runtime import BackgroundLoop, get_background_loop
+
+
+@pytest.fixture(scope="module")
+def background():
+    return BackgroundLoop(name="test-event-loop")
+
+
+def test_run_uses_background_thread(background):
+    async def current_thread():
+        await asyncio.sleep(0)
+        return threading.current_thread().name
+
+    assert background.run(current_thread(), timeout=5) == "test-event-loop"
+    assert background.submit(asyncio.sleep(0, result=42)).result(5) == 42
+
+
+def test_shared_loop():
+    assert get_background_loop() is get_background_loop()
+
+
+def test_iterate_yields_in_order(background):
+    async def numbers():
+        for i in range(5):
+            await asyncio.sleep(0)
+            yield i
+
+    assert list(background.iterate(numbers(), poll_interval=0.01)) == [0, 1, 2, 3, 4]
+
+
+def test_iterate_propagates_errors_after_items(background):
+    async def failing():
+        yield "a"
+        yield "b"
+        raise ValueError("模型调用失败")
+
+    received = []
+    with pytest.raises(ValueError, match="模型调用失败"):
+        for item in background.iterate(failing(), poll_interval=0.01):
+            received.append(item)
+    assert received == ["a", "b"]
+
+
+def test_stopping_early_cancels_generator(background):
+    cancelled = threading.Event()
+    finished = threading.Event()
+
+    async def endless():
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+                await asyncio.sleep(0.01)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        finally:
+            finished.set()
+
+    iterator = background.iterate(endless(), poll_interval=0.01)
+    assert next(iterator) == 0
+    assert next(iterator) == 1
+    # 调用方停止迭代（Streamlit中断脚本时生成器被关闭）
+    iterator.close()
+
+    assert cancelled.wait(5)
+    assert finished.wait(5)
+    # 后台循环仍可继续使用
+    assert background.run(asyncio.sleep(0, result="ok"), timeout=5) == "ok"
+
+
+def test_iterate_returns_when_task_cancelled_externally(background):
+    started = threading.Event()
+
+    async def blocked():
+        started.set()
+        await asyncio.Event().wait()
+        yield "never"
+
+    def cancel_all():
+        for task in asyncio.all_tasks(background.loop):
+            task.cancel()
+
+    iterator = background.iterate(blocked(), poll_interval=0.01)
+    threading.Thread(target=lambda: started.wait(5) and background.loop.call_soon_threadsafe(cancel_all)).start()
+    assert list(iterator) == []
@@ -0,0 +1,32 @@
+"""
+单元格范围计数的测试：按边界计算的结果与实际拆分一致
+"""
+import pytest
+
+from utils.cell_range import (
+    RangeValidationError, count_columns, count_rows, parse_cell_range, split_per_column, split_per_row
+)
+
+
+@pytest.mark.parametrize("cell_range", [
+    "B2:E10",
+    "E10:B2",
+    "B2:B10 D2:E10",
+    "A1:C5 B3:F4",
+    "A1:C5 A1:C5",
+    "C3 A1:B2 B2:D9",
+])
+def test_counts_match_split(cell_range):
+    assert count_columns(cell_range) == len(split_per_column(cell_range))
+    assert count_rows(cell_range) == len(split_per_row(cell_range))
+
+
+def test_counts_whole_sheet_width_without_expanding():
+    assert count_columns("A1:XFD10") == 16384
+    assert count_rows("A1:B1048576 A5:C7") == 1048576
+
+
+@pytest.mark.parametrize("cell_range", ["B0:E5", "A1:E0", "@0:E5", "XFE1", "A1048577", "B:E", ""])
+def test_invalid_ranges_rejected(cell_range):
+    with pytest.raises(RangeValidationError):
+        parse_cell_range(cell_range)
@@ -0,0 +1,83 @@
+"""
+色阶预览测试：按已知节点插值颜色，以及预览范围的截断
+"""
+import numpy as np
+import pytest
+from openpyxl import Workbook
+
+from utils.color_preview import build_color_preview, interpolate_colors
+from utils.color_schemes import COLOR_SCHEMES
+
+
+RED = [0xF8, 0x69, 0x6B]
+YELLOW = [0xFF, 0xEB, 0x84]
+GREEN = [0x63, 0xBE, 0x7B]
+WHITE = [0xFF, 0xFF, 0xFF]
+
+
+def _mix(a, b, t):
+    return [x + (y - x) * t for x, y in zip(a, b)]
+
+
+def test_two_color_min_max():
+    values = np.array([[0.0, 25.0, 100.0]])
+    colors = interpolate_colors(values, COLOR_SCHEMES["two_color"]["red_green"], "two_color")
+    np.testing.assert_allclose(colors[0], [RED, _mix(RED, GREEN, 0.25), GREEN])
+
+
+def test_three_color_percentile_mid():
+    values = np.array([[0.0], [10.0], [20.0], [30.0], [40.0]])
+    colors = interpolate_colors(values, COLOR_SCHEMES["three_color"]["red_yellow_green"], "three_color")
+    np.testing.assert_allclose(colors[:, 0], [RED, _mix(RED, YELLOW, 0.5), YELLOW, _mix(YELLOW, GREEN, 0.5), GREEN])
+
+
+def test_num_mid_at_zero():
+    # 中间节点固定在0：负值一侧按 min..0 插值，正值一侧按 0..max 插值
+    values = np.array([[-10.0, -5.0, 0.0, 20.0, 40.0]])
+    colors = interpolate_colors(values, COLOR_SCHEMES["three_color"]["red_white_green_zero"], "three_color")
+    np.testing.assert_allclose(colors[0], [RED, _mix(RED, WHITE, 0.5), WHITE, _mix(WHITE, GREEN, 0.5), GREEN])
+
+
+def test_num_stops_clamp_outside_values():
+    config = {"start_type": "num", "start_value": 10, "start_color": "000000",
+              "end_type": "num", "end_value": 20, "end_color": "FFFFFF"}
+    colors = interpolate_colors(np.array([[0.0, 15.0, 99.0]]), config, "two_color")
+    np.testing.assert_allclose(colors[0], [[0, 0, 0], [127.5] * 3, [255] * 3])
+
+
+@pytest.mark.parametrize("axis, expected_b1", [(None, 1 / 3), (0, 0.0), (1, 1.0)])
+def test_axis(axis, expected_b1):
+    # [[0, 10], [20, 30]]：整体、按列、按行分别计算min/max
+    values = np.array([[0.0, 10.0], [20.0, 30.0]])
+    colors = interpolate_colors(values, COLOR_SCHEMES["two_color"]["red_green"], "two_color", axis)
+    np.testing.assert_allclose(colors[0, 1], _mix(RED, GREEN, expected_b1))
+
+
+def test_constant_and_missing_values():
+    values = np.array([[7.0, np.nan, 7.0]])
+    colors = interpolate_colors(values, COLOR_SCHEMES["two_color"]["red_green"], "two_color")
+    # 所有值相等时取最高节点的颜色，与Excel一致；非数值单元格没有颜色
+    np.testing.assert_allclose(colors[0, 0], GREEN)
+    assert np.isnan(colors[0, 1]).all()
+    assert interpolate_colors(np.empty((0, 0)), COLOR_SCHEMES["two_color"]["red_green"], "two_color").shape == (0, 0, 3)
+
+
+def test_build_preview_truncates(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    for r in range(1, 101):
+        ws.append([r, r * 2, "文本<b>"])
+    path = str(tmp_path / "a.xlsx")
+    wb.save(path)
+
+    preview = build_color_preview(path, "Data", "A1:C100", "two_color", "red_green", row_cap=10, col_cap=2)
+    assert preview["preview_range"] == "A1:B10"
+    assert preview["truncated"] is True
+    assert "background:#F8696B" in preview["html"]
+    assert "background:#63BE7B" in preview["html"]
+
+    preview = build_color_preview(path, "Data", "C1:C3", "two_color", "red_green")
+    assert preview["truncated"] is False
+    assert "文本&lt;b&gt;" in preview["html"]
+    assert "background" not in preview["html"].split("<td")[-1]
@@ -0,0 +1,121 @@
+"""
+apply_color_scale测试：同一轮内多次调用的叠加 / 替换，以及相同输入和规则集的复用
+"""
+import os
+from types import SimpleNamespace
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from tools.color_scale_tool import _apply_color_scale
+from utils.format_journal import FormatJournal
+
+
+@pytest.fixture
+def xlsx(tmp_path):
+    wb = Workbook()
+    for title in ("A", "B"):
+        ws = wb.create_sheet(title)
+        for r in range(1, 21):
+            ws.append([r, r * 2, r * 3])
+    del wb["Sheet"]
+    path = str(tmp_path / "data.xlsx")
+    wb.save(path)
+    return path
+
+
+def _turn():
+    """同一轮对话中的工具调用共享invocation_state"""
+    return SimpleNamespace(invocation_state={}, tool_use={"toolUseId": "t1"})
+
+
+def _apply(xlsx, context, sheet, cell_range, scheme="red_green"):
+    result = _apply_color_scale(sheet, cell_range, "two_color", scheme, xlsx, "", None, "range", False, context)
+    assert result["success"], result
+    return result
+
+
+def _rules(output_file):
+    wb = load_workbook(output_file)
+    found = {
+        title: sorted(
+            (str(cf.sqref), rule.colorScale.color[0].rgb[-6:])
+            for cf in wb[title].conditional_formatting for rule in cf.rules
+        )
+        for title in wb.sheetnames
+    }
+    wb.close()
+    return found
+
+
+def test_retry_on_same_range_replaces_rule(xlsx):
+    context = _turn()
+    first = _apply(xlsx, context, "A", "A1:B20")
+    second = _apply(xlsx, context, "A", "A1:B20", "green_red")
+
+    assert _rules(second["output_file"]) == {"A": [("A1:B20", "63BE7B")], "B": []}
+    entries = FormatJournal.for_file(xlsx).entries(second["output_file"])
+    assert [entry["rule_id"] for entry in entries] == [second["rule_id"]]
+    assert entries[0]["color_scheme"] == "green_red"
+    assert first["rule_id"] in second["corrections"][0]
+
+
+def test_overlapping_range_replaces_only_conflicting_rules(xlsx):
+    context = _turn()
+    _apply(xlsx, context, "A", "A1:A20")
+    _apply(xlsx, context, "A", "C1:C20")
+    result = _apply(xlsx, context, "A", "A5:B10", "green_red")
+    assert _rules(result["output_file"])["A"] == [("A5:B10", "63BE7B"), ("C1:C20", "F8696B")]
+
+
+def test_disjoint_ranges_and_other_sheets_stack(xlsx):
+    context = _turn()
+    _apply(xlsx, context, "A", "A1:A20")
+    _apply(xlsx, context, "A", "B1:B20", "green_red")
+    result = _apply(xlsx, context, "B", "A1:A20")
+    assert _rules(result["output_file"]) == {
+        "A": [("A1:A20", "F8696B"), ("B1:B20", "63BE7B")],
+        "B": [("A1:A20", "F8696B")],
+    }
+    assert len(FormatJournal.for_file(xlsx).entries(result["output_file"])) == 3
+
+
+def test_new_turn_starts_from_source(xlsx):
+    _apply(xlsx, _turn(), "A", "A1:A20")
+    result = _apply(xlsx, _turn(), "A", "B1:B20")
+    assert _rules(result["output_file"])["A"] == [("B1:B20", "F8696B")]
+
+
+def test_repeated_call_reuses_output(xlsx):
+    first = _apply(xlsx, _turn(), "A", "A1:B20")
+    assert first["strategy"] != "memoized"
+    mtime = os.stat(first["output_file"]).st_mtime_ns
+
+    # 新的一轮中相同的原文件和规则：直接复用已有输出，不重新写入
+    second = _apply(xlsx, _turn(), "A", "A1:B20")
+    assert second["strategy"] == "memoized"
+    assert second["rule_id"] == first["rule_id"]
+    assert os.stat(second["output_file"]).st_mtime_ns == mtime
+
+    # 同一轮中重试同一调用也复用
+    context = _turn()
+    _apply(xlsx, context, "A", "C1:C20")
+    assert _apply(xlsx, context, "A", "C1:C20")["strategy"] == "memoized"
+    assert _rules(first["output_file"])["A"] == [("C1:C20", "F8696B")]
+
+
+def test_changed_input_or_output_not_reused(xlsx):
+    first = _apply(xlsx, _turn(), "A", "A1:B20")
+
+    # 输出文件在登记后被修改
+    wb = load_workbook(first["output_file"])
+    wb["A"]["A1"] = "edited"
+    wb.save(first["output_file"])
+    assert _apply(xlsx, _turn(), "A", "A1:B20")["strategy"] != "memoized"
+
+    # 原文件内容变化
+    wb = load_workbook(xlsx)
+    wb["A"]["A1"] = 999
+    wb.save(xlsx)
+    assert _apply(xlsx, _turn(), "A", "A1:B20")["strategy"] != "memoized"
+    assert _apply(xlsx, _turn(), "A", "A1:B20", "green_red")["strategy"] != "memoized"
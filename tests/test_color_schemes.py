@@ -0,0 +1,87 @@
+"""
+色阶方案注册表测试：方案校验，以及配置文件无效时回退到内置方案
+"""
+import json
+import logging
+
+import pytest
+
+from utils.color_schemes import COLOR_SCHEMES, ColorSchemeError, ColorSchemeRegistry
+
+
+def _scheme(**overrides):
+    return {
+        "start_type": "min", "start_color": "FFFFFF",
+        "mid_type": "percentile", "mid_value": 50, "mid_color": "#ffeb84",
+        "end_type": "max", "end_color": "000000",
+        **overrides
+    }
+
+
+@pytest.mark.parametrize("stop_type", ["num", "percent", "percentile"])
+@pytest.mark.parametrize("value", ["abc", None, True, [1], float("nan"), "inf"])
+def test_non_numeric_stop_values_rejected(stop_type, value):
+    with pytest.raises(ColorSchemeError):
+        ColorSchemeRegistry().register("three_color", "bad", _scheme(mid_type=stop_type, mid_value=value))
+
+
+@pytest.mark.parametrize("scale_type, config", [
+    ("three_color", _scheme(mid_type="percent", mid_value=120)),
+    ("three_color", _scheme(mid_type="unknown")),
+    ("three_color", _scheme(end_color="GG0000")),
+    ("two_color", _scheme()),
+    ("five_color", _scheme()),
+])
+def test_invalid_schemes_rejected(scale_type, config):
+    with pytest.raises(ColorSchemeError):
+        ColorSchemeRegistry().register(scale_type, "bad", config)
+
+
+def test_valid_values_kept():
+    registry = ColorSchemeRegistry()
+    registry.register("three_color", "num_mid", _scheme(mid_type="num", mid_value="-2.5"))
+    registry.register("three_color", "formula_mid", _scheme(mid_type="formula", mid_value="$A$1"))
+    config = registry.get_config("three_color", "num_mid")
+    assert (config["mid_type"], config["mid_value"], config["mid_color"]) == ("num", "-2.5", "FFEB84")
+    assert registry.get_config("three_color", "formula_mid")["mid_value"] == "$A$1"
+
+
+def test_config_file_extends_and_overrides(tmp_path):
+    path = tmp_path / "schemes.json"
+    path.write_text(json.dumps({"three_color": {
+        "mono": {**_scheme(), "label": "单色"},
+        "red_yellow_green": _scheme(mid_value=40),
+    }}), encoding="utf-8")
+    registry = ColorSchemeRegistry.load(str(path))
+    assert registry.labels("three_color")["单色"] == "mono"
+    assert registry.get_config("three_color", "red_yellow_green")["mid_value"] == 40
+    assert "red_green" in registry.scheme_names("two_color")
+
+
+@pytest.mark.parametrize("content", [
+    "{not json",
+    "[]",
+    json.dumps({"three_color": ["x"]}),
+    json.dumps({"three_color": {"bad": "x"}}),
+    json.dumps({"four_color": {"x": _scheme()}}),
+    # 前面的方案合法、后面的不合法：整个文件都不生效
+    json.dumps({"three_color": {"good": _scheme(), "bad": _scheme(mid_type="num", mid_value="x")}}),
+])
+def test_invalid_config_file_falls_back_to_builtin(tmp_path, caplog, content):
+    path = tmp_path / "schemes.json"
+    path.write_text(content, encoding="utf-8")
+    with caplog.at_level(logging.WARNING, logger="utils.color_schemes"):
+        registry = ColorSchemeRegistry.load(str(path))
+
+    assert str(path) in caplog.text
+    for scale_type, schemes in COLOR_SCHEMES.items():
+        assert registry.scheme_names(scale_type) == list(schemes)
+
+
+def test_missing_env_config_falls_back(tmp_path, monkeypatch, caplog):
+    missing = str(tmp_path / "missing.json")
+    monkeypatch.setenv("COLOR_SCHEMES_FILE", missing)
+    with caplog.at_level(logging.WARNING, logger="utils.color_schemes"):
+        registry = ColorSchemeRegistry.load()
+    assert missing in caplog.text
+    assert registry.scheme_names("two_color") == list(COLOR_SCHEMES["two_color"])
@@ -0,0 +1,87 @@
+"""
+CSV流式刷色阶的测试：自动计算的数值范围、写出的单元格和条件格式，以及规则生成失败时不留下文件
+"""
+import os
+
+import pytest
+from openpyxl import load_workbook
+from openpyxl.formatting.rule import ColorScaleRule
+
+from utils.csv_color_writer import stream_csv_with_color_scale
+from utils.xlsx_converter import CSV_SHEET_NAME
+
+
+def _rules(cell_range):
+    rule = ColorScaleRule(start_type="min", start_color="F8696B", end_type="max", end_color="63BE7B")
+    return [(part, rule) for part in cell_range.split()]
+
+
+def _write_csv(path, text, encoding="utf-8"):
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+def _conditional_formats(output):
+    wb = load_workbook(output)
+    ws = wb[CSV_SHEET_NAME]
+    formats = sorted(str(cf.sqref) for cf in ws.conditional_formatting)
+    rows = [[cell.value for cell in row] for row in ws.iter_rows()]
+    wb.close()
+    return formats, rows
+
+
+def test_auto_range_skips_header_and_text_columns(tmp_path):
+    csv_path = _write_csv(tmp_path / "data.csv", (
+        "报表\n"
+        "名称,数量,单价,备注,得分\n"
+        "a,1,2.5,x,10\n"
+        "b,2,3.5,,20\n"
+        "c,3,007,y,30\n"
+    ))
+    output = str(tmp_path / "out.xlsx")
+    result = stream_csv_with_color_scale(csv_path, output, _rules)
+
+    assert result == {
+        "sheet_name": CSV_SHEET_NAME,
+        "applied_range": "B3:C5 E3:E5",
+        "total_rows": 5,
+        "total_columns": 5,
+        "header_rows": 2,
+    }
+    formats, rows = _conditional_formats(output)
+    assert formats == ["B3:C5", "E3:E5"]
+    # 数值转换为数字，前导零的编码保留为文本
+    assert rows[2] == ["a", 1, 2.5, "x", 10]
+    assert rows[4] == ["c", 3, "007", "y", 30]
+
+
+def test_explicit_range_and_gbk_encoding(tmp_path):
+    csv_path = _write_csv(tmp_path / "data.csv", "城市,温度\n北京,12\n上海,18\n", encoding="gbk")
+    output = str(tmp_path / "out.xlsx")
+    result = stream_csv_with_color_scale(csv_path, output, _rules, "B2:B2")
+
+    assert result["applied_range"] == "B2:B2"
+    formats, rows = _conditional_formats(output)
+    assert formats == ["B2"]
+    assert rows == [["城市", "温度"], ["北京", 12], ["上海", 18]]
+
+
+def test_no_numeric_data(tmp_path):
+    csv_path = _write_csv(tmp_path / "data.csv", "a,b\nx,y\n")
+    output = str(tmp_path / "out.xlsx")
+    result = stream_csv_with_color_scale(csv_path, output, _rules)
+    assert result["applied_range"] is None
+    assert _conditional_formats(output) == ([], [["a", "b"], ["x", "y"]])
+
+
+def test_rule_builder_failure_writes_nothing(tmp_path):
+    csv_path = _write_csv(tmp_path / "data.csv", "v\n1\n2\n")
+    output = tmp_path / "out.xlsx"
+
+    def fail(cell_range):
+        raise ValueError(f"规则过多: {cell_range}")
+
+    with pytest.raises(ValueError, match="A2:A3"):
+        stream_csv_with_color_scale(csv_path, str(output), fail)
+    assert not output.exists()
+    assert sorted(os.listdir(tmp_path)) == ["data.csv"]
@@ -0,0 +1,208 @@
+"""
+公式单元格读取（read_sheet_cells）与简单公式补算（FormulaEvaluator / fill_uncalculated）的测试
+
+openpyxl写出的公式没有缓存值，用来模拟程序生成的文件；缓存值和共享公式通过替换sheet XML构造
+"""
+import zipfile
+
+import pytest
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+from utils.formula_eval import FormulaEvaluator, fill_uncalculated
+from utils.sheet_reader import SheetCell, read_sheet_cells
+
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+
+def _coordinate(row: int, col: int) -> str:
+    return f"{get_column_letter(col)}{row}"
+
+
+def _cells(values: dict) -> dict:
+    """{'A1': 值或"=公式"} -> {(行, 列): SheetCell}，公式单元格没有缓存值"""
+    cells = {}
+    for coordinate, value in values.items():
+        col = ord(coordinate[0]) - 64
+        row = int(coordinate[1:])
+        if isinstance(value, str) and value.startswith("="):
+            cells[(row, col)] = SheetCell(None, value)
+        else:
+            cells[(row, col)] = SheetCell(value)
+    return cells
+
+
+def _replace_sheet_xml(path, sheet_data: str):
+    """用手写的<sheetData>替换openpyxl写出的sheet1.xml，其余部件保持不变"""
+    with zipfile.ZipFile(path) as archive:
+        members = {info.filename: archive.read(info.filename) for info in archive.infolist()}
+    members["xl/worksheets/sheet1.xml"] = (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<worksheet xmlns="{MAIN_NS}"><sheetData>{sheet_data}</sheetData></worksheet>'
+    ).encode("utf-8")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+
+
+@pytest.fixture
+def generated_workbook(tmp_path):
+    """程序生成的工作簿：数据列 + 没有缓存值的汇总公式"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    ws.append(["项目", "金额", "标记"])
+    ws.append(["a", 10, True])
+    ws.append(["b", 20, False])
+    ws.append(["c", 30, None])
+    ws["A5"] = "合计"
+    ws["B5"] = "=SUM(B2:B4)"
+    ws["B6"] = "=B5"
+    ws["B7"] = "=B2*2"
+    path = tmp_path / "generated.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+# ---------- read_sheet_cells ----------
+
+def test_read_sheet_cells_returns_values_and_formulas_in_one_pass(generated_workbook):
+    cells = read_sheet_cells(generated_workbook, "Data", max_row=10)
+
+    assert cells[(1, 1)] == SheetCell("项目")
+    assert cells[(2, 2)] == SheetCell(10)
+    assert cells[(2, 3)] == SheetCell(True)
+    assert cells[(3, 3)] == SheetCell(False)
+    # openpyxl写出的公式没有缓存值
+    assert cells[(5, 2)] == SheetCell(None, "=SUM(B2:B4)")
+    assert cells[(5, 2)].uncalculated
+    assert cells[(6, 2)].formula == "=B5"
+    # 空单元格不出现在结果中
+    assert (4, 3) not in cells
+
+
+def test_read_sheet_cells_stops_at_max_row_and_max_col(generated_workbook):
+    cells = read_sheet_cells(generated_workbook, "Data", max_row=3, max_col=2)
+
+    assert max(row for row, _ in cells) == 3
+    assert max(col for _, col in cells) == 2
+
+
+def test_read_sheet_cells_unknown_sheet_raises_key_error(generated_workbook):
+    with pytest.raises(KeyError):
+        read_sheet_cells(generated_workbook, "Missing", max_row=10)
+
+
+def test_read_sheet_cells_keeps_cached_values_and_restores_shared_formulas(generated_workbook):
+    _replace_sheet_xml(generated_workbook, (
+        '<row r="1"><c r="A1"><v>1</v></c><c r="B1"><f t="shared" ref="B1:B3" si="0">A1*2</f><v>2</v></c></row>'
+        '<row r="2"><c r="A2"><v>2</v></c><c r="B2"><f t="shared" si="0"/><v>4</v></c></row>'
+        '<row r="3"><c r="A3"><v>3</v></c><c r="B3"><f t="shared" si="0"/></c></row>'
+        '<row r="4"><c r="A4"><f>SUM(A1:A3)</f><v>6</v></c></row>'
+    ))
+
+    cells = read_sheet_cells(generated_workbook, "Data", max_row=10)
+
+    assert cells[(1, 2)] == SheetCell(2, "=A1*2")
+    assert cells[(2, 2)] == SheetCell(4, "=A2*2")
+    assert cells[(3, 2)] == SheetCell(None, "=A3*2")
+    assert cells[(4, 1)] == SheetCell(6, "=SUM(A1:A3)")
+    assert not cells[(4, 1)].uncalculated
+
+
+# ---------- FormulaEvaluator ----------
+
+@pytest.mark.parametrize("formula, expected", [
+    ("=SUM(A1:A3)", 6),
+    ("=AVERAGE(A1:A3)", 2),
+    ("=MIN(A1:A3)", 1),
+    ("=MAX(A1:A3)", 3),
+    ("=COUNT(A1:B3)", 3),
+    ("=SUM(A1, A3, 10)", 14),
+    ("=sum($A$1:$A$2)", 3),
+    ("=B1", "text"),
+    ("=A9", 0),
+])
+def test_evaluator_supported_formulas(formula, expected):
+    cells = _cells({"A1": 1, "A2": 2, "A3": 3, "B1": "text", "B2": True, "C1": formula})
+
+    assert FormulaEvaluator(cells, max_row=10).evaluate(1, 3) == expected
+
+
+def test_evaluator_empty_ranges():
+    cells = _cells({"A1": "=SUM(B1:B3)", "A2": "=AVERAGE(B1:B3)", "A3": "=MAX(B1:B3)"})
+    evaluator = FormulaEvaluator(cells, max_row=10)
+
+    assert evaluator.evaluate(1, 1) == 0
+    # Excel中空范围的AVERAGE是#DIV/0!，不补算
+    assert evaluator.evaluate(2, 1) is None
+    assert evaluator.evaluate(3, 1) == 0
+
+
+def test_evaluator_follows_chained_formulas():
+    cells = _cells({"A1": 1, "A2": 2, "A3": "=SUM(A1:A2)", "A4": "=A3", "A5": "=MAX(A1:A4)"})
+
+    assert FormulaEvaluator(cells, max_row=10).evaluate(5, 1) == 3
+
+
+@pytest.mark.parametrize("formula", [
+    "=B1*2",
+    "=Other!A1",
+    "=VLOOKUP(A1,B1:C3,2,FALSE)",
+    "=SUM(Other!A1:A3)",
+    "=SUM(A1:A3",
+])
+def test_evaluator_unsupported_formulas_return_none(formula):
+    cells = _cells({"A1": 1, "B1": 2, "C1": formula})
+
+    assert FormulaEvaluator(cells, max_row=10).evaluate(1, 3) is None
+
+
+def test_evaluator_circular_references_return_none():
+    cells = _cells({"A1": "=B1", "B1": "=SUM(A1:A2)", "A2": 5, "C1": "=C1"})
+    evaluator = FormulaEvaluator(cells, max_row=10)
+
+    assert evaluator.evaluate(1, 1) is None
+    assert evaluator.evaluate(1, 2) is None
+    assert evaluator.evaluate(1, 3) is None
+
+
+def test_evaluator_references_beyond_max_row_return_none():
+    cells = _cells({"A1": 1, "A2": 2, "B1": "=SUM(A1:A100)", "B2": "=A50"})
+    evaluator = FormulaEvaluator(cells, max_row=10)
+
+    # 没有读到的行可能有数据，不能当作空单元格
+    assert evaluator.evaluate(1, 2) is None
+    assert evaluator.evaluate(2, 2) is None
+
+
+def test_evaluator_rejects_oversized_ranges(monkeypatch):
+    monkeypatch.setattr("utils.formula_eval.MAX_REFERENCED_CELLS", 4)
+    cells = _cells({"A1": 1, "C1": "=SUM(A1:B2)", "C2": "=SUM(A1:B3)"})
+    evaluator = FormulaEvaluator(cells, max_row=10)
+
+    assert evaluator.evaluate(1, 3) == 1
+    assert evaluator.evaluate(2, 3) is None
+
+
+# ---------- fill_uncalculated ----------
+
+def test_fill_uncalculated_replaces_values_and_reports_coordinates(generated_workbook):
+    cells = read_sheet_cells(generated_workbook, "Data", max_row=10)
+
+    report = fill_uncalculated(cells, 10, _coordinate)
+
+    assert report == {"evaluated": ["B5", "B6"], "uncalculated": ["B7"]}
+    assert cells[(5, 2)] == SheetCell(60, "=SUM(B2:B4)")
+    assert cells[(6, 2)] == SheetCell(60, "=B5")
+    assert cells[(7, 2)] == SheetCell(None, "=B2*2")
+
+
+def test_fill_uncalculated_leaves_cached_values_untouched():
+    cells = {(1, 1): SheetCell(1), (2, 1): SheetCell(99, "=SUM(A1:A1)")}
+
+    report = fill_uncalculated(cells, 10, _coordinate)
+
+    assert report == {"evaluated": [], "uncalculated": []}
+    assert cells[(2, 1)] == SheetCell(99, "=SUM(A1:A1)")
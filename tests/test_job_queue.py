@@ -0,0 +1,135 @@
+"""
+SQLite任务队列测试：领取顺序、租约过期后重新领取、最大执行次数，以及结束任务时的Worker校验
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import utils.job_queue as job_queue_module
+from utils.job_queue import STATUS_DONE, STATUS_FAILED, STATUS_QUEUED, STATUS_RUNNING, JobQueue
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(job_queue_module, "time", SimpleNamespace(time=clock.time, sleep=lambda seconds: None))
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return JobQueue(str(tmp_path / "jobs.db"), lease_seconds=60, max_attempts=2)
+
+
+def test_claim_in_order(queue, clock):
+    first = queue.enqueue("analyze", {"n": 1})
+    clock.now += 1
+    second = queue.enqueue("apply", {"n": 2})
+    assert queue.pending_count() == 2
+
+    job = queue.claim("w1")
+    assert (job["id"], job["payload"], job["status"], job["attempts"]) == (first, {"n": 1}, STATUS_RUNNING, 1)
+    assert queue.claim("w2")["id"] == second
+    assert queue.claim("w3") is None
+    assert queue.pending_count() == 0
+
+
+def test_unknown_kind_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.enqueue("export", {})
+
+
+def test_complete_and_fail_require_owning_worker(queue):
+    job_id = queue.enqueue("analyze", {})
+    queue.claim("w1")
+
+    assert not queue.complete(job_id, "w2", {"ok": True})
+    assert not queue.fail(job_id, "w2", "错误")
+    assert queue.get(job_id)["status"] == STATUS_RUNNING
+
+    assert queue.complete(job_id, "w1", {"ok": True})
+    job = queue.get(job_id)
+    assert (job["status"], job["result"]) == (STATUS_DONE, {"ok": True})
+    # 已结束的任务不能再被修改
+    assert not queue.fail(job_id, "w1", "错误")
+    assert queue.get(job_id)["status"] == STATUS_DONE
+
+
+def test_expired_lease_reclaimed_and_stale_worker_rejected(queue, clock):
+    job_id = queue.enqueue("agent_turn", {})
+    queue.claim("w1")
+
+    clock.now += 30
+    assert queue.renew(job_id, "w1")
+    clock.now += 60
+    assert queue.claim("w2") is None
+
+    clock.now += 1
+    job = queue.claim("w2")
+    assert (job["id"], job["worker"], job["attempts"]) == (job_id, "w2", 2)
+
+    # 失联的旧Worker恢复后不能续约，也不能覆盖新Worker的结果
+    assert not queue.renew(job_id, "w1")
+    assert not queue.complete(job_id, "w1", "旧结果")
+    assert queue.complete(job_id, "w2", "新结果")
+    assert queue.get(job_id)["result"] == "新结果"
+
+
+def test_max_attempts_marks_failed(queue, clock):
+    job_id = queue.enqueue("analyze", {})
+    for worker_id in ("w1", "w2"):
+        assert queue.claim(worker_id)["id"] == job_id
+        clock.now += 61
+
+    assert queue.claim("w3") is None
+    job = queue.get(job_id)
+    assert job["status"] == STATUS_FAILED
+    assert "2" in job["error"]
+    assert not queue.complete(job_id, "w2", {})
+
+
+def test_failed_job_keeps_error(queue):
+    job_id = queue.enqueue("apply", {})
+    queue.claim("w1")
+    assert queue.fail(job_id, "w1", "ValueError: 范围错误")
+    job = queue.wait(job_id, timeout=0)
+    assert (job["status"], job["error"]) == (STATUS_FAILED, "ValueError: 范围错误")
+
+
+def test_cancel(queue):
+    queued = queue.enqueue("analyze", {})
+    assert queue.cancel(queued, "UI等待超时")
+    assert queue.claim("w1") is None
+    assert queue.get(queued)["status"] == STATUS_FAILED
+
+    running = queue.enqueue("analyze", {})
+    queue.claim("w1")
+    assert queue.cancel(running, "UI等待超时")
+    assert not queue.complete(running, "w1", {})
+    assert not queue.cancel(running, "UI等待超时")
+
+
+def test_wait_timeout(queue, clock):
+    job_id = queue.enqueue("analyze", {})
+    assert queue.get(job_id)["status"] == STATUS_QUEUED
+    with pytest.raises(TimeoutError):
+        queue.wait(job_id, timeout=0)
+    with pytest.raises(KeyError):
+        queue.wait("missing", timeout=0)
+
+
+def test_queue_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / "jobs.db")
+    job_id = JobQueue(path).enqueue("analyze", {"file": "a.xlsx"})
+    other = JobQueue(path)
+    assert other.claim("w1")["payload"] == {"file": "a.xlsx"}
+    assert other.complete(job_id, "w1", 1)
+    assert JobQueue(path).get(job_id)["result"] == 1
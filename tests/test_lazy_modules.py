@@ -0,0 +1,116 @@
+"""
+延迟导入的测试：后台预热只执行一次，界面首次渲染用到的轻量模块不导入重依赖
+"""
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+import utils.lazy_modules as lazy_modules
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 首次渲染不应导入的重依赖
+HEAVY_MODULES = ("openpyxl", "numpy", "strands", "boto3", "agent_manager")
+
+
+@pytest.fixture
+def imports(monkeypatch):
+    """记录预热线程导入的模块，不真正导入"""
+    calls = []
+    done = threading.Event()
+
+    def fake_import(name):
+        calls.append((name, threading.current_thread().name))
+        if name == "broken":
+            raise ImportError("missing dependency")
+        done.set()
+
+    monkeypatch.setattr(lazy_modules, "_preloading", set())
+    monkeypatch.setattr(lazy_modules.importlib, "import_module", fake_import)
+    return calls, done
+
+
+def _wait_for_preload():
+    for thread in threading.enumerate():
+        if thread.name == "module-preload":
+            thread.join(timeout=5)
+
+
+def test_preload_imports_in_background_thread(imports):
+    calls, done = imports
+
+    lazy_modules.preload(["a", "b"])
+
+    assert done.wait(timeout=5)
+    _wait_for_preload()
+    assert calls == [("a", "module-preload"), ("b", "module-preload")]
+
+
+def test_preload_imports_each_module_once(imports):
+    calls, _ = imports
+
+    lazy_modules.preload(["a", "b"])
+    _wait_for_preload()
+    lazy_modules.preload(["b", "c"])
+    _wait_for_preload()
+    lazy_modules.preload(["a", "c"])
+    _wait_for_preload()
+
+    assert [name for name, _ in calls] == ["a", "b", "c"]
+
+
+def test_preload_failure_does_not_stop_other_modules(imports, capsys):
+    calls, _ = imports
+
+    lazy_modules.preload(["broken", "a"])
+    _wait_for_preload()
+
+    assert [name for name, _ in calls] == ["broken", "a"]
+    assert "预加载 broken 失败" in capsys.readouterr().out
+
+
+def _imported_heavy_modules(code: str) -> list:
+    """在新的解释器中执行code，返回其中已导入的重依赖"""
+    script = f"import sys\n{code}\nprint(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True
+    )
+    return [name for name in result.stdout.strip().split(",") if name]
+
+
+def test_color_scheme_registry_does_not_import_openpyxl():
+    imported = _imported_heavy_modules(
+        "from utils.color_schemes import get_scheme_registry\n"
+        "registry = get_scheme_registry()\n"
+        "assert registry.scheme_names()\n"
+    )
+
+    assert imported == []
+
+
+def test_app_top_level_modules_do_not_import_heavy_dependencies():
+    imported = _imported_heavy_modules(
+        "import utils.async_runtime, utils.color_schemes, utils.file_manager, utils.job_queue\n"
+        "import utils.lazy_modules, utils.system_prompt, utils.xlsx_converter\n"
+    )
+
+    assert imported == []
+
+
+def test_color_scheme_registry_builds_rules_after_lazy_import():
+    imported = _imported_heavy_modules(
+        "from utils.color_schemes import get_scheme_registry\n"
+        "registry = get_scheme_registry()\n"
+        "registry.build_rule(\"two_color\", registry.scheme_names(\"two_color\")[0])\n"
+    )
+
+    assert "openpyxl" in imported
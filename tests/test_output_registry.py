@@ -0,0 +1,88 @@
+"""
+输出登记表测试：登记和查询输出文件，按输入指纹（原文件哈希 + 规则集哈希）查找可复用的输出
+"""
+import os
+
+from utils.output_registry import REGISTRY_FILE_NAME, OutputRegistry, file_sha256, remember_file_hash, rules_sha256
+
+
+RULE = {"sheet_name": "Data", "cell_range": "A1:A10", "scale_type": "two_color", "color_scheme": "red_green", "mode": "range"}
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_rules_hash_ignores_volatile_fields():
+    assert rules_sha256([{**RULE, "rule_id": "r1", "created_at": 1.0, "robust": None}]) == rules_sha256([RULE])
+    assert rules_sha256([{**RULE, "robust": True}]) != rules_sha256([RULE])
+    # 规则顺序影响输出（优先级），哈希随之不同
+    other = {**RULE, "cell_range": "B1:B10"}
+    assert rules_sha256([RULE, other]) != rules_sha256([other, RULE])
+
+
+def test_file_hash_cached_until_file_changes(tmp_path):
+    path = _write(tmp_path / "a.bin", b"abc")
+    first = file_sha256(path)
+    assert first == "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+    remember_file_hash(path, "cached")
+    assert file_sha256(path) == "cached"
+
+    _write(tmp_path / "a.bin", b"abcd")
+    assert file_sha256(path) not in ("cached", first)
+
+
+def test_record_and_lookup(tmp_path):
+    output = _write(tmp_path / "a_colored.xlsx", b"output")
+    registry = OutputRegistry.for_file(output)
+    assert registry.registry_path == str(tmp_path / REGISTRY_FILE_NAME)
+    assert registry.get(output) is None
+
+    entry = registry.record(output, "apply_color_scale", "tool-1", "in", "rules", 3)
+    assert entry["size"] == 6
+    assert entry["sha256"] == file_sha256(output)
+    assert OutputRegistry.for_file(output).get(output)["tool_use_id"] == "tool-1"
+    assert list(registry.outputs()) == [output]
+
+    found_file, found = registry.find("in", "rules")
+    assert (found_file, found["rule_count"]) == (output, 3)
+    assert registry.find("in", "other") is None
+    assert registry.find("other", "rules") is None
+
+
+def test_records_without_fingerprint_not_reusable(tmp_path):
+    output = _write(tmp_path / "a_colored.xlsx", b"output")
+    registry = OutputRegistry.for_file(output)
+    registry.record(output, "revise_color_scale", rules_hash="rules")
+    assert registry.get(output)["tool"] == "revise_color_scale"
+    assert registry.find("", "rules") is None
+
+
+def test_overwritten_output_drops_old_fingerprint(tmp_path):
+    output = _write(tmp_path / "a_colored.xlsx", b"first")
+    registry = OutputRegistry.for_file(output)
+    registry.record(output, "apply_color_scale", None, "in", "rules-1", 1)
+    _write(tmp_path / "a_colored.xlsx", b"second")
+    registry.record(output, "apply_color_scale", None, "in", "rules-2", 2)
+
+    assert registry.find("in", "rules-1") is None
+    assert registry.find("in", "rules-2")[1]["rule_count"] == 2
+
+
+def test_modified_or_deleted_output_not_reused(tmp_path):
+    output = _write(tmp_path / "a_colored.xlsx", b"output")
+    registry = OutputRegistry.for_file(output)
+    registry.record(output, "apply_color_scale", None, "in", "rules", 1)
+
+    stat = os.stat(output)
+    _write(tmp_path / "a_colored.xlsx", b"edited by user")
+    assert registry.find("in", "rules") is None
+
+    # 恢复原来的大小和修改时间后又可以复用
+    _write(tmp_path / "a_colored.xlsx", b"output")
+    os.utime(output, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert registry.find("in", "rules") is not None
+
+    os.remove(output)
+    assert registry.find("in", "rules") is None
@@ -0,0 +1,86 @@
+"""
+范围统计和色阶建议的测试：建议必须能用apply_color_scale的参数实现
+"""
+import numpy as np
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from tools.color_scale_tool import _apply_color_scale
+from utils.color_schemes import get_scheme_registry
+from utils.range_stats import StreamingStats, compute_range_stats, suggest_scale
+
+
+def _summary(values):
+    stats = StreamingStats()
+    stats.update(np.asarray(values, dtype=np.float64))
+    return stats.summary()
+
+
+def test_streaming_stats_exact_for_small_data():
+    values = np.arange(1, 101, dtype=np.float64)
+    summary = _summary(values)
+    assert summary["numeric_cells"] == 100
+    assert summary["min"] == 1 and summary["max"] == 100
+    assert summary["mean"] == 50.5
+    assert summary["std"] == pytest.approx(float(values.std()), rel=1e-5)
+    assert summary["quantiles"]["p50"] == 50.5
+    assert not summary["sampled"]
+
+
+def test_chunked_update_matches_single_pass():
+    rng = np.random.default_rng(1)
+    values = rng.normal(10, 3, 50_000)
+    stats = StreamingStats()
+    for chunk in np.array_split(values, 7):
+        stats.update(chunk)
+    summary = stats.summary()
+    assert summary["mean"] == pytest.approx(values.mean(), rel=1e-5)
+    assert summary["std"] == pytest.approx(values.std(), rel=1e-4)
+    assert summary["sampled"]
+
+
+@pytest.mark.parametrize("values, scale_type, robust", [
+    (np.linspace(-5, 10, 200), "three_color", False),
+    (np.r_[np.linspace(1, 2, 190), np.arange(1, 11) * 1000.0], "three_color", True),
+    (np.linspace(1, 2, 200), "two_color", False),
+])
+def test_suggestion_maps_to_registered_schemes(values, scale_type, robust):
+    suggestion = suggest_scale(_summary(values))
+    assert suggestion["scale_type"] == scale_type
+    assert bool(suggestion.get("robust")) is robust
+    registry = get_scheme_registry()
+    assert suggestion["color_schemes"]
+    for name in suggestion["color_schemes"]:
+        assert registry.validate(scale_type, name) is None
+        config = registry.get_config(scale_type, name)
+        for stop, spec in suggestion["stops"].items():
+            if robust and stop in ("start", "end"):
+                continue
+            assert config[f"{stop}_type"] == spec["type"]
+            if "value" in spec:
+                assert float(config[f"{stop}_value"]) == spec["value"]
+
+
+def test_no_suggestion_without_numbers():
+    assert suggest_scale({"numeric_cells": 0}) is None
+
+
+def test_mixed_sign_suggestion_applies_zero_midpoint(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "P"
+    for value in range(-20, 41):
+        ws.append([value])
+    path = str(tmp_path / "pl.xlsx")
+    wb.save(path)
+
+    stats = compute_range_stats(path, "P", "A1:A61")
+    assert stats["numeric_cells"] == 61
+    suggestion = stats["suggestion"]
+    scheme = suggestion["color_schemes"][0]
+
+    result = _apply_color_scale("P", "A1:A61", suggestion["scale_type"], scheme, path, "", None, "range", False, None)
+    assert result["success"], result
+    rules = list(load_workbook(result["output_file"])["P"].conditional_formatting)[0].rules
+    cfvo = rules[0].colorScale.cfvo
+    assert [(v.type, v.val) for v in cfvo] == [("min", None), ("num", 0), ("max", None)]
@@ -0,0 +1,156 @@
+"""
+准入控制测试：用可控时钟驱动令牌桶、并发上限、限流退避（AIMD）和等待估算，以及会话限流器的LRU淘汰
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import utils.rate_limiter as rate_limiter_module
+from utils.rate_limiter import AdmissionLimiter, LimiterPool
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(rate_limiter_module, "time", SimpleNamespace(monotonic=clock.monotonic))
+    # 退避抖动取上限，结果确定
+    monkeypatch.setattr(rate_limiter_module.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def test_token_bucket_burst_and_refill(clock):
+    limiter = AdmissionLimiter(rate_per_second=2, burst=3, max_concurrency=10)
+    assert [limiter.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert limiter.try_acquire() == pytest.approx(0.5)
+
+    clock.now += 0.25
+    assert limiter.try_acquire() == pytest.approx(0.25)
+    clock.now += 0.25
+    assert limiter.try_acquire() == 0
+
+    # 空闲再久也只能攒满burst个令牌
+    clock.now += 100
+    assert [limiter.try_acquire() for _ in range(4)][:3] == [0, 0, 0]
+    assert limiter.stats()["in_flight"] == 7
+
+
+def test_concurrency_cap(clock):
+    limiter = AdmissionLimiter(rate_per_second=100, burst=100, max_concurrency=2)
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() == 0
+    # 等待时间按平均调用时长 / 并发上限估算（初始平均5秒）
+    assert limiter.try_acquire() == pytest.approx(2.5)
+
+    limiter.release(elapsed=10)
+    assert limiter.try_acquire() == 0
+    assert limiter.try_acquire() == pytest.approx((0.8 * 5 + 0.2 * 10) / 2)
+    limiter.release()
+    limiter.release()
+    limiter.release()
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_throttle_backoff_and_recovery(clock):
+    limiter = AdmissionLimiter(rate_per_second=4, burst=10, max_concurrency=10, min_rate=0.5, max_backoff=6)
+
+    limiter.on_throttle()
+    assert limiter.rate == 2
+    assert limiter.try_acquire() == pytest.approx(2)
+    assert not limiter.is_idle()
+
+    # 连续限流：速率继续减半（不低于min_rate），退避时间指数增长（不超过max_backoff）
+    limiter.on_throttle()
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.rate == 0.5
+    assert limiter.try_acquire() == pytest.approx(6)
+    assert limiter.stats()["throttle_count"] == 4
+
+    clock.now += 6
+    assert limiter.try_acquire() == 0
+    assert limiter.is_idle() is False
+    limiter.release()
+    assert limiter.is_idle()
+
+    # 成功后每次按最大速率的10%加性恢复，退避次数清零
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(0.9)
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.rate == 4
+    limiter.on_throttle()
+    assert limiter.try_acquire() == pytest.approx(2)
+
+
+def test_estimate_wait(clock):
+    limiter = AdmissionLimiter(rate_per_second=2, burst=1, max_concurrency=1)
+    assert limiter.estimate_wait() == 0
+
+    assert limiter.try_acquire() == 0
+    # 令牌不足0.5秒 + 并发已满（平均调用5秒）：取较大者，再加一轮调用时长
+    assert limiter.estimate_wait() == pytest.approx(5 + 5)
+
+    limiter.release(elapsed=5)
+    clock.now += 0.5
+    assert limiter.estimate_wait() == 0
+    # estimate_wait只估算，不消耗令牌
+    assert limiter.try_acquire() == 0
+
+
+def test_acquire_waits_for_token(clock, monkeypatch):
+    async def sleep(seconds):
+        clock.now += seconds
+
+    monkeypatch.setattr(rate_limiter_module.asyncio, "sleep", sleep)
+    limiter = AdmissionLimiter(rate_per_second=1, burst=1, max_concurrency=5)
+
+    async def run():
+        await limiter.acquire()
+        await limiter.acquire(poll_interval=0.25)
+
+    started = clock.now
+    asyncio.run(run())
+    assert clock.now - started == pytest.approx(1.0)
+    assert limiter.stats()["waiting"] == 0
+    assert limiter.stats()["in_flight"] == 2
+
+
+def test_pool_shares_limiters():
+    pool = LimiterPool(AdmissionLimiter)
+    assert pool.get("a") is pool.get("a")
+    assert pool.get("a") is not pool.get("b")
+    assert len(pool) == 2
+
+
+def test_pool_evicts_least_recently_used_idle(clock):
+    pool = LimiterPool(AdmissionLimiter, max_size=2)
+    first = pool.get("a")
+    pool.get("b")
+    pool.get("a")
+    pool.get("c")
+    assert ("a" in pool, "b" in pool, "c" in pool) == (True, False, True)
+    assert pool.get("a") is first
+
+
+def test_pool_keeps_busy_limiters(clock):
+    pool = LimiterPool(AdmissionLimiter, max_size=2)
+    pool.get("a").try_acquire()
+    pool.get("b").on_throttle()
+
+    # 全部繁忙时暂时超出上限，新建的限流器也不会被立即丢弃
+    created = pool.get("c")
+    assert len(pool) == 3
+    assert pool.get("c") is created
+
+    pool.get("a").release()
+    pool.get("d")
+    assert ("a" in pool, "b" in pool, "c" in pool, "d" in pool) == (False, True, False, True)
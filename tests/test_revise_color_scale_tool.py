@@ -0,0 +1,116 @@
+"""
+revise_color_scale测试：list / remove / replace 按条件格式日志从原文件重新生成输出
+"""
+from types import SimpleNamespace
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from tools.color_scale_tool import _apply_color_scale
+from tools.revise_color_scale_tool import _revise_color_scale
+from utils.format_journal import FormatJournal
+
+
+@pytest.fixture
+def xlsx(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    for r in range(1, 21):
+        ws.append([r, r * 2, 1000 if r == 20 else r * 3])
+    path = str(tmp_path / "data.xlsx")
+    wb.save(path)
+    return path
+
+
+@pytest.fixture
+def applied(xlsx):
+    """同一轮中应用两条不重叠的规则：r1分列且robust，r2为普通范围色阶"""
+    context = SimpleNamespace(invocation_state={}, tool_use={"toolUseId": "t1"})
+    first = _apply_color_scale(
+        "Data", "A1:B20", "two_color", "red_green", xlsx, "", {"B": "green_red"}, "per_column", True, context
+    )
+    second = _apply_color_scale("Data", "C1:C20", "two_color", "blue_white_red", xlsx, "", None, "range", False, context)
+    assert first["success"] and second["success"]
+    assert first["output_file"] == second["output_file"]
+    return first["output_file"], first["rule_id"], second["rule_id"]
+
+
+def _rules(output_file):
+    """输出中的条件格式：[(范围, 起始颜色, 起始节点类型)]"""
+    wb = load_workbook(output_file)
+    found = sorted(
+        (str(cf.sqref), rule.colorScale.color[0].rgb[-6:], rule.colorScale.cfvo[0].type)
+        for cf in wb["Data"].conditional_formatting for rule in cf.rules
+    )
+    wb.close()
+    return found
+
+
+def _revise(xlsx, action, rule_id="", **changes):
+    return _revise_color_scale(action, rule_id, changes, xlsx, None)
+
+
+def test_list(xlsx, applied):
+    output_file, first, second = applied
+    result = _revise(xlsx, "list")
+    assert result["success"]
+    [output] = result["outputs"]
+    assert output["output_file"] == output_file
+    assert [rule["rule_id"] for rule in output["rules"]] == [first, second]
+    assert output["rules"][0]["column_schemes"] == {"B": "green_red"}
+    assert output["rules"][0]["robust"] is True
+    assert "robust" not in output["rules"][1]
+
+
+def test_remove_regenerates_from_journal(xlsx, applied):
+    output_file, first, second = applied
+    assert _rules(output_file) == [("A1:A20", "F8696B", "num"), ("B1:B20", "63BE7B", "num"), ("C1:C20", "5A8AC6", "min")]
+
+    result = _revise(xlsx, "remove", second)
+    assert result["success"], result
+    assert result["rule_count"] == 2
+    assert _rules(output_file) == [("A1:A20", "F8696B", "num"), ("B1:B20", "63BE7B", "num")]
+    assert [entry["rule_id"] for entry in FormatJournal.for_file(xlsx).entries(output_file)] == [first]
+
+    result = _revise(xlsx, "remove", second)
+    assert not result["success"]
+
+
+def test_replace_clears_column_schemes_and_robust(xlsx, applied):
+    output_file, first, _ = applied
+    result = _revise(xlsx, "replace", first, column_schemes={}, robust=False)
+    assert result["success"], result
+
+    # 分列方案和robust节点都已清除：两列都用color_scheme和min/max节点
+    assert _rules(output_file) == [("A1:A20", "F8696B", "min"), ("B1:B20", "F8696B", "min"), ("C1:C20", "5A8AC6", "min")]
+    entry = FormatJournal.for_file(xlsx).entries(output_file)[0]
+    assert entry["rule_id"] == first
+    assert entry["column_schemes"] is None and entry["robust"] is None
+
+    # 再次打开robust
+    assert _revise(xlsx, "replace", first, robust=True)["success"]
+    assert _rules(output_file)[0] == ("A1:A20", "F8696B", "num")
+
+
+def test_replace_range_and_scheme(xlsx, applied):
+    output_file, _, second = applied
+    result = _revise(xlsx, "replace", second, color_scheme="green_red", cell_range="c2:c30")
+    assert result["success"], result
+    assert ("C2:C20", "63BE7B", "min") in _rules(output_file)
+    entry = FormatJournal.for_file(xlsx).entries(output_file)[1]
+    assert (entry["cell_range"], entry["color_scheme"]) == ("C2:C20", "green_red")
+
+
+def test_replace_rejections_leave_output_unchanged(xlsx, applied):
+    output_file, first, second = applied
+    before = _rules(output_file)
+    journal_before = FormatJournal.for_file(xlsx).entries(output_file)
+
+    assert not _revise(xlsx, "replace", second)["success"]
+    assert not _revise(xlsx, "replace", second, color_scheme="no_such_scheme")["success"]
+    assert not _revise(xlsx, "replace", first, mode="per_row")["success"]
+    assert not _revise(xlsx, "replace", second, cell_range="Z100:Z200")["success"]
+
+    assert _rules(output_file) == before
+    assert FormatJournal.for_file(xlsx).entries(output_file) == journal_before
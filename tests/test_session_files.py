@@ -0,0 +1,59 @@
+"""
+会话文件索引测试：按文件ID或文件名定位上传文件，无法唯一确定时报错
+"""
+import pytest
+
+from utils.session_files import FileSelectionError, list_session_files, resolve_session_file, session_file_index
+
+
+STATE = {
+    "uploaded_files": {
+        "销售.xlsx": "/s/销售.xlsx",
+        "Cost.csv": "/s/Cost_converted.xlsx",
+        "cost.xlsx": "/s/cost.xlsx",
+    },
+    "source_files": {"Cost.csv": "/s/Cost.csv"},
+}
+
+
+def test_index_in_upload_order():
+    index = session_file_index(STATE)
+    assert list(index) == ["f1", "f2", "f3"]
+    assert index["f2"].path == "/s/Cost_converted.xlsx"
+    assert index["f2"].source == "/s/Cost.csv"
+    assert index["f3"].source == "/s/cost.xlsx"
+    assert list_session_files(STATE)[0] == {"file_id": "f1", "file_name": "销售.xlsx"}
+
+
+@pytest.mark.parametrize("file_id, expected", [
+    ("f1", "销售.xlsx"),
+    (" f3 ", "cost.xlsx"),
+    ("销售", "销售.xlsx"),
+    ("COST.CSV", "Cost.csv"),
+    ("cost.xlsx", "cost.xlsx"),
+])
+def test_resolve(file_id, expected):
+    assert resolve_session_file(STATE, file_id).name == expected
+
+
+def test_ambiguous_stem():
+    # Cost.csv 和 cost.xlsx 去掉扩展名后同名
+    with pytest.raises(FileSelectionError, match="f2=Cost.csv, f3=cost.xlsx"):
+        resolve_session_file(STATE, "cost")
+
+
+def test_unspecified_with_several_files():
+    with pytest.raises(FileSelectionError, match="f1=销售.xlsx"):
+        resolve_session_file(STATE)
+
+
+def test_single_file_used_by_default():
+    state = {"uploaded_files": {"a.xlsx": "/s/a.xlsx"}}
+    assert resolve_session_file(state).file_id == "f1"
+    assert resolve_session_file(state, "").path == "/s/a.xlsx"
+
+
+@pytest.mark.parametrize("state, file_id", [(None, ""), ({}, "f1"), (STATE, "f9"), (STATE, "missing")])
+def test_not_found(state, file_id):
+    with pytest.raises(FileSelectionError):
+        resolve_session_file(state, file_id)
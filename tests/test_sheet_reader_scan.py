@@ -0,0 +1,197 @@
+"""
+快速数值扫描（iter_numeric_chunks / iter_numeric_groups）的测试
+
+用手写的最小xlsx包覆盖快速路径的前提（r为第一个属性）不满足时退回逐个解析的情况
+"""
+import zipfile
+
+import pytest
+
+from utils.range_stats import compute_range_stats
+from utils.sheet_reader import iter_numeric_chunks, iter_numeric_groups
+
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK = (
+    f'<?xml version="1.0" encoding="UTF-8"?>'
+    f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+    f'<sheets><sheet name="Data" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _write_xlsx(path, sheet_data: str, prefix: str = "") -> str:
+    """写一个只有一个sheet（Data）的最小xlsx，sheet_data为<sheetData>内的XML"""
+    ns = f'xmlns:{prefix[:-1]}="{MAIN_NS}"' if prefix else f'xmlns="{MAIN_NS}"'
+    sheet = (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<{prefix}worksheet {ns}><{prefix}sheetData>{sheet_data}</{prefix}sheetData></{prefix}worksheet>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", CONTENT_TYPES)
+        archive.writestr("_rels/.rels", ROOT_RELS)
+        archive.writestr("xl/workbook.xml", WORKBOOK)
+        archive.writestr("xl/_rels/workbook.xml.rels", WORKBOOK_RELS)
+        archive.writestr("xl/worksheets/sheet1.xml", sheet)
+    return str(path)
+
+
+def _grid_xml(rows: int, cols: int, cell, prefix: str = "", row_attrs=lambda r: f' r="{r}"') -> str:
+    """rows x cols 的数值网格，cell(行, 列字母, 值) 返回单元格标签（不含<v>）"""
+    parts = []
+    for r in range(1, rows + 1):
+        parts.append(f"<{prefix}row{row_attrs(r)}>")
+        for c in range(cols):
+            letter = chr(ord("A") + c)
+            parts.append(f"{cell(r, letter)}<{prefix}v>{r * 10 + c}</{prefix}v></{prefix}c>")
+        parts.append(f"</{prefix}row>")
+    return "".join(parts)
+
+
+def _expected(rows, cols, min_col=1, min_row=1, max_col=None, max_row=None):
+    max_col = max_col or cols
+    max_row = max_row or rows
+    return sorted(
+        float(r * 10 + c - 1)
+        for r in range(min_row, max_row + 1)
+        for c in range(min_col, max_col + 1)
+    )
+
+
+def _scan(path, bounds, chunk_size=None):
+    kwargs = {"chunk_size": chunk_size} if chunk_size else {}
+    return sorted(float(v) for values in iter_numeric_chunks(path, "Data", bounds, **kwargs) for v in values)
+
+
+LAYOUTS = {
+    "regular": lambda r, letter: f'<c r="{letter}{r}" s="1">',
+    "reordered_attributes": lambda r, letter: f'<c s="1" r="{letter}{r}">',
+    "missing_r": lambda r, letter: '<c s="1">',
+    "bare_tag": lambda r, letter: "<c>",
+    "typed_first": lambda r, letter: f'<c t="n" r="{letter}{r}">',
+}
+
+
+@pytest.mark.parametrize("layout", sorted(LAYOUTS))
+def test_chunks_match_all_layouts(tmp_path, layout):
+    path = _write_xlsx(tmp_path / "a.xlsx", _grid_xml(30, 5, LAYOUTS[layout]))
+    assert _scan(path, (1, 1, 5, 30)) == _expected(30, 5)
+    assert _scan(path, (2, 3, 4, 20)) == _expected(30, 5, 2, 3, 4, 20)
+
+
+def test_rows_without_r_fall_back(tmp_path):
+    sheet = _grid_xml(10, 3, LAYOUTS["missing_r"], row_attrs=lambda r: "")
+    path = _write_xlsx(tmp_path / "a.xlsx", sheet)
+    assert _scan(path, (1, 2, 3, 9)) == _expected(10, 3, 1, 2, 3, 9)
+
+
+def test_rows_with_r_not_first_fall_back(tmp_path):
+    sheet = _grid_xml(10, 3, LAYOUTS["regular"], row_attrs=lambda r: f' spans="1:3" r="{r}"')
+    path = _write_xlsx(tmp_path / "a.xlsx", sheet)
+    assert _scan(path, (1, 1, 3, 10)) == _expected(10, 3)
+
+
+def test_irregular_block_after_regular_ones_resumes_without_duplicates(tmp_path):
+    # 前半部分规则、后半部分r不在首位：小块扫描时前面的块已由快速路径产出
+    regular = _grid_xml(200, 4, LAYOUTS["regular"])
+    irregular = _grid_xml(400, 4, LAYOUTS["reordered_attributes"])
+    tail = irregular[irregular.index('<row r="201">'):]
+    path = _write_xlsx(tmp_path / "a.xlsx", regular + tail)
+    assert _scan(path, (1, 1, 4, 400), chunk_size=1024) == _expected(400, 4)
+
+
+def test_prefixed_namespace(tmp_path):
+    sheet = _grid_xml(20, 3, lambda r, letter: f'<x:c r="{letter}{r}">', prefix="x:")
+    path = _write_xlsx(tmp_path / "a.xlsx", sheet, prefix="x:")
+    assert _scan(path, (1, 1, 3, 20)) == _expected(20, 3)
+
+    reordered = _grid_xml(20, 3, lambda r, letter: f'<x:c s="0" r="{letter}{r}">', prefix="x:")
+    path = _write_xlsx(tmp_path / "b.xlsx", reordered, prefix="x:")
+    assert _scan(path, (1, 1, 3, 20)) == _expected(20, 3)
+
+
+@pytest.mark.parametrize("order", ['r="{ref}" t="{t}"', 't="{t}" r="{ref}"'])
+def test_only_numeric_cells_counted(tmp_path, order):
+    def cell(ref, t, value):
+        return f'<c {order.format(ref=ref, t=t)}><v>{value}</v></c>'
+
+    sheet = (
+        '<row r="1">'
+        + cell("A1", "n", 1.5)
+        + cell("B1", "s", 0)
+        + cell("C1", "b", 1)
+        + cell("D1", "e", "#DIV/0!")
+        + cell("E1", "str", "x")
+        + '<c r="F1"><f>A1*2</f><v>3</v></c>'
+        + '<c r="G1" s="2"><f t="shared" ref="G1:G2" si="0"/><v>4.25</v></c>'
+        + '<c r="H1" s="1"/>'
+        + "</row>"
+    )
+    path = _write_xlsx(tmp_path / "a.xlsx", sheet)
+    assert _scan(path, (1, 1, 8, 1)) == [1.5, 3.0, 4.25]
+
+
+@pytest.mark.parametrize("layout", ["regular", "reordered_attributes"])
+@pytest.mark.parametrize("by", ["column", "row"])
+def test_groups(tmp_path, layout, by):
+    path = _write_xlsx(tmp_path / "a.xlsx", _grid_xml(12, 4, LAYOUTS[layout]))
+    groups = {}
+    for chunk in iter_numeric_groups(path, "Data", (2, 3, 3, 10), by):
+        for key, values in chunk.items():
+            groups.setdefault(key, []).extend(float(v) for v in values)
+
+    if by == "column":
+        assert groups == {col: [float(r * 10 + col - 1) for r in range(3, 11)] for col in (2, 3)}
+    else:
+        assert groups == {r: [float(r * 10 + 1), float(r * 10 + 2)] for r in range(3, 11)}
+
+
+@pytest.mark.parametrize("layout", ["regular", "reordered_attributes"])
+def test_range_stats(tmp_path, layout):
+    path = _write_xlsx(tmp_path / "a.xlsx", _grid_xml(50, 3, LAYOUTS[layout]))
+    stats = compute_range_stats(path, "Data", "A1:C50")
+    assert stats["numeric_cells"] == 150
+    assert stats["total_cells"] == 150
+    assert stats["min"] == 10
+    assert stats["max"] == 502
+
+
+def test_wide_range_uses_column_capture(tmp_path):
+    # 超过多选分支上限的宽范围：正则捕获列字母后按列号过滤
+    parts = ['<row r="1">']
+    for col in range(1, 101):
+        letters = ""
+        n = col
+        while n:
+            n, rem = divmod(n - 1, 26)
+            letters = chr(65 + rem) + letters
+        parts.append(f'<c r="{letters}1"><v>{col}</v></c>')
+    parts.append("</row>")
+    path = _write_xlsx(tmp_path / "a.xlsx", "".join(parts))
+    assert _scan(path, (3, 1, 90, 1)) == [float(col) for col in range(3, 91)]
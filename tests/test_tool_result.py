@@ -0,0 +1,59 @@
+"""
+精简工具结果（to_compact / from_compact）的测试
+"""
+from utils.tool_result import CODE_OK, KEY_MAP, from_compact, to_compact
+
+
+def test_round_trip_restores_schema_keys():
+    result = {
+        "success": True,
+        "message": "说明",
+        "output_file": "/tmp/a_colored.xlsx",
+        "applied_range": "B2:E50",
+        "rule_count": 2,
+        "robust": None,
+    }
+    compact = to_compact(result)
+    assert compact["c"] == CODE_OK
+    assert compact[KEY_MAP["output_file"]] == "/tmp/a_colored.xlsx"
+    assert "message" not in compact and "m" not in compact
+    assert KEY_MAP["robust"] not in compact
+
+    restored = from_compact(compact)
+    assert restored["output_file"] == "/tmp/a_colored.xlsx"
+    assert restored["applied_range"] == "B2:E50"
+    assert restored["rule_count"] == 2
+
+
+def test_user_data_keys_pass_through():
+    # sheet名、列字母、方案名与短键名或被丢弃的字段同名时不能被改写
+    sheet = {"total_rows": 3, "total_columns": 2, "preview_rows": [[{"value": 1}, {"value": ""}]]}
+    result = {
+        "success": True,
+        "data": {"sheets": ["f", "message"], "sheet_data": {"f": sheet, "message": sheet}},
+        "anchors": {"F": [1, 9], "S": [2, 8]},
+        "column_schemes": {"output_file": "red_green"},
+    }
+    compact = to_compact(result)
+    assert set(compact[KEY_MAP["sheet_data"]]) == {"f", "message"}
+    assert compact[KEY_MAP["sheet_data"]]["f"][KEY_MAP["total_rows"]] == 3
+    assert compact[KEY_MAP["anchors"]] == {"F": [1, 9], "S": [2, 8]}
+    assert compact[KEY_MAP["column_schemes"]] == {"output_file": "red_green"}
+
+    restored = from_compact(compact)
+    assert set(restored["sheet_data"]) == {"f", "message"}
+    assert restored["sheet_data"]["message"]["total_rows"] == 3
+    assert restored["sheet_data"]["f"]["preview_rows"][0][0]["value"] == 1
+    assert len(restored["sheet_data"]["f"]["preview_rows"][0]) == 2
+    assert restored["anchors"] == {"F": [1, 9], "S": [2, 8]}
+    assert restored["column_schemes"] == {"output_file": "red_green"}
+    assert "output_file" not in restored
+
+
+def test_journal_rules_keep_column_scheme_keys():
+    result = {
+        "success": True,
+        "outputs": [{"output_file": "o.xlsx", "rules": [{"rule_id": "r1", "column_schemes": {"r": "green_red"}}]}],
+    }
+    restored = from_compact(to_compact(result))
+    assert restored["outputs"][0]["rules"][0]["column_schemes"] == {"r": "green_red"}
@@ -0,0 +1,87 @@
+"""
+上传文件流式写入测试：分块写入和哈希、按扩展名校验文件头和xlsx包结构，校验失败时不留下文件
+"""
+import hashlib
+import io
+import os
+import zipfile
+
+import pytest
+from openpyxl import Workbook
+
+from utils.output_registry import file_sha256
+from utils.upload_stream import OLE_SIGNATURE, InvalidUploadError, write_upload
+
+
+def _xlsx_bytes(rows=200):
+    wb = Workbook()
+    for r in range(rows):
+        wb.active.append([r, f"文本{r}"])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def _upload(tmp_path, data, file_name, chunk_size=4096):
+    target = tmp_path / "uploads" / file_name
+    target.parent.mkdir(exist_ok=True)
+    return target, write_upload(io.BytesIO(data), file_name, str(target), chunk_size)
+
+
+def test_xlsx_written_in_chunks(tmp_path):
+    data = _xlsx_bytes()
+    assert len(data) > 4096
+    target, content_hash = _upload(tmp_path, data, "a.xlsx")
+    assert target.read_bytes() == data
+    assert content_hash == hashlib.sha256(data).hexdigest()
+    # 写入时计算的哈希已登记，与重新计算的一致
+    assert file_sha256(str(target)) == content_hash
+    assert os.listdir(target.parent) == ["a.xlsx"]
+
+
+def test_csv_accepted(tmp_path):
+    data = "名称,值\na,1\n".encode("gbk")
+    target, _ = _upload(tmp_path, data, "a.csv", chunk_size=4)
+    assert target.read_bytes() == data
+
+
+def _zip_without_workbook():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+    return buffer.getvalue()
+
+
+def _corrupted_workbook_part():
+    # 改动workbook.xml的压缩数据：目录完好但CRC校验失败
+    data = bytearray(_xlsx_bytes())
+    with zipfile.ZipFile(io.BytesIO(bytes(data))) as archive:
+        info = archive.getinfo("xl/workbook.xml")
+    start = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+    data[start + 5] ^= 0xFF
+    return bytes(data)
+
+
+@pytest.mark.parametrize("file_name, data, message", [
+    ("a.xlsx", b"name,value\n1,2\n", "不是有效的xlsx文件"),
+    ("a.xlsx", OLE_SIGNATURE + b"\x00" * 600, "已加密"),
+    ("a.xlsx", _xlsx_bytes()[:5000], "已损坏或不完整"),
+    ("a.xlsx", _zip_without_workbook(), "缺少 xl/workbook.xml"),
+    ("a.xlsx", _corrupted_workbook_part(), "已损坏或不完整"),
+    ("a.xls", b"PK\x03\x04 not ole", "不是有效的xls文件"),
+    ("a.csv", b"a,b\x00\x01", "不是文本格式的CSV文件"),
+    ("a.xlsx", b"", "是空文件"),
+], ids=["csv_as_xlsx", "encrypted", "truncated", "missing_part", "corrupted_part", "zip_as_xls", "binary_csv", "empty"])
+def test_invalid_uploads_rejected(tmp_path, file_name, data, message):
+    with pytest.raises(InvalidUploadError, match=message):
+        _upload(tmp_path, data, file_name)
+    assert os.listdir(tmp_path / "uploads") == []
+
+
+def test_rejected_upload_keeps_existing_file(tmp_path):
+    target, _ = _upload(tmp_path, _xlsx_bytes(), "a.xlsx")
+    before = target.read_bytes()
+    with pytest.raises(InvalidUploadError):
+        _upload(tmp_path, b"not a zip", "a.xlsx")
+    assert target.read_bytes() == before
+    assert os.listdir(target.parent) == ["a.xlsx"]
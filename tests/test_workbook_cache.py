@@ -0,0 +1,117 @@
+"""
+单轮工作簿缓存测试：复用、文件变化后重新加载、写入后迁移到输出文件，以及作用域结束时释放内存预算
+"""
+import os
+
+import pytest
+from openpyxl import Workbook
+
+import utils.workbook_strategy as workbook_strategy_module
+from utils.workbook_cache import WORKBOOK_CACHE_KEY, WorkbookCache, get_workbook_cache, workbook_cache_scope
+from utils.workbook_strategy import STRATEGY_FULL, MemoryBudget, estimate_memory
+
+
+def _save(path, value=1):
+    wb = Workbook()
+    wb.active.title = "Data"
+    wb.active["A1"] = value
+    wb.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    instance = MemoryBudget(1024 * 1024 * 1024)
+    monkeypatch.setattr(workbook_strategy_module, "_memory_budget", instance)
+    return instance
+
+
+def _reserved(budget):
+    return budget.ceiling_bytes - budget.available
+
+
+def test_open_reuses_workbook(tmp_path, budget):
+    path = _save(tmp_path / "a.xlsx")
+    cache = WorkbookCache()
+    workbook = cache.open(path)
+    assert cache.open(os.path.join(str(tmp_path), ".", "a.xlsx")) is workbook
+    assert _reserved(budget) == estimate_memory(path, STRATEGY_FULL)
+    cache.close()
+    assert _reserved(budget) == 0
+
+
+def test_reload_after_file_changes(tmp_path, budget):
+    path = _save(tmp_path / "a.xlsx")
+    cache = WorkbookCache()
+    first = cache.open(path)
+    _save(path, value="changed" * 100)
+    second = cache.open(path)
+    assert second is not first
+    assert second["Data"]["A1"].value == "changed" * 100
+    cache.close()
+    assert _reserved(budget) == 0
+
+
+def test_budget_exhausted_returns_none(tmp_path, monkeypatch):
+    path = _save(tmp_path / "a.xlsx")
+    monkeypatch.setattr(workbook_strategy_module, "_memory_budget", MemoryBudget(estimate_memory(path, STRATEGY_FULL) - 1))
+    assert WorkbookCache().open(path) is None
+
+
+def test_move_to_output(tmp_path, budget):
+    source = _save(tmp_path / "a.xlsx")
+    output = str(tmp_path / "a_colored.xlsx")
+    cache = WorkbookCache()
+    workbook = cache.open(source)
+    workbook["Data"]["B1"] = 2
+    workbook.save(output)
+
+    cache.move(source, output)
+    assert cache.open(output) is workbook
+    # 输出中的公式没有缓存值，取值仍从原文件读取
+    assert cache.values_source(output) == source
+    assert cache.values_source(source) == source
+
+    # 原文件的缓存已随迁移失效，再次访问时重新加载
+    reloaded = cache.open(source)
+    assert reloaded is not workbook
+    assert reloaded["Data"]["B1"].value is None
+
+    cache.invalidate(output)
+    assert cache.values_source(output) == output
+    cache.close()
+    assert _reserved(budget) == 0
+
+
+def test_move_replaces_existing_output_entry(tmp_path, budget):
+    source = _save(tmp_path / "a.xlsx")
+    output = _save(tmp_path / "a_colored.xlsx")
+    cache = WorkbookCache()
+    cache.open(output)
+    workbook = cache.open(source)
+    workbook.save(output)
+
+    cache.move(source, output)
+    assert cache.open(output) is workbook
+    assert _reserved(budget) == estimate_memory(source, STRATEGY_FULL)
+    # 未缓存的源文件迁移时什么也不做
+    cache.move(str(tmp_path / "missing.xlsx"), output)
+    assert cache.open(output) is workbook
+    cache.close()
+
+
+def test_scope(tmp_path, budget):
+    path = _save(tmp_path / "a.xlsx")
+    state = {}
+    assert get_workbook_cache(state) is None
+    assert get_workbook_cache(None) is None
+
+    with pytest.raises(RuntimeError):
+        with workbook_cache_scope(state) as cache:
+            assert get_workbook_cache(state) is cache
+            cache.open(path)
+            assert _reserved(budget) > 0
+            raise RuntimeError("本轮出错")
+
+    assert WORKBOOK_CACHE_KEY not in state
+    assert _reserved(budget) == 0
@@ -0,0 +1,145 @@
+"""
+工作簿加载策略的选择测试：按解压后大小和内存上限分级，超出上限时抛出WorkbookTooLargeError；
+另用合成文件在子进程中检查流式策略的峰值内存
+"""
+import os
+import subprocess
+import sys
+import zipfile
+
+import pytest
+from openpyxl import Workbook
+
+import utils.workbook_strategy as workbook_strategy_module
+from utils.workbook_strategy import (
+    FULL_MODE_MEMORY_FACTOR, READ_ONLY_MEMORY_FACTOR, STRATEGY_FULL, STRATEGY_READ_ONLY, STRATEGY_XML_PATCH,
+    MemoryBudget, WorkbookTooLargeError, estimate_memory, get_memory_budget, workbook_strategy,
+)
+from utils.xlsx_inspect import read_uncompressed_sizes
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def xlsx(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    for r in range(1, 501):
+        ws.append([r, r * 2.5, r % 7])
+    path = str(tmp_path / "data.xlsx")
+    wb.save(path)
+    # openpyxl保存时使用内联字符串，补一个sharedStrings部分，让只读模式的预估不为0
+    shared = "".join(f"<si><t>文本{i}</t></si>" for i in range(500))
+    with zipfile.ZipFile(path, "a") as archive:
+        archive.writestr("xl/sharedStrings.xml", f'<sst count="500" uniqueCount="500">{shared}</sst>')
+    return path
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """把进程内预算换成可指定上限的新实例"""
+    def install(ceiling_bytes):
+        instance = MemoryBudget(ceiling_bytes)
+        monkeypatch.setattr(workbook_strategy_module, "_memory_budget", instance)
+        return instance
+    return install
+
+
+def test_estimates_follow_uncompressed_sizes(xlsx, tmp_path):
+    sizes = read_uncompressed_sizes(xlsx)
+    assert sizes["shared_strings"] > 0
+    assert estimate_memory(xlsx, STRATEGY_FULL) == sizes["total"] * FULL_MODE_MEMORY_FACTOR
+    assert estimate_memory(xlsx, STRATEGY_READ_ONLY) == sizes["shared_strings"] * READ_ONLY_MEMORY_FACTOR
+    assert estimate_memory(xlsx, STRATEGY_XML_PATCH) == 0
+
+    csv_path = tmp_path / "data.csv"
+    csv_path.write_text("a,b\n1,2\n")
+    assert estimate_memory(str(csv_path), STRATEGY_FULL) == 0
+
+
+def test_ceiling_read_from_env(monkeypatch):
+    monkeypatch.setattr(workbook_strategy_module, "_memory_budget", None)
+    monkeypatch.setenv("EXCEL_MEMORY_CEILING_MB", "1.5")
+    assert get_memory_budget().ceiling_bytes == int(1.5 * 1024 * 1024)
+    assert get_memory_budget() is get_memory_budget()
+
+
+@pytest.mark.parametrize("operation", ["analyze", "apply"])
+def test_small_file_loads_fully(xlsx, budget, operation):
+    instance = budget(estimate_memory(xlsx, STRATEGY_FULL))
+    with workbook_strategy(xlsx, operation) as strategy:
+        assert strategy == STRATEGY_FULL
+        assert instance.available == 0
+    assert instance.available == instance.ceiling_bytes
+
+
+@pytest.mark.parametrize("operation, expected", [("analyze", STRATEGY_READ_ONLY), ("apply", STRATEGY_XML_PATCH)])
+def test_over_ceiling_falls_back(xlsx, budget, operation, expected):
+    instance = budget(estimate_memory(xlsx, STRATEGY_FULL) - 1)
+    with workbook_strategy(xlsx, operation) as strategy:
+        assert strategy == expected
+        assert instance.ceiling_bytes - instance.available == estimate_memory(xlsx, expected)
+    assert instance.available == instance.ceiling_bytes
+
+
+def test_concurrent_reservation_downgrades_second_call(xlsx, budget):
+    budget(estimate_memory(xlsx, STRATEGY_FULL) * 3 // 2)
+    with workbook_strategy(xlsx, "analyze") as first:
+        with workbook_strategy(xlsx, "analyze") as second:
+            assert (first, second) == (STRATEGY_FULL, STRATEGY_READ_ONLY)
+    with workbook_strategy(xlsx, "analyze") as third:
+        assert third == STRATEGY_FULL
+
+
+def test_too_large_for_any_strategy(xlsx, budget):
+    instance = budget(estimate_memory(xlsx, STRATEGY_READ_ONLY) - 1)
+    with pytest.raises(WorkbookTooLargeError):
+        with workbook_strategy(xlsx, "analyze"):
+            pass
+    assert instance.available == instance.ceiling_bytes
+
+    # 写入时XML补丁不需要预留内存，总能执行
+    with workbook_strategy(xlsx, "apply") as strategy:
+        assert strategy == STRATEGY_XML_PATCH
+
+
+def test_reservation_released_on_error(xlsx, budget):
+    instance = budget(estimate_memory(xlsx, STRATEGY_FULL))
+    with pytest.raises(RuntimeError):
+        with workbook_strategy(xlsx, "apply"):
+            raise RuntimeError("写入失败")
+    assert instance.available == instance.ceiling_bytes
+
+
+def _peak_growth_mb(case, path, rows, cols):
+    """在独立子进程中执行bench_memory.py的一个场景，返回峰值RSS相对导入后基线的增长（MB）"""
+    output = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "bench_memory.py"), "--case", case, "--file", path,
+         "--rows", str(rows), "--cols", str(cols)],
+        capture_output=True, text=True, check=True, cwd=ROOT
+    ).stdout.split()
+    _, baseline, peak = (float(v) for v in output[-3:])
+    return peak - baseline
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="依赖resource模块统计峰值RSS")
+def test_streaming_strategies_stay_below_full_estimate(tmp_path, budget):
+    sys.path.insert(0, ROOT)
+    try:
+        from bench_memory import generate_workbook
+    finally:
+        sys.path.remove(ROOT)
+
+    rows, cols = 10000, 5
+    path = str(tmp_path / "synthetic.xlsx")
+    generate_workbook(path, rows, cols)
+    full_estimate_mb = estimate_memory(path, STRATEGY_FULL) / 1024 / 1024
+
+    # 上限低于完整加载的预估时，写入选择XML补丁；补丁和原生分析的峰值增长都远低于完整加载的预估
+    budget(estimate_memory(path, STRATEGY_FULL) // 2)
+    with workbook_strategy(path, "apply") as strategy:
+        assert strategy == STRATEGY_XML_PATCH
+    for case in ("apply_xml_patch", "analyze_native"):
+        assert _peak_growth_mb(case, path, rows, cols) < full_estimate_mb / 2
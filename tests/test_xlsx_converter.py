@@ -0,0 +1,29 @@
+"""
+CSV单元格类型转换的测试
+"""
+import pytest
+
+from utils.xlsx_converter import coerce_csv_value
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("", None),
+    ("0", 0),
+    ("12", 12),
+    (" -12 ", -12),
+    ("+5", 5),
+    ("0.5", 0.5),
+    ("-0.25", -0.25),
+    (".5", 0.5),
+    ("1e3", 1000.0),
+    ("2.5E-2", 0.025),
+])
+def test_numbers(raw, expected):
+    value = coerce_csv_value(raw)
+    assert value == expected
+    assert type(value) is type(expected)
+
+
+@pytest.mark.parametrize("raw", ["007", "-007", "00", "00.5", "1_000", "nan", "NaN", "inf", "-Infinity", "1e400", "0x10", "12a"])
+def test_kept_as_text(raw):
+    assert coerce_csv_value(raw) == raw
@@ -0,0 +1,50 @@
+"""
+范围预检（preflight_cell_range）的测试
+"""
+import pytest
+from openpyxl import Workbook
+
+from tools.color_scale_tool import _apply_color_scale
+from utils.tool_result import CODE_INVALID_INPUT
+from utils.xlsx_inspect import RangeValidationError, preflight_cell_range
+
+
+@pytest.fixture
+def xlsx(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    for r in range(1, 11):
+        ws.append([f"行{r}", r, r * 2, r * 3, r * 4])
+    path = str(tmp_path / "data.xlsx")
+    wb.save(path)
+    return path
+
+
+def test_corrections(xlsx):
+    checked = preflight_cell_range(xlsx, "data", "$b$2:e20")
+    assert checked["sheet_name"] == "Data"
+    assert checked["cell_range"] == "B2:E10"
+    assert len(checked["corrections"]) == 2
+
+    checked = preflight_cell_range(xlsx, "Data", "B:C")
+    assert checked["cell_range"] == "B1:C10"
+
+
+@pytest.mark.parametrize("cell_range", ["B0:E5", "@0:E5", "B2:E0", "0:5", "XFE1:XFE2", "B2:", "F2:H5"])
+def test_invalid_ranges_rejected(xlsx, cell_range):
+    with pytest.raises(RangeValidationError):
+        preflight_cell_range(xlsx, "Data", cell_range)
+
+
+def test_unknown_sheet(xlsx):
+    with pytest.raises(RangeValidationError, match="Data"):
+        preflight_cell_range(xlsx, "Missing", "B2:E5")
+
+
+@pytest.mark.parametrize("cell_range", ["B0:E5", "@0:E5"])
+def test_apply_reports_validation_error(xlsx, cell_range):
+    result = _apply_color_scale("Data", cell_range, "two_color", "red_green", xlsx, "", None, "range", False, None)
+    assert result["success"] is False
+    assert result.get("code", CODE_INVALID_INPUT) == CODE_INVALID_INPUT
+    assert "单元格范围" in result["error"]
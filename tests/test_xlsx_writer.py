@@ -0,0 +1,205 @@
+"""
+XlsxZipWriter的往返测试：写出的包用zipfile.testzip校验CRC，用openpyxl重新加载
+"""
+import io
+import os
+import zipfile
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from utils.xlsx_writer import DEFAULT_COMPRESS_LEVEL, XlsxZipWriter, ZipWriteOptions, save_workbook, write_options_from_env
+
+
+OPTIONS = [
+    ZipWriteOptions(compress_level=6, threads=1),
+    ZipWriteOptions(compress_level=1, threads=4),
+    ZipWriteOptions(compress_level=0, threads=2),
+]
+
+
+def _check_archive(path, expected):
+    """testzip无CRC错误，成员顺序和内容与expected（名称 -> 字节）一致"""
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == list(expected)
+        for name, data in expected.items():
+            assert archive.read(name) == data
+
+
+def _workbook(rows=200, title="数据"):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = title
+    for r in range(1, rows + 1):
+        ws.append([r, r * 1.5, f"文本{r}", None if r % 7 else "x"])
+    return wb
+
+
+def _check_workbook(path, rows=200, title="数据"):
+    wb = load_workbook(path)
+    ws = wb[title]
+    assert ws.max_row == rows
+    assert [c.value for c in ws[rows]] == [rows, rows * 1.5, f"文本{rows}", None if rows % 7 else "x"]
+    wb.close()
+
+
+def test_default_level_matches_zipfile(monkeypatch):
+    monkeypatch.delenv("XLSX_COMPRESS_LEVEL", raising=False)
+    assert DEFAULT_COMPRESS_LEVEL == 6
+    assert write_options_from_env().compress_level == 6
+    monkeypatch.setenv("XLSX_COMPRESS_LEVEL", "1")
+    assert write_options_from_env().compress_level == 1
+
+
+@pytest.mark.parametrize("options", OPTIONS)
+def test_save_workbook_round_trip(tmp_path, options):
+    path = str(tmp_path / "out.xlsx")
+    save_workbook(_workbook(), path, options)
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+    _check_workbook(path)
+    assert not [name for name in os.listdir(tmp_path) if name != "out.xlsx"]
+
+
+@pytest.mark.parametrize("options", OPTIONS)
+def test_members_of_every_kind(tmp_path, options):
+    big = os.urandom(64) * 8192 + b"<row/>" * 100_000
+    source_file = tmp_path / "member.xml"
+    source_file.write_bytes(big)
+    expected = {
+        "a.xml": b"<a/>",
+        "xl/media/image1.png": os.urandom(2048),
+        "xl/worksheets/sheet1.xml": big,
+        "stream.xml": b"<s>" + b"x" * 300_000 + b"</s>",
+    }
+
+    path = tmp_path / "out.zip"
+    with XlsxZipWriter(str(path), options) as writer:
+        writer.writestr("a.xml", expected["a.xml"])
+        writer.writestr(zipfile.ZipInfo("xl/media/image1.png", (2020, 1, 2, 3, 4, 6)), expected["xl/media/image1.png"])
+        writer.write(str(source_file), "xl/worksheets/sheet1.xml")
+        with writer.open("stream.xml") as stream:
+            stream.write(expected["stream.xml"][:1000])
+            stream.write(expected["stream.xml"][1000:])
+    _check_archive(path, expected)
+
+    with zipfile.ZipFile(path) as archive:
+        image = archive.getinfo("xl/media/image1.png")
+        assert image.compress_type == zipfile.ZIP_STORED
+        assert image.date_time == (2020, 1, 2, 3, 4, 6)
+        if options.compress_level:
+            assert archive.getinfo("a.xml").compress_type == zipfile.ZIP_DEFLATED
+    assert source_file.exists()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".zip-member")]
+
+
+def test_non_ascii_names(tmp_path):
+    expected = {"xl/media/图片.png": b"\x89PNG", "docs/résumé.xml": b"<r/>", "plain.xml": b"<p/>"}
+    path = tmp_path / "out.zip"
+    with XlsxZipWriter(str(path), ZipWriteOptions(threads=1)) as writer:
+        for name, data in expected.items():
+            writer.writestr(name, data)
+    _check_archive(path, expected)
+
+    with zipfile.ZipFile(path) as archive:
+        flags = {info.filename: info.flag_bits & 0x800 for info in archive.infolist()}
+    assert flags == {"xl/media/图片.png": 0x800, "docs/résumé.xml": 0x800, "plain.xml": 0}
+
+
+class _Unseekable(io.RawIOBase):
+    """不可定位的输出流：zipfile写入时改用数据描述符（标志位3）记录CRC和大小"""
+
+    def __init__(self, f):
+        self._f = f
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self._f.write(data)
+
+
+def test_copy_members_written_with_data_descriptors(tmp_path):
+    source = tmp_path / "source.zip"
+    expected = {
+        "a.xml": b"<a>" + b"1" * 5000 + b"</a>",
+        "b.bin": os.urandom(1000),
+        "中文.xml": b"<c/>",
+    }
+    with open(source, "wb") as f, zipfile.ZipFile(_Unseekable(f), "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in expected.items():
+            archive.writestr(name, data)
+
+    with zipfile.ZipFile(source) as archive:
+        assert all(info.flag_bits & 0x08 for info in archive.infolist())
+        path = tmp_path / "out.zip"
+        with XlsxZipWriter(str(path), ZipWriteOptions(threads=2)) as writer:
+            for info in archive.infolist():
+                writer.copy_member(archive, info)
+            writer.writestr("new.xml", b"<n/>")
+    _check_archive(path, {**expected, "new.xml": b"<n/>"})
+
+
+def test_zip64(tmp_path, monkeypatch):
+    # 把ZIP64阈值调小：成员大小、偏移和目录位置都超过阈值，无需写出4GB的文件
+    monkeypatch.setattr(zipfile, "ZIP64_LIMIT", 4096)
+    source = tmp_path / "source.zip"
+    with zipfile.ZipFile(source, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("copied.bin", os.urandom(6000))
+
+    expected = {
+        "small.xml": b"<s/>",
+        "big.bin": os.urandom(10_000),
+        "big.xml": b"<x>" + b"y" * 50_000 + b"</x>",
+    }
+    path = tmp_path / "out.zip"
+    with zipfile.ZipFile(source) as archive, XlsxZipWriter(str(path), ZipWriteOptions(threads=2)) as writer:
+        for name, data in expected.items():
+            writer.writestr(name, data)
+        writer.copy_member(archive, archive.getinfo("copied.bin"))
+        expected["copied.bin"] = archive.read("copied.bin")
+    _check_archive(path, expected)
+
+
+def test_zip64_workbook_reloads(tmp_path, monkeypatch):
+    monkeypatch.setattr(zipfile, "ZIP64_LIMIT", 2048)
+    path = str(tmp_path / "out.xlsx")
+    save_workbook(_workbook(rows=2000), path, ZipWriteOptions(threads=4))
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+    _check_workbook(path, rows=2000)
+
+
+def test_abort_removes_pending_copies(tmp_path):
+    source_file = tmp_path / "sheet.xml"
+    source_file.write_bytes(os.urandom(1024) * 1024)
+    path = tmp_path / "out.zip"
+
+    with pytest.raises(RuntimeError):
+        with XlsxZipWriter(str(path), ZipWriteOptions(threads=2)) as writer:
+            for index in range(6):
+                writer.write(str(source_file), f"xl/worksheets/sheet{index}.xml")
+            with writer.open("stream.xml") as stream:
+                stream.write(b"<s/>")
+            raise RuntimeError("生成失败")
+
+    assert writer._file.closed
+    assert source_file.exists()
+    assert sorted(os.listdir(tmp_path)) == ["out.zip", "sheet.xml"]
+
+
+def test_save_failure_keeps_existing_output(tmp_path, monkeypatch):
+    from openpyxl.writer.excel import ExcelWriter
+
+    path = str(tmp_path / "out.xlsx")
+    save_workbook(_workbook(), path)
+
+    def fail(self, ws):
+        raise ValueError("写sheet失败")
+
+    monkeypatch.setattr(ExcelWriter, "write_worksheet", fail)
+    with pytest.raises(ValueError):
+        save_workbook(_workbook(rows=10), path)
+    _check_workbook(path)
+    assert os.listdir(tmp_path) == ["out.xlsx"]
@@ -1,18 +1,24 @@
 """
 Excel分析工具 - Strands Agent Tool
 """
+import asyncio
 from strands import tool, ToolContext
+from utils.analysis_pool import analyze_files
 from utils.excel_analyzer import analyze_excel_file
+from utils.session_files import FileSelectionError, resolve_session_file, session_file_index
+from utils.tool_result import CODE_INTERNAL, CODE_NOT_FOUND, CODE_TOO_LARGE, encode_tool_result
+from utils.workbook_cache import get_workbook_cache
+from utils.workbook_strategy import WorkbookTooLargeError
 from typing import Optional
 
 
 @tool(context=True)
-def analyze_excel(file_path: str = "", sheet_name: Optional[str] = None, preview_rows: int = 100, tool_context: ToolContext = None) -> dict:
+async def analyze_excel(file_path: str = "", file_id: str = "", sheet_name: Optional[str] = None, preview_rows: int = 100, tool_context: ToolContext = None) -> dict:
     """分析Excel文件结构，返回sheet信息和前N行数据预览。
 
     此工具会读取Excel文件并返回：
     1. 所有sheet的名称列表
-    2. 每个sheet的前N行数据（包含单元格值和数据类型）
+    2. 每个sheet的前N行数据（公式单元格为其计算结果，未计算的公式会单独标出）
     3. 每个sheet的总行数和总列数
     4. Sheet的维度范围
 
@@ -21,51 +27,44 @@ def analyze_excel(file_path: str = "", sheet_name: Optional[str] = None, preview
     - 需要判断哪些行是表头，哪些行是数据
     - 需要确定数据的范围以便应用色阶
 
-    重要：file_path参数可以省略，系统会自动使用用户已上传的文件。
+    重要：file_path参数可以省略，系统会自动使用用户已上传的文件；上传了多个文件时用file_id指定。
 
     Args:
         file_path: Excel文件的完整路径（可选，默认使用已上传的文件）
+        file_id: 已上传文件的ID（如 "f2"，见analyze_all的结果）或文件名，上传了多个文件时必填
         sheet_name: 可选，指定要分析的sheet名称。如果不提供，则分析所有sheet
         preview_rows: 预览的行数，默认100行
 
     Returns:
-        包含sheet列表、数据预览和维度信息的字典，格式如：
-        {
-          "success": true,
-          "data": {
-            "sheets": ["Sheet1", "Sheet2"],
-            "sheet_data": {
-              "Sheet1": {
-                "total_rows": 150,
-                "total_columns": 10,
-                "dimensions": "A1:J150",
-                "preview_rows": [...]
-              }
-            }
-          }
-        }
+        精简格式的结果（v1），短键名含义：c=状态码（0成功，1参数错误，2文件不存在，9内部错误），
+        e=错误信息，ss=sheet列表，sd=各sheet数据，nr=总行数，nc=总列数，dim=维度范围，
+        p=预览行（每行为单元格值列表，从A列开始，null为空单元格，行尾空单元格省略），
+        fc=预览范围内的公式单元格数，ev=没有缓存结果、已按简单聚合补算的公式单元格，
+        uc=没有缓存结果且无法补算的公式单元格（预览中为null，但并非空白数据，最多列出20个），例如：
+        {"v":1,"c":0,"ss":["Sheet1"],"sd":{"Sheet1":{"nr":150,"nc":10,"dim":"A1:J150","p":[["日期","金额"],["2024-01-01",100]]}}}
     """
+    result = await _analyze_excel(file_path, file_id, sheet_name, preview_rows, tool_context)
+    return encode_tool_result("analyze_excel", result, tool_context.invocation_state if tool_context else None)
+
+
+async def _analyze_excel(file_path: str, file_id: str, sheet_name: Optional[str], preview_rows: int, tool_context: Optional[ToolContext]) -> dict:
+    """analyze_excel的实现，返回完整格式的结果"""
     try:
-        # 如果没有提供file_path，尝试从invocation_state获取
+        # 如果没有提供file_path，从会话的上传文件中确定
         actual_file_path = file_path
-        if not file_path or file_path == "":
-            if tool_context and tool_context.invocation_state:
-                uploaded_files = tool_context.invocation_state.get("uploaded_files", {})
-                if uploaded_files:
-                    # 使用第一个上传的文件
-                    actual_file_path = list(uploaded_files.values())[0]
-                else:
-                    return {
-                        "success": False,
-                        "error": "没有找到已上传的文件，请先上传Excel文件"
-                    }
-            else:
+        if not file_path:
+            try:
+                actual_file_path = resolve_session_file(tool_context.invocation_state if tool_context else None, file_id).path
+            except FileSelectionError as e:
                 return {
                     "success": False,
-                    "error": "请提供file_path参数或先上传文件"
+                    "error": str(e)
                 }
 
-        result = analyze_excel_file(actual_file_path, sheet_name, preview_rows)
+        # 解析工作簿是阻塞操作，放到线程中执行，不阻塞事件循环
+        # 本轮的工作簿缓存：后续apply_color_scale复用同一次解析
+        workbook_cache = get_workbook_cache(tool_context.invocation_state if tool_context else None)
+        result = await asyncio.to_thread(analyze_excel_file, actual_file_path, sheet_name, preview_rows, workbook_cache)
         return {
             "success": True,
             "data": result
@@ -73,10 +72,77 @@ def analyze_excel(file_path: str = "", sheet_name: Optional[str] = None, preview
     except FileNotFoundError:
         return {
             "success": False,
+            "code": CODE_NOT_FOUND,
             "error": f"文件不存在: {actual_file_path if 'actual_file_path' in locals() else file_path}"
         }
+    except WorkbookTooLargeError as e:
+        return {
+            "success": False,
+            "code": CODE_TOO_LARGE,
+            "error": str(e)
+        }
     except Exception as e:
         return {
             "success": False,
+            "code": CODE_INTERNAL,
             "error": f"分析失败: {str(e)}"
         }
+
+
+
+@tool(context=True)
+async def analyze_all(preview_rows: int = 5, tool_context: ToolContext = None) -> dict:
+    """并行分析用户上传的所有文件，返回每个文件的文件ID、sheet信息和前N行预览。
+
+    上传了多个文件时先调用此工具：各文件在工作进程中同时分析，总耗时接近最大的那个文件。
+    之后用结果中的文件ID（fid）作为file_id参数调用analyze_excel、summarize_range、apply_color_scale。
+
+    Args:
+        preview_rows: 每个sheet预览的行数，默认5行（需要更多行时对单个文件调用analyze_excel）
+
+    Returns:
+        精简格式的结果（v1），fs=文件列表，每项：fid=文件ID，fn=文件名，fe=该文件的分析错误，
+        其余字段与analyze_excel相同（ss=sheet列表，sd=各sheet数据），例如：
+        {"v":1,"c":0,"fs":[{"fid":"f1","fn":"销售.xlsx","ss":["Sheet1"],"sd":{"Sheet1":{"nr":150,"nc":10,"dim":"A1:J150","p":[["日期","金额"]]}}},
+         {"fid":"f2","fn":"库存.csv","ss":["Sheet1"],"sd":{...}}]}
+    """
+    result = await _analyze_all(preview_rows, tool_context)
+    return encode_tool_result("analyze_all", result, tool_context.invocation_state if tool_context else None)
+
+
+async def _analyze_all(preview_rows: int, tool_context: Optional[ToolContext]) -> dict:
+    """analyze_all的实现，返回完整格式的结果"""
+    index = session_file_index(tool_context.invocation_state if tool_context else None)
+    if not index:
+        return {
+            "success": False,
+            "error": "没有找到已上传的文件，请先上传Excel文件"
+        }
+
+    try:
+        session_files = list(index.values())
+        analyses = await analyze_files([session_file.path for session_file in session_files], preview_rows)
+    except Exception as e:
+        return {
+            "success": False,
+            "code": CODE_INTERNAL,
+            "error": f"分析失败: {str(e)}"
+        }
+
+    # 单个文件失败不影响其他文件，错误放在该文件的结果中
+    files = []
+    for session_file, analysis in zip(session_files, analyses):
+        entry = {"file_id": session_file.file_id, "file_name": session_file.name}
+        if isinstance(analysis, FileNotFoundError):
+            entry["file_error"] = f"文件不存在: {session_file.path}"
+        elif isinstance(analysis, WorkbookTooLargeError):
+            entry["file_error"] = str(analysis)
+        elif isinstance(analysis, BaseException):
+            entry["file_error"] = f"分析失败: {str(analysis)}"
+        else:
+            entry.update(analysis)
+        files.append(entry)
+    return {
+        "success": True,
+        "files": files
+    }
@@ -1,215 +1,723 @@
 """
 色阶应用工具 - Strands Agent Tool
 """
+import asyncio
 from strands import tool, ToolContext
 from openpyxl import load_workbook
-from openpyxl.formatting.rule import ColorScaleRule
+from openpyxl.formatting.rule import Rule
+from openpyxl.utils.cell import column_index_from_string, get_column_letter
 from pathlib import Path
-import re
+from typing import Any, Dict, Hashable, List, Literal, Optional, Tuple
+from utils.cell_range import (
+    count_cells, count_columns, count_rows, group_columns, parse_cell_range, ranges_overlap, split_per_column, split_per_row
+)
+from utils.color_schemes import ROBUST_PERCENTILES, get_scheme_registry
+from utils.csv_color_writer import stream_csv_with_color_scale
+from utils.file_locks import file_lock
+from utils.tool_result import CODE_INTERNAL, CODE_NOT_FOUND, CODE_TOO_LARGE, encode_tool_result
+from utils.format_journal import FormatJournal
+from utils.output_registry import OutputRegistry, file_sha256, rules_sha256
+from utils.range_stats import percentile_anchors
+from utils.session_files import FileSelectionError, resolve_session_file
+from utils.workbook_cache import get_workbook_cache
+from utils.workbook_strategy import STRATEGY_XML_PATCH, WorkbookTooLargeError, workbook_strategy
+from utils.xlsx_converter import CSV_SHEET_NAME
+from utils.xlsx_inspect import RangeValidationError, preflight_cell_range
+from utils.xlsx_patch import add_conditional_formatting, patch_conditional_formatting
+from utils.xlsx_writer import save_workbook
 
 
-# 色阶配置方案
+# 方案注册表在导入时加载一次，同时生成工具参数的可选值枚举
+_scheme_registry = get_scheme_registry()
 COLOR_SCHEMES = {
-    "two_color": {
-        "red_green": {
-            "start_type": "min",
-            "start_color": "F8696B",  # 红色
-            "end_type": "max",
-            "end_color": "63BE7B"  # 绿色
-        },
-        "green_red": {
-            "start_type": "min",
-            "start_color": "63BE7B",  # 绿色
-            "end_type": "max",
-            "end_color": "F8696B"  # 红色
-        },
-        "blue_white_red": {
-            "start_type": "min",
-            "start_color": "5A8AC6",  # 蓝色
-            "end_type": "max",
-            "end_color": "F8696B"  # 红色
-        }
-    },
-    "three_color": {
-        "red_yellow_green": {
-            "start_type": "min",
-            "start_color": "F8696B",  # 红色
-            "mid_type": "percentile",
-            "mid_value": 50,
-            "mid_color": "FFEB84",  # 黄色
-            "end_type": "max",
-            "end_color": "63BE7B"  # 绿色
-        },
-        "green_yellow_red": {
-            "start_type": "min",
-            "start_color": "63BE7B",  # 绿色
-            "mid_type": "percentile",
-            "mid_value": 50,
-            "mid_color": "FFEB84",  # 黄色
-            "end_type": "max",
-            "end_color": "F8696B"  # 红色
-        },
-        "blue_white_red": {
-            "start_type": "min",
-            "start_color": "5A8AC6",  # 蓝色
-            "mid_type": "percentile",
-            "mid_value": 50,
-            "mid_color": "FFFFFF",  # 白色
-            "end_type": "max",
-            "end_color": "F8696B"  # 红色
-        }
-    }
+    scale_type: {name: _scheme_registry.get_config(scale_type, name) for name in _scheme_registry.scheme_names(scale_type)}
+    for scale_type in _scheme_registry.scale_types()
 }
+ScaleType = Literal[tuple(_scheme_registry.scale_types())]
+ColorSchemeName = Literal[tuple(_scheme_registry.scheme_names())]
 
+# 应用模式：range整体共享一个色阶；per_column / per_row 每列 / 每行独立色阶
+ScaleMode = Literal["range", "per_column", "per_row"]
 
-def _calculate_cell_count(cell_range: str) -> int:
-    """计算单元格范围包含的单元格数量"""
-    try:
-        # 解析范围如 "B2:E10"
-        match = re.match(r'([A-Z]+)(\d+):([A-Z]+)(\d+)', cell_range)
-        if not match:
-            return 0
-
-        def col_to_num(col):
-            """列字母转数字 A->1, B->2, ..., Z->26, AA->27"""
-            num = 0
-            for c in col:
-                num = num * 26 + (ord(c) - ord('A') + 1)
-            return num
-
-        start_col, start_row, end_col, end_row = match.groups()
-        cols = col_to_num(end_col) - col_to_num(start_col) + 1
-        rows = int(end_row) - int(start_row) + 1
-        return cols * rows
-    except:
-        return 0
+# 单次调用生成的规则数上限，避免per_row模式在大范围上生成过多条件格式
+MAX_RULES_PER_CALL = 1000
 
+# 结果中列出的robust节点数上限（per_row模式可能有上千条规则）
+MAX_LISTED_ANCHORS = 20
+ROBUST_NOTE = f"，两端固定在P{ROBUST_PERCENTILES[0]}/P{ROBUST_PERCENTILES[1]}"
 
-@tool(context=True)
-def apply_color_scale(
+
+def _column_keys(column_schemes: Optional[Dict[str, str]]) -> Dict[int, str]:
+    """column_schemes的列名转换为列号"""
+    return {column_index_from_string(column.upper()): scheme for column, scheme in (column_schemes or {}).items()}
+
+
+def _build_rule_targets(
+    cell_range: str,
+    scale_type: str,
+    color_scheme: str,
+    column_schemes: Optional[Dict[str, str]] = None,
+    mode: str = "range",
+    anchors: Optional[Dict[Hashable, Tuple[Any, Any]]] = None
+) -> List[Tuple[str, Rule]]:
+    """
+    生成 (单元格范围, 色阶规则) 列表
+
+    range模式：column_schemes中指定的列使用各自的方案，同一方案的列共享一个规则，
+    其余列使用color_scheme共享一个规则
+    per_column / per_row模式：每列 / 每行一个独立规则，各自按自身的最小/最大值着色
+
+    anchors为_robust_anchors的结果时，各规则两端使用其中的固定数值节点（没有对应项的规则保持方案原样）
+    """
+    column_keys = _column_keys(column_schemes)
+    anchors = anchors or {}
+
+    if mode == "per_column":
+        return [
+            (target_range, _scheme_registry.build_rule(scale_type, column_keys.get(col, color_scheme), anchors.get(col)))
+            for col, target_range in split_per_column(cell_range).items()
+        ]
+    if mode == "per_row":
+        return [
+            (target_range, _scheme_registry.build_rule(scale_type, color_scheme, anchors.get(row)))
+            for row, target_range in split_per_row(cell_range).items()
+        ]
+
+    grouped = group_columns(cell_range, column_keys, color_scheme)
+    return [
+        (target_range, _scheme_registry.build_rule(scale_type, scheme, anchors.get(scheme)))
+        for scheme, target_range in grouped.items()
+    ]
+
+
+def _robust_anchors(
+    file_path: str,
     sheet_name: str,
+    cell_range: str,
+    color_scheme: str,
+    column_schemes: Optional[Dict[str, str]],
+    mode: str
+) -> Dict[Hashable, Tuple[Any, Any]]:
+    """
+    一次流式扫描计算robust色阶各规则的两端节点（P5/P95）
+
+    Returns:
+        {规则分组键: (低, 高)}，分组键与_build_rule_targets一致：per_column为列号，per_row为行号，range为方案名
+    """
+    if mode == "per_row":
+        return percentile_anchors(file_path, sheet_name, cell_range, ROBUST_PERCENTILES, by="row")
+    if mode == "per_column":
+        return percentile_anchors(file_path, sheet_name, cell_range, ROBUST_PERCENTILES)
+    if not column_schemes:
+        anchors = percentile_anchors(file_path, sheet_name, cell_range, ROBUST_PERCENTILES, by=None)
+        return {color_scheme: anchors[None]} if None in anchors else {}
+    column_keys = _column_keys(column_schemes)
+    return percentile_anchors(
+        file_path, sheet_name, cell_range, ROBUST_PERCENTILES, key_of=lambda col: column_keys.get(col, color_scheme)
+    )
+
+
+def _anchor_label(key: Hashable, mode: str) -> str:
+    """规则分组键的展示名：per_column为列字母，per_row为行号，range为方案名"""
+    return get_column_letter(key) if mode == "per_column" else str(key)
+
+
+def _describe_anchors(anchors: Dict[Hashable, Tuple[Any, Any]], mode: str) -> Dict[str, List[Any]]:
+    """结果中展示的节点：per_column以列字母、per_row以行号、range以方案名为键"""
+    return {_anchor_label(key, mode): [low, high] for key, (low, high) in list(anchors.items())[:MAX_LISTED_ANCHORS]}
+
+
+def _robust_fallbacks(
+    anchors: Dict[Hashable, Tuple[Any, Any]],
+    cell_range: str,
+    color_scheme: str,
+    column_schemes: Optional[Dict[str, str]],
+    mode: str
+) -> List[str]:
+    """没有得到P5/P95节点（数值过少或两个分位数相等）、两端仍为min/max的规则展示名"""
+    if mode == "per_column":
+        keys = split_per_column(cell_range)
+    elif mode == "per_row":
+        keys = split_per_row(cell_range)
+    else:
+        keys = group_columns(cell_range, _column_keys(column_schemes), color_scheme)
+    return [_anchor_label(key, mode) for key in keys if key not in anchors]
+
+
+def _robust_note(rule_count: int, fallbacks: List[str]) -> str:
+    """说明文字中的robust部分：如实说明哪些规则退回了min/max"""
+    if not fallbacks:
+        return ROBUST_NOTE
+    if len(fallbacks) >= rule_count:
+        return "，数据不足以计算P5/P95（数值过少或两个分位数相等），两端仍为min/max"
+    return f"{ROBUST_NOTE}，其中{len(fallbacks)}条规则数据不足，两端仍为min/max"
+
+
+def _count_rule_targets(cell_range: str, color_scheme: str, column_schemes: Optional[Dict[str, str]], mode: str) -> int:
+    """_build_rule_targets将生成的规则条数（按范围边界计算，不拆分范围、不构建规则）"""
+    if mode == "per_column":
+        return count_columns(cell_range)
+    if mode == "per_row":
+        return count_rows(cell_range)
+
+    # range模式每个方案一条规则：范围内指定了方案的列各归其方案，其余列归color_scheme
+    bounds = parse_cell_range(cell_range)
+    keyed = {
+        col: scheme for col, scheme in _column_keys(column_schemes).items()
+        if any(min_col <= col <= max_col for min_col, _, max_col, _ in bounds)
+    }
+    schemes = set(keyed.values())
+    if len(keyed) < count_columns(cell_range):
+        schemes.add(color_scheme)
+    return len(schemes)
+
+
+def _rule_limit_error(rule_count: int, mode: str) -> Optional[str]:
+    """规则数超过单次调用上限时的错误信息"""
+    if rule_count > MAX_RULES_PER_CALL:
+        return f"{mode}模式将生成{rule_count}条规则，超过上限{MAX_RULES_PER_CALL}，请缩小范围"
+    return None
+
+
+def _validate_rule_layout(
     cell_range: str,
     scale_type: str,
     color_scheme: str,
-    file_path: str = "",
-    tool_context: ToolContext = None
+    column_schemes: Optional[Dict[str, str]],
+    mode: str
+) -> Optional[str]:
+    """校验应用模式和逐列方案：列必须位于cell_range内，方案必须属于scale_type，规则数不超过上限"""
+    if mode == "per_row" and column_schemes:
+        return "per_row模式不支持column_schemes，请使用range或per_column模式"
+
+    if column_schemes:
+        bounds = parse_cell_range(cell_range)
+        for column, scheme in column_schemes.items():
+            try:
+                col_idx = column_index_from_string(column.upper())
+            except ValueError:
+                return f"column_schemes中的列名不合法: {column}"
+            if not any(min_col <= col_idx <= max_col for min_col, _, max_col, _ in bounds):
+                return f"column_schemes中的列 {column} 不在范围 {cell_range} 内"
+            error = _scheme_registry.validate(scale_type, scheme)
+            if error:
+                return error
+
+    return _rule_limit_error(_count_rule_targets(cell_range, color_scheme, column_schemes, mode), mode)
+
+
+def _add_rules(worksheet, rule_targets: List[Tuple[str, Rule]]):
+    """把(范围, 规则)列表写入worksheet的条件格式"""
+    for target_range, color_scale_rule in rule_targets:
+        worksheet.conditional_formatting.add(target_range, color_scale_rule)
+
+
+def _journal_params(
+    sheet_name: str,
+    cell_range: str,
+    scale_type: str,
+    color_scheme: str,
+    column_schemes: Optional[Dict[str, str]],
+    mode: str,
+    robust: bool = False
 ) -> dict:
-    """为Excel文件的指定范围应用色阶条件格式。
+    """日志中记录的规则参数（足以重新生成条件格式；robust节点在重新生成时按原文件重新计算）"""
+    return {
+        "sheet_name": sheet_name,
+        "cell_range": cell_range,
+        "scale_type": scale_type,
+        "color_scheme": color_scheme,
+        "column_schemes": column_schemes or None,
+        "mode": mode,
+        "robust": robust or None
+    }
 
-    此工具会：
-    1. 加载指定的Excel文件
-    2. 在指定的sheet和单元格范围应用色阶
-    3. 保存为新文件（文件名后缀_colored）
-    4. 返回新文件路径
 
-    使用建议：
-    - 先使用 analyze_excel 工具分析文件结构
-    - 根据分析结果确定数据范围（跳过表头）
-    - 数值数据适合应用色阶，文本数据不适合
+def _regenerate_output(output_file: str, output: Dict[str, Any]) -> int:
+    """
+    按规则记录从原文件一次性重新生成输出文件（单次XML补丁写入，不加载工作簿）
 
-    重要：file_path参数可以省略，系统会自动使用用户已上传的文件。
+    输出登记表中该文件已由相同的原文件和规则集生成（如replace成原有参数）时不重新写入
 
     Args:
-        sheet_name: Sheet名称（如 "Sheet1"）
-        cell_range: 单元格范围，格式如 "B2:E10"（注意要跳过表头）
-        scale_type: 色阶类型，"two_color"（双色渐变）或 "three_color"（三色渐变：低-中-高）
-        color_scheme: 色彩方案。two_color方案: "red_green"（红→绿）, "green_red"（绿→红）；three_color方案: "red_yellow_green"（红→黄→绿）, "green_yellow_red"（绿→黄→红）
-        file_path: Excel文件完整路径（可选，默认使用已上传的文件）
+        output_file: 输出文件
+        output: {"base_file": 原文件, "entries": [规则记录]}（日志中的格式，可以是尚未写入日志的修改结果）
 
     Returns:
-        执行结果字典，格式如：
-        {
-          "success": true,
-          "output_file": "/path/to/file_colored.xlsx",
-          "sheet_name": "Sheet1",
-          "applied_range": "B2:E50",
-          "affected_cells": 196,
-          "message": "已为 Sheet1 的 B2:E50 区域（196个单元格）应用three_color色阶"
-        }
+        写入的条件格式规则条数
+    """
+    existing = OutputRegistry.for_file(output_file).find(file_sha256(output["base_file"]), rules_sha256(output["entries"]))
+    if existing is not None and existing[0] == output_file and existing[1].get("rule_count") is not None:
+        return existing[1]["rule_count"]
+
+    rules_by_sheet: Dict[str, List[Tuple[str, Rule]]] = {}
+    for entry in output["entries"]:
+        mode = entry.get("mode", "range")
+        anchors = _robust_anchors(
+            output["base_file"], entry["sheet_name"], entry["cell_range"], entry["color_scheme"], entry.get("column_schemes"), mode
+        ) if entry.get("robust") else None
+        rules_by_sheet.setdefault(entry["sheet_name"], []).extend(_build_rule_targets(
+            entry["cell_range"],
+            entry["scale_type"],
+            entry["color_scheme"],
+            entry.get("column_schemes"),
+            mode,
+            anchors
+        ))
+    patch_conditional_formatting(output["base_file"], output_file, rules_by_sheet)
+    return sum(len(rule_targets) for rule_targets in rules_by_sheet.values())
+
+
+def _replace_rules(journal: FormatJournal, output_file: str, rule_ids: List[str], params: Dict[str, Any]) -> Tuple[str, int]:
+    """
+    用params替换输出上的若干条规则：按替换后的规则集从原文件重新生成输出，写入成功后再修改日志
+
+    Returns:
+        (新规则ID, 输出中的规则总条数)
+    """
+    output = journal.outputs()[output_file]
+    entries = [entry for entry in output["entries"] if entry["rule_id"] not in rule_ids] + [params]
+    total_rules = _regenerate_output(output_file, {**output, "entries": entries})
+    for rule_id in rule_ids:
+        journal.remove(rule_id)
+    return journal.record(output_file, output["base_file"], params), total_rules
+
+
+def _register_output(
+    output_file: str,
+    tool_name: str,
+    tool_context: Optional[ToolContext],
+    rule_count: int,
+    journal: Optional[FormatJournal] = None
+):
     """
+    在会话的输出登记表中登记刚写入的输出文件
+
+    有条件格式日志时同时记录输入指纹（原文件内容哈希 + 输出上完整规则集的哈希），
+    之后输入和规则集都相同的调用可以直接复用该输出
+    """
+    input_hash = rules_hash = None
+    output = journal.outputs().get(output_file) if journal else None
+    if output is not None:
+        input_hash = file_sha256(output["base_file"])
+        rules_hash = rules_sha256(output["entries"])
+    tool_use_id = tool_context.tool_use.get("toolUseId") if tool_context and tool_context.tool_use else None
+    OutputRegistry.for_file(output_file).record(output_file, tool_name, tool_use_id, input_hash, rules_hash, rule_count)
+
+
+def _find_memoized(
+    journal: FormatJournal,
+    output_file: str,
+    base_file: str,
+    params: Dict[str, Any],
+    stacking: bool
+) -> Optional[Tuple[str, int]]:
+    """
+    查找可直接复用的输出（如模型在回复被截断后重试同一调用）
+
+    键为原文件内容哈希 + 规范化的规则集：从原文件开始时规则集为[params]；本轮叠加时日志中最后一条规则
+    与params相同才视为重试。输出登记表确认输出文件由相同内容的原文件按该规则集生成、且之后未被修改
+
+    Returns:
+        (规则ID, 输出中的规则总条数)，不可复用时返回None
+    """
+    output = journal.outputs().get(output_file)
+    if output is None or output["base_file"] != base_file or not output["entries"]:
+        return None
+    entries = output["entries"]
+    if rules_sha256(entries[-1:]) != rules_sha256([params]) or (not stacking and len(entries) != 1):
+        return None
+    existing = OutputRegistry.for_file(output_file).find(file_sha256(base_file), rules_sha256(entries))
+    if existing is None or existing[0] != output_file or existing[1].get("rule_count") is None:
+        return None
+    return entries[-1]["rule_id"], existing[1]["rule_count"]
+
+
+def _written_outputs(tool_context: Optional[ToolContext]) -> set:
+    """本轮调用中已写过的输出文件集合（保存在invocation_state中，每轮对话重新开始）"""
+    if tool_context is None or tool_context.invocation_state is None:
+        return set()
+    return tool_context.invocation_state.setdefault("written_outputs", set())
+
+
+class _RuleLimitExceeded(Exception):
+    """CSV自动计算的范围生成的规则数超过上限"""
+
+
+def _apply_color_scale_to_csv(
+    csv_path: str,
+    cell_range: str,
+    scale_type: str,
+    color_scheme: str,
+    column_schemes: Optional[Dict[str, str]] = None,
+    mode: str = "range",
+    anchor_source: Optional[str] = None
+) -> dict:
+    """
+    CSV源文件的流式刷色阶路径，cell_range为空或"auto"时自动计算数值列范围
+
+    anchor_source为上传时转换的xlsx时，按其中的数据计算robust节点
+    """
+    path = Path(csv_path)
+    output_file = str(path.parent / f"{path.stem}_colored.xlsx")
+    anchors = {}
+    rule_targets = []
+
+    def build_targets(applied_range: str) -> List[Tuple[str, Rule]]:
+        # 自动计算的范围在写完所有行后才确定，此时再检查规则数（尚未写出文件）
+        error = _rule_limit_error(_count_rule_targets(applied_range, color_scheme, column_schemes, mode), mode)
+        if error:
+            raise _RuleLimitExceeded(error)
+        if anchor_source:
+            anchors.update(_robust_anchors(anchor_source, CSV_SHEET_NAME, applied_range, color_scheme, column_schemes, mode))
+        rule_targets.extend(_build_rule_targets(applied_range, scale_type, color_scheme, column_schemes, mode, anchors))
+        return rule_targets
+
+    requested_range = None if not cell_range or cell_range.lower() == "auto" else cell_range
+    try:
+        result = stream_csv_with_color_scale(csv_path, output_file, build_targets, requested_range)
+    except _RuleLimitExceeded as e:
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+    applied_range = result["applied_range"]
+    if not applied_range:
+        return {
+            "success": False,
+            "error": "CSV中没有找到数值数据，无法应用色阶"
+        }
+
+    cell_count = count_cells(applied_range)
+    sheet_name = result["sheet_name"]
+    fallbacks = _robust_fallbacks(anchors, applied_range, color_scheme, column_schemes, mode) if anchor_source else []
+    return {
+        "success": True,
+        "output_file": output_file,
+        "sheet_name": sheet_name,
+        "applied_range": applied_range,
+        "affected_cells": cell_count,
+        "scale_type": scale_type,
+        "color_scheme": color_scheme,
+        "mode": mode,
+        "robust": bool(anchors) or None,
+        "anchors": _describe_anchors(anchors, mode) or None,
+        "robust_fallback": fallbacks[:MAX_LISTED_ANCHORS] or None,
+        "rule_count": len(rule_targets),
+        "message": (
+            f"已为 {sheet_name} 的 {applied_range} 区域（{cell_count}个单元格）应用{scale_type}色阶"
+            f"（{mode}模式{_robust_note(len(rule_targets), fallbacks) if anchor_source else ''}）"
+        )
+    }
+
+
+def _apply_result(
+    output_file: str,
+    sheet_name: str,
+    cell_range: str,
+    scale_type: str,
+    color_scheme: str,
+    mode: str,
+    robust: bool,
+    anchors: Dict[Hashable, Tuple[Any, Any]],
+    fallbacks: List[str],
+    rule_count: int,
+    rule_id: str,
+    strategy: str,
+    corrections: List[str]
+) -> dict:
+    """apply_color_scale成功时的结果（fallbacks为robust时退回min/max的规则）"""
+    cell_count = count_cells(cell_range)
+    reused = "，与已有输出相同，直接复用" if strategy == "memoized" else ""
+    result = {
+        "success": True,
+        "output_file": output_file,
+        "sheet_name": sheet_name,
+        "applied_range": cell_range,
+        "affected_cells": cell_count,
+        "scale_type": scale_type,
+        "color_scheme": color_scheme,
+        "mode": mode,
+        "robust": bool(anchors) or None,
+        "anchors": _describe_anchors(anchors, mode) or None,
+        "robust_fallback": fallbacks[:MAX_LISTED_ANCHORS] or None,
+        "rule_count": rule_count,
+        "rule_id": rule_id,
+        "strategy": strategy,
+        "message": (
+            f"已为 {sheet_name} 的 {cell_range} 区域（{cell_count}个单元格）应用{scale_type}色阶"
+            f"（{mode}模式，{rule_count}条规则{_robust_note(rule_count, fallbacks) if robust else ''}{reused}）"
+        )
+    }
+    if corrections:
+        result["corrections"] = corrections
+    return result
+
+
+def _apply_color_scale(
+    sheet_name: str,
+    cell_range: str,
+    scale_type: str,
+    color_scheme: str,
+    file_path: str,
+    file_id: str,
+    column_schemes: Optional[Dict[str, str]],
+    mode: str,
+    robust: bool,
+    tool_context: Optional[ToolContext]
+) -> dict:
+    """apply_color_scale的同步实现（在工作线程中执行）"""
     try:
-        # 如果没有提供file_path，尝试从invocation_state获取
+        # 如果没有提供file_path，从会话的上传文件中确定
         actual_file_path = file_path
-        if not file_path or file_path == "":
-            if tool_context and tool_context.invocation_state:
-                uploaded_files = tool_context.invocation_state.get("uploaded_files", {})
-                if uploaded_files:
-                    # 使用第一个上传的文件
-                    actual_file_path = list(uploaded_files.values())[0]
-                else:
-                    return {
-                        "success": False,
-                        "error": "没有找到已上传的文件，请先上传Excel文件"
-                    }
-            else:
+        # 日志中用于重新生成输出的xlsx原文件（CSV上传时为转换后的xlsx）
+        base_file = file_path
+        if not file_path:
+            try:
+                session_file = resolve_session_file(tool_context.invocation_state if tool_context else None, file_id)
+            except FileSelectionError as e:
                 return {
                     "success": False,
-                    "error": "请提供file_path参数或先上传文件"
+                    "error": str(e)
                 }
+            base_file = session_file.path
+            # CSV上传时优先使用原始CSV，走流式写入路径
+            actual_file_path = session_file.source
 
-        # 验证参数
-        if scale_type not in COLOR_SCHEMES:
+        # 验证参数（在加载工作簿之前完成）
+        error = _scheme_registry.validate(scale_type, color_scheme)
+        if error:
             return {
                 "success": False,
-                "error": f"不支持的色阶类型: {scale_type}，支持的类型: {list(COLOR_SCHEMES.keys())}"
+                "error": error
             }
 
-        if color_scheme not in COLOR_SCHEMES[scale_type]:
-            return {
-                "success": False,
-                "error": f"不支持的色彩方案: {color_scheme}，支持的方案: {list(COLOR_SCHEMES[scale_type].keys())}"
-            }
+        # CSV源文件：流式写入xlsx，不在内存中构建完整工作簿
+        is_csv = Path(actual_file_path).suffix.lower() == ".csv"
 
-        # 加载工作簿
-        wb = load_workbook(actual_file_path)
+        # 预检sheet名称和范围：只读取workbook.xml和dimension记录，失败时无需加载工作簿
+        corrections = []
+        if not is_csv:
+            try:
+                checked = preflight_cell_range(actual_file_path, sheet_name, cell_range)
+            except RangeValidationError as e:
+                return {
+                    "success": False,
+                    "error": str(e)
+                }
+            sheet_name = checked["sheet_name"]
+            cell_range = checked["cell_range"]
+            corrections = checked["corrections"]
+
+        if not (is_csv and cell_range.lower() == "auto"):
+            error = _validate_rule_layout(cell_range, scale_type, color_scheme, column_schemes, mode)
+            if error:
+                return {
+                    "success": False,
+                    "error": error
+                }
 
-        # 检查sheet是否存在
-        if sheet_name not in wb.sheetnames:
+        # robust节点按xlsx数据计算；CSV源文件使用上传时转换的xlsx
+        if robust and Path(base_file).suffix.lower() != ".xlsx":
             return {
                 "success": False,
-                "error": f"Sheet '{sheet_name}' 不存在。可用的sheet: {', '.join(wb.sheetnames)}"
+                "error": "robust模式需要xlsx格式的数据，请先上传文件（CSV会自动转换）后再使用"
             }
 
-        ws = wb[sheet_name]
+        # 生成输出文件名
+        path = Path(actual_file_path)
+        output_file = str(path.parent / f"{path.stem}_colored{'.xlsx' if is_csv else path.suffix}")
 
-        # 获取色阶配置
-        scheme_config = COLOR_SCHEMES[scale_type][color_scheme]
+        journal = FormatJournal.for_file(output_file)
 
-        # 创建色阶规则
-        color_scale_rule = ColorScaleRule(**scheme_config)
+        # 同一输出文件的读改写串行执行，并发的工具调用不会互相覆盖
+        with file_lock(output_file):
+            if is_csv:
+                result = _apply_color_scale_to_csv(
+                    actual_file_path, cell_range, scale_type, color_scheme, column_schemes, mode, base_file if robust else None
+                )
+                # 有转换后的xlsx时记录日志，之后可按日志从该xlsx重新生成
+                journaled = result["success"] and Path(base_file).suffix.lower() == ".xlsx"
+                if journaled:
+                    journal.start(output_file, base_file)
+                    result["rule_id"] = journal.record(output_file, base_file, _journal_params(
+                        result["sheet_name"], result["applied_range"], scale_type, color_scheme, column_schemes, mode, robust
+                    ))
+                if result["success"]:
+                    _register_output(output_file, "apply_color_scale", tool_context, result["rule_count"], journal if journaled else None)
+                return result
 
-        # 应用色阶
-        ws.conditional_formatting.add(cell_range, color_scale_rule)
+            # 本轮已写过该输出文件时在其基础上叠加（如同一轮为多个sheet刷色阶），否则从原文件开始
+            written_outputs = _written_outputs(tool_context)
+            source_file = output_file if output_file in written_outputs else actual_file_path
+            params = _journal_params(sheet_name, cell_range, scale_type, color_scheme, column_schemes, mode, robust)
 
-        # 生成输出文件名
-        path = Path(actual_file_path)
-        output_file = str(path.parent / f"{path.stem}_colored{path.suffix}")
+            # 相同内容的原文件按相同规则集已生成过该输出时直接返回，不加载、不写入工作簿
+            memoized = _find_memoized(journal, output_file, actual_file_path, params, stacking=source_file == output_file)
+            if memoized is not None:
+                rule_id, total_rules = memoized
+                written_outputs.add(output_file)
+                _register_output(output_file, "apply_color_scale", tool_context, total_rules, journal)
+                # 不重新写入，但robust节点仍需计算才能如实报告两端取值
+                anchors = _robust_anchors(actual_file_path, sheet_name, cell_range, color_scheme, column_schemes, mode) if robust else {}
+                fallbacks = _robust_fallbacks(anchors, cell_range, color_scheme, column_schemes, mode) if robust else []
+                return _apply_result(
+                    output_file, sheet_name, cell_range, scale_type, color_scheme, mode, robust, anchors, fallbacks,
+                    _count_rule_targets(cell_range, color_scheme, column_schemes, mode), rule_id, "memoized", corrections
+                )
 
-        # 保存到新文件
-        wb.save(output_file)
-        wb.close()
+            # 本轮已写过的输出上，同一sheet中与已有规则范围重叠的调用视为对那些规则的修正（如换方案重试）：
+            # 替换而不是叠加，否则同一范围上会有两个互相冲突的色阶
+            if source_file == output_file:
+                overlapping = [
+                    entry["rule_id"] for entry in journal.entries(output_file)
+                    if entry["sheet_name"] == sheet_name and ranges_overlap(entry["cell_range"], cell_range)
+                ]
+                if overlapping:
+                    rule_id, total_rules = _replace_rules(journal, output_file, overlapping, params)
+                    written_outputs.add(output_file)
+                    _register_output(output_file, "apply_color_scale", tool_context, total_rules, journal)
+                    workbook_cache = get_workbook_cache(tool_context.invocation_state if tool_context else None)
+                    if workbook_cache:
+                        workbook_cache.invalidate(output_file)
+                    anchors = _robust_anchors(actual_file_path, sheet_name, cell_range, color_scheme, column_schemes, mode) if robust else {}
+                    fallbacks = _robust_fallbacks(anchors, cell_range, color_scheme, column_schemes, mode) if robust else []
+                    corrections.append(f"替换了本轮之前应用在重叠范围上的规则 {', '.join(overlapping)}")
+                    return _apply_result(
+                        output_file, sheet_name, cell_range, scale_type, color_scheme, mode, robust, anchors, fallbacks,
+                        _count_rule_targets(cell_range, color_scheme, column_schemes, mode), rule_id, STRATEGY_XML_PATCH, corrections
+                    )
 
-        # 计算影响的单元格数量
-        cell_count = _calculate_cell_count(cell_range)
+            # 叠加时输出中已有的规则条数（登记表中记录的是输出的规则总数）
+            previous_rules = 0
+            if source_file == actual_file_path:
+                journal.start(output_file, actual_file_path)
+            else:
+                previous_rules = (OutputRegistry.for_file(output_file).get(output_file) or {}).get("rule_count") or 0
 
-        return {
-            "success": True,
-            "output_file": output_file,
-            "sheet_name": sheet_name,
-            "applied_range": cell_range,
-            "affected_cells": cell_count,
-            "scale_type": scale_type,
-            "color_scheme": color_scheme,
-            "message": f"已为 {sheet_name} 的 {cell_range} 区域（{cell_count}个单元格）应用{scale_type}色阶"
-        }
+            # robust：一次流式扫描原文件得到各规则的P5/P95（输出文件中的数据与原文件相同）
+            anchors = _robust_anchors(actual_file_path, sheet_name, cell_range, color_scheme, column_schemes, mode) if robust else {}
+            fallbacks = _robust_fallbacks(anchors, cell_range, color_scheme, column_schemes, mode) if robust else []
+
+            # 应用色阶（规则基于注册表中预构建的模板，所有规则一次写入）
+            rule_targets = _build_rule_targets(cell_range, scale_type, color_scheme, column_schemes, mode, anchors)
+
+            # 本轮缓存中已解析的工作簿（如analyze_excel刚分析过）直接复用，写入后缓存迁移到输出文件
+            workbook_cache = get_workbook_cache(tool_context.invocation_state if tool_context else None)
+            wb = workbook_cache.open(source_file) if workbook_cache else None
+            if wb is not None:
+                strategy = "cached"
+                try:
+                    _add_rules(wb[sheet_name], rule_targets)
+                    save_workbook(wb, output_file)
+                except Exception:
+                    # 内存中的工作簿已被修改但未成功写盘，不能再代表源文件
+                    workbook_cache.invalidate(source_file)
+                    raise
+                workbook_cache.move(source_file, output_file)
+            else:
+                # 按解压后大小选择策略：小文件openpyxl完整加载，大文件直接修补sheet XML
+                with workbook_strategy(source_file, "apply") as strategy:
+                    if strategy == STRATEGY_XML_PATCH:
+                        add_conditional_formatting(source_file, output_file, sheet_name, rule_targets)
+                    else:
+                        # 加载工作簿（sheet已在预检中确认存在）
+                        wb = load_workbook(source_file)
+                        _add_rules(wb[sheet_name], rule_targets)
+
+                        # 保存到新文件
+                        save_workbook(wb, output_file)
+                        wb.close()
+            written_outputs.add(output_file)
+            rule_id = journal.record(output_file, actual_file_path, params)
+            _register_output(output_file, "apply_color_scale", tool_context, previous_rules + len(rule_targets), journal)
+
+        return _apply_result(
+            output_file, sheet_name, cell_range, scale_type, color_scheme, mode, robust, anchors, fallbacks,
+            len(rule_targets), rule_id, strategy, corrections
+        )
 
     except FileNotFoundError:
         return {
             "success": False,
+            "code": CODE_NOT_FOUND,
             "error": f"文件不存在: {actual_file_path if 'actual_file_path' in locals() else file_path}"
         }
+    except WorkbookTooLargeError as e:
+        return {
+            "success": False,
+            "code": CODE_TOO_LARGE,
+            "error": str(e)
+        }
     except Exception as e:
         return {
             "success": False,
+            "code": CODE_INTERNAL,
             "error": f"应用色阶失败: {str(e)}"
         }
+
+
+@tool(context=True)
+async def apply_color_scale(
+    sheet_name: str,
+    cell_range: str,
+    scale_type: ScaleType,
+    color_scheme: ColorSchemeName,
+    file_path: str = "",
+    file_id: str = "",
+    column_schemes: Optional[Dict[str, ColorSchemeName]] = None,
+    mode: ScaleMode = "range",
+    robust: bool = False,
+    tool_context: ToolContext = None
+) -> dict:
+    """为Excel文件的指定范围应用色阶条件格式。
+
+    此工具会：
+    1. 加载指定的Excel文件
+    2. 在指定的sheet和单元格范围应用色阶
+    3. 保存为新文件（文件名后缀_colored）
+    4. 返回新文件路径
+
+    使用建议：
+    - 先使用 analyze_excel 工具分析文件结构
+    - 根据分析结果确定数据范围（跳过表头）
+    - 数值数据适合应用色阶，文本数据不适合
+
+    重要：file_path参数可以省略，系统会自动使用用户已上传的文件；上传了多个文件时用file_id指定。
+
+    Args:
+        sheet_name: Sheet名称（如 "Sheet1"）
+        cell_range: 单元格范围，格式如 "B2:E10"（注意要跳过表头）。源文件为CSV时可传 "auto" 自动识别数值列
+        scale_type: 色阶类型，"two_color"（双色渐变）或 "three_color"（三色渐变：低-中-高）
+        color_scheme: 色彩方案。two_color方案: "red_green"（红→绿）, "green_red"（绿→红）；three_color方案: "red_yellow_green"（红→黄→绿）, "green_yellow_red"（绿→黄→红），
+            "red_white_green_zero" / "blue_white_red_zero"（中间节点固定在0，用于正负值混合的数据）
+        file_path: Excel文件完整路径（可选，默认使用已上传的文件）
+        file_id: 已上传文件的ID（如 "f2"，见analyze_all的结果）或文件名，上传了多个文件时必填
+        column_schemes: 可选，为个别列指定不同的色彩方案，如 {"D": "green_yellow_red"}（成本列反向着色），列必须在cell_range内
+        mode: 应用模式。"range"（默认，整个范围共享最小/最大值）；"per_column"（每列独立着色，一次调用完成多列）；"per_row"（每行独立着色）
+        robust: 是否抗离群值。True时先流式扫描范围，把每条规则的两端节点固定为该规则数据的P5/P95数值，
+            超出的离群值取端点颜色，不再把大部分单元格挤成相近颜色（summarize_range报告离群值较多时使用）
+
+    Returns:
+        精简格式的结果（v1），短键名含义：c=状态码（0成功，1参数错误，2文件不存在，3文件过大，9内部错误），
+        e=错误信息，f=输出文件，s=sheet名，r=实际应用的范围，n=影响的单元格数，k=规则条数，
+        id=规则ID（供revise_color_scale使用），fix=自动修正说明，rb=是否有规则使用了robust节点，an=robust的两端节点数值，
+        rbf=数据不足（数值过少或P5=P95）、两端仍为min/max的规则，例如：
+        {"v":1,"c":0,"f":"/path/to/file_colored.xlsx","s":"Sheet1","r":"B2:E50","n":196,"st":"three_color","cs":"red_yellow_green","md":"range","k":1,"id":"r1"}
+    """
+    # 读写工作簿是阻塞操作，放到线程中执行，不阻塞事件循环上的其他Agent流
+    result = await asyncio.to_thread(
+        _apply_color_scale,
+        sheet_name,
+        cell_range,
+        scale_type,
+        color_scheme,
+        file_path,
+        file_id,
+        column_schemes,
+        mode,
+        robust,
+        tool_context
+    )
+    return encode_tool_result("apply_color_scale", result, tool_context.invocation_state if tool_context else None)
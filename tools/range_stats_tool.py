@@ -0,0 +1,85 @@
+"""
+范围统计工具 - Strands Agent Tool
+"""
+import asyncio
+from strands import tool, ToolContext
+from utils.range_stats import compute_range_stats
+from utils.session_files import FileSelectionError, resolve_session_file
+from utils.tool_result import CODE_INTERNAL, CODE_NOT_FOUND, encode_tool_result
+from utils.xlsx_inspect import RangeValidationError, preflight_cell_range
+from typing import Optional
+
+
+@tool(context=True)
+async def summarize_range(sheet_name: str, cell_range: str, file_path: str = "", file_id: str = "", tool_context: ToolContext = None) -> dict:
+    """统计单元格范围的数值分布（最小/最大/分位数/离群值比例），并建议色阶类型和节点。
+
+    一次流式扫描，百万级单元格也能很快完成。用于在应用色阶之前判断：
+    - 是否有正负值混合（适合中间节点固定为0的三色阶）
+    - 是否有离群值（min/max节点会被拉偏，大部分单元格颜色接近）
+    - 分布是否偏斜（三色阶的中位数中点更合适）
+
+    重要：file_path参数可以省略，系统会自动使用用户已上传的文件；上传了多个文件时用file_id指定。
+
+    Args:
+        sheet_name: sheet名称
+        cell_range: 单元格范围（如 "B2:E150"，可含多个范围，空格分隔），应跳过表头
+        file_path: Excel文件完整路径（可选，默认使用已上传的文件）
+        file_id: 已上传文件的ID（如 "f2"）或文件名，上传了多个文件时必填
+
+    Returns:
+        精简格式的结果（v1），短键名含义：nn=数值单元格数，tc=范围内单元格总数，
+        q=分位数（p5/p25/p50/p75/p95，超过20000个值时为抽样估计），of=离群值比例，neg=负值比例，
+        sg=建议（st=色阶类型，css=节点与建议一致的色彩方案，rb=true时需传robust=true，sp=各节点的类型和值，reason=原因），
+        按sg调用apply_color_scale时从css中按业务含义选择方案，例如：
+        {"v":1,"c":0,"s":"Sheet1","cr":"B2:D100","nn":297,"tc":297,"min":3,"max":980,"mean":52.1,"std":88.4,
+         "q":{"p5":5,"p25":12,"p50":30,"p75":61,"p95":140},"of":0.04,"neg":0,
+         "sg":{"st":"three_color","rb":true,"css":["red_yellow_green","green_yellow_red","blue_white_red"],"sp":{"start":{"type":"num","value":5},"mid":{"type":"percentile","value":50},"end":{"type":"num","value":140}},"reason":"..."}}
+    """
+    result = await asyncio.to_thread(_summarize_range, sheet_name, cell_range, file_path, file_id, tool_context)
+    return encode_tool_result("summarize_range", result, tool_context.invocation_state if tool_context else None)
+
+
+def _summarize_range(sheet_name: str, cell_range: str, file_path: str, file_id: str, tool_context: Optional[ToolContext]) -> dict:
+    """summarize_range的同步实现（在工作线程中执行）"""
+    try:
+        actual_file_path = file_path
+        if not actual_file_path:
+            try:
+                actual_file_path = resolve_session_file(tool_context.invocation_state if tool_context else None, file_id).path
+            except FileSelectionError as e:
+                return {
+                    "success": False,
+                    "error": str(e)
+                }
+
+        # 与apply_color_scale相同的预检：修正sheet名称大小写、超出数据区的范围等
+        try:
+            checked = preflight_cell_range(actual_file_path, sheet_name, cell_range)
+        except RangeValidationError as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
+        stats = compute_range_stats(actual_file_path, checked["sheet_name"], checked["cell_range"])
+        return {
+            "success": True,
+            "sheet_name": checked["sheet_name"],
+            "cell_range": checked["cell_range"],
+            "corrections": checked["corrections"] or None,
+            **stats
+        }
+
+    except FileNotFoundError:
+        return {
+            "success": False,
+            "code": CODE_NOT_FOUND,
+            "error": f"文件不存在: {file_path or actual_file_path}"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "code": CODE_INTERNAL,
+            "error": f"统计失败: {str(e)}"
+        }
@@ -0,0 +1,220 @@
+"""
+色阶修改工具 - Strands Agent Tool
+基于条件格式日志撤销或替换已应用的色阶，一次写入重新生成输出文件
+"""
+import asyncio
+from strands import tool, ToolContext
+from typing import Dict, Literal, Optional
+from tools.color_scale_tool import (
+    ColorSchemeName,
+    ScaleMode,
+    ScaleType,
+    _regenerate_output,
+    _register_output,
+    _scheme_registry,
+    _validate_rule_layout,
+    _written_outputs,
+)
+from utils.file_locks import file_lock
+from utils.format_journal import FormatJournal
+from utils.tool_result import CODE_INTERNAL, CODE_NOT_FOUND, encode_tool_result
+from utils.workbook_cache import get_workbook_cache
+from utils.xlsx_inspect import RangeValidationError, preflight_cell_range
+
+
+ReviseAction = Literal["list", "remove", "replace"]
+
+
+def _format_rules(journal: FormatJournal) -> list:
+    """日志内容转换为返回给模型的列表"""
+    return [
+        {
+            "output_file": output_file,
+            "rules": [
+                {key: value for key, value in entry.items() if key != "created_at" and value is not None}
+                for entry in output["entries"]
+            ]
+        }
+        for output_file, output in journal.outputs().items()
+    ]
+
+
+def _revise_color_scale(
+    action: str,
+    rule_id: str,
+    changes: Dict[str, object],
+    file_path: str,
+    tool_context: Optional[ToolContext]
+) -> dict:
+    """revise_color_scale的同步实现（在工作线程中执行）"""
+    try:
+        # 日志位于会话目录，通过file_path或已上传文件定位
+        target_file = file_path
+        if not target_file:
+            uploaded_files = (tool_context.invocation_state or {}).get("uploaded_files", {}) if tool_context else {}
+            if not uploaded_files:
+                return {
+                    "success": False,
+                    "error": "没有找到已上传的文件，请先上传Excel文件"
+                }
+            target_file = list(uploaded_files.values())[0]
+        journal = FormatJournal.for_file(target_file)
+
+        if action == "list":
+            return {
+                "success": True,
+                "outputs": _format_rules(journal)
+            }
+
+        if not rule_id:
+            return {
+                "success": False,
+                "error": "remove / replace 需要提供rule_id，可先用 action=\"list\" 查看已应用的规则"
+            }
+        output_file = journal.find(rule_id)
+        if output_file is None:
+            return {
+                "success": False,
+                "code": CODE_NOT_FOUND,
+                "error": f"规则 {rule_id} 不存在，可先用 action=\"list\" 查看已应用的规则"
+            }
+
+        with file_lock(output_file):
+            output = journal.outputs()[output_file]
+            if action == "remove":
+                entries = [entry for entry in output["entries"] if entry["rule_id"] != rule_id]
+                message = f"已删除规则 {rule_id}"
+            else:
+                # changes只包含调用方传入的参数；显式传入的空值（column_schemes={}、robust=False）表示清除该项
+                if not changes:
+                    return {
+                        "success": False,
+                        "error": "replace 需要至少提供一个要修改的参数（color_scheme、scale_type、cell_range、mode、column_schemes、robust）"
+                    }
+                entry = next(e for e in output["entries"] if e["rule_id"] == rule_id)
+                message = f"已修改规则 {rule_id}: " + "，".join(f"{key}={value}" for key, value in changes.items())
+                # 与_journal_params相同，空值在日志中记为None
+                changes = {
+                    key: (value or None) if key in ("column_schemes", "robust") else value
+                    for key, value in changes.items()
+                }
+                updated = {**entry, **changes}
+
+                # 与apply_color_scale相同的校验，失败时不修改日志
+                error = _scheme_registry.validate(updated["scale_type"], updated["color_scheme"])
+                if error:
+                    return {
+                        "success": False,
+                        "error": error
+                    }
+                if "cell_range" in changes:
+                    try:
+                        checked = preflight_cell_range(output["base_file"], updated["sheet_name"], updated["cell_range"])
+                    except RangeValidationError as e:
+                        return {
+                            "success": False,
+                            "error": str(e)
+                        }
+                    changes["cell_range"] = updated["cell_range"] = checked["cell_range"]
+                error = _validate_rule_layout(
+                    updated["cell_range"],
+                    updated["scale_type"],
+                    updated["color_scheme"],
+                    updated.get("column_schemes"),
+                    updated.get("mode", "range")
+                )
+                if error:
+                    return {
+                        "success": False,
+                        "error": error
+                    }
+
+                entries = [updated if e["rule_id"] == rule_id else e for e in output["entries"]]
+
+            # 从原文件按修改后的规则一次写入；输出写入成功后才修改日志，失败时日志与输出文件保持一致
+            rule_count = _regenerate_output(output_file, {**output, "entries": entries})
+            if action == "remove":
+                journal.remove(rule_id)
+            else:
+                journal.update(rule_id, changes)
+            _register_output(output_file, "revise_color_scale", tool_context, rule_count, journal)
+
+            # 输出文件已改变：丢弃本轮缓存，后续apply_color_scale在新的输出上叠加
+            workbook_cache = get_workbook_cache(tool_context.invocation_state if tool_context else None)
+            if workbook_cache:
+                workbook_cache.invalidate(output_file)
+            _written_outputs(tool_context).add(output_file)
+
+        return {
+            "success": True,
+            "output_file": output_file,
+            "rule_count": rule_count,
+            "rules": [
+                {key: value for key, value in entry.items() if key != "created_at" and value is not None}
+                for entry in journal.entries(output_file)
+            ],
+            "message": f"{message}，已重新生成 {output_file}（{rule_count}条条件格式）"
+        }
+
+    except FileNotFoundError as e:
+        return {
+            "success": False,
+            "code": CODE_NOT_FOUND,
+            "error": f"文件不存在: {e.filename}"
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "code": CODE_INTERNAL,
+            "error": f"修改色阶失败: {str(e)}"
+        }
+
+
+@tool(context=True)
+async def revise_color_scale(
+    action: ReviseAction,
+    rule_id: str = "",
+    color_scheme: Optional[ColorSchemeName] = None,
+    scale_type: Optional[ScaleType] = None,
+    cell_range: Optional[str] = None,
+    mode: Optional[ScaleMode] = None,
+    column_schemes: Optional[Dict[str, ColorSchemeName]] = None,
+    robust: Optional[bool] = None,
+    file_path: str = "",
+    tool_context: ToolContext = None
+) -> dict:
+    """查看、撤销或替换已经应用的色阶规则，无需重新分析和重新应用。
+
+    apply_color_scale每次成功后会返回rule_id。用户要求"撤销"、"换成绿红配色"、"范围改成B2:B50"时，
+    使用此工具按rule_id修改，输出文件会从原文件按剩余规则一次性重新生成。
+
+    重要：file_path参数可以省略，系统会自动使用用户已上传的文件。
+
+    Args:
+        action: "list"（列出已应用的规则）、"remove"（删除rule_id对应的规则）、"replace"（修改rule_id对应规则的参数）
+        rule_id: 规则ID（如 "r1"），remove / replace 时必填
+        color_scheme: replace时的新色彩方案
+        scale_type: replace时的新色阶类型（需与color_scheme匹配）
+        cell_range: replace时的新单元格范围
+        mode: replace时的新应用模式（range / per_column / per_row）
+        column_schemes: replace时新的分列色彩方案（传入{}清除分列方案，全部列使用color_scheme）
+        robust: replace时是否改为抗离群值的P5/P95固定节点（False恢复为方案原有的min/max节点）
+        file_path: Excel文件完整路径（可选，默认使用已上传的文件）
+
+    Returns:
+        精简格式的结果（v1），键名含义与apply_color_scale相同，另有：o=各输出文件的规则（list时），
+        rl=输出文件上剩余的规则列表（cr=规则范围），例如：
+        {"v":1,"c":0,"f":"/path/to/file_colored.xlsx","k":2,"rl":[{"id":"r1","s":"Sheet1","cr":"B2:D100","st":"two_color","cs":"green_red","md":"range"}]}
+    """
+    # 只保留调用方传入的参数（None表示未传入），{}和False是要写入的修改
+    params = {
+        "color_scheme": color_scheme,
+        "scale_type": scale_type,
+        "cell_range": cell_range,
+        "mode": mode,
+        "column_schemes": column_schemes,
+        "robust": robust
+    }
+    changes = {key: value for key, value in params.items() if value is not None}
+    result = await asyncio.to_thread(_revise_color_scale, action, rule_id, changes, file_path, tool_context)
+    return encode_tool_result("revise_color_scale", result, tool_context.invocation_state if tool_context else None)
@@ -0,0 +1,93 @@
+"""
+并行分析进程池
+analyze_all同时分析会话中的多个文件。openpyxl解析是CPU密集的纯Python代码，线程受GIL限制，
+因此在进程池中执行：进程以spawn方式启动（主进程中有事件循环等线程，fork不安全），
+首次使用时创建并常驻复用；每个工作进程的内存上限为进程内上限的均分，总占用与单进程时相当
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+
+from utils.workbook_strategy import DEFAULT_MEMORY_CEILING_MB, MEMORY_CEILING_ENV_VAR
+
+
+# 工作进程数上限（默认不超过CPU核数和4）
+MAX_WORKERS_ENV_VAR = "ANALYZE_WORKERS"
+DEFAULT_MAX_WORKERS = 4
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(ceiling_mb: float):
+    os.environ[MEMORY_CEILING_ENV_VAR] = str(ceiling_mb)
+
+
+def _analyze(file_path: str, preview_rows: int) -> Dict[str, Any]:
+    from utils.excel_analyzer import analyze_excel_file
+
+    return analyze_excel_file(file_path, None, preview_rows)
+
+
+def max_workers() -> int:
+    configured = int(os.environ.get(MAX_WORKERS_ENV_VAR, DEFAULT_MAX_WORKERS))
+    return max(1, min(configured, os.cpu_count() or 1))
+
+
+def get_analysis_pool() -> ProcessPoolExecutor:
+    """获取进程内共享的分析进程池（首次调用时创建）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = max_workers()
+            ceiling_mb = float(os.environ.get(MEMORY_CEILING_ENV_VAR, DEFAULT_MEMORY_CEILING_MB))
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(ceiling_mb / workers,)
+            )
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """工作进程异常退出（如被OOM终止）后进程池不可再用，下次调用时重建"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def analyze_files(file_paths: List[str], preview_rows: int) -> List[Any]:
+    """
+    并行分析多个文件
+
+    大文件先提交（总耗时接近最大的文件）；只有一个文件时直接在线程中分析，不启动进程池
+
+    Returns:
+        与file_paths顺序一致的列表，每项为分析结果或分析时抛出的异常
+    """
+    if len(file_paths) == 1:
+        return list(await asyncio.gather(asyncio.to_thread(_analyze, file_paths[0], preview_rows), return_exceptions=True))
+
+    def size_of(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    pool = get_analysis_pool()
+    futures: Dict[str, asyncio.Future] = {}
+    for path in sorted(set(file_paths), key=size_of, reverse=True):
+        futures[path] = asyncio.wrap_future(pool.submit(_analyze, path, preview_rows))
+
+    paths = list(futures)
+    results = dict(zip(paths, await asyncio.gather(*(futures[path] for path in paths), return_exceptions=True)))
+    if any(isinstance(result, BrokenProcessPool) for result in results.values()):
+        _discard_pool(pool)
+    return [results[path] for path in file_paths]
@@ -0,0 +1,99 @@
+"""
+后台事件循环
+进程内常驻一个事件循环线程，承载所有会话的Agent流和异步工具，
+Streamlit脚本线程只负责提交任务并轮询结果
+"""
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional
+
+
+_ITEM = "item"
+_ERROR = "error"
+_DONE = "done"
+
+
+class BackgroundLoop:
+    """在守护线程中常驻运行的asyncio事件循环"""
+
+    def __init__(self, name: str = "agent-event-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        """
+        提交协程到后台循环
+
+        Returns:
+            concurrent.futures.Future，可在调用线程中阻塞等待结果
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """提交协程并等待结果（替代asyncio.run，不会新建事件循环）"""
+        return self.submit(coro).result(timeout)
+
+    def iterate(self, agen: AsyncIterator[Any], poll_interval: float = 0.1) -> Iterator[Any]:
+        """
+        在后台循环中消费异步生成器，在调用线程中以同步迭代器的方式逐个产出
+
+        调用方提前停止迭代（如Streamlit中断脚本）时，后台任务会被取消
+
+        Args:
+            agen: 异步生成器（如Agent.stream_async的返回值）
+            poll_interval: 轮询队列的间隔（秒）
+        """
+        results: queue.Queue = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    results.put((_ITEM, item))
+            except asyncio.CancelledError:
+                raise
+            except BaseException as e:
+                results.put((_ERROR, e))
+            else:
+                results.put((_DONE, None))
+
+        future = self.submit(pump())
+        try:
+            while True:
+                try:
+                    kind, value = results.get(timeout=poll_interval)
+                except queue.Empty:
+                    if future.done() and future.cancelled():
+                        return
+                    continue
+                if kind == _ITEM:
+                    yield value
+                elif kind == _ERROR:
+                    raise value
+                else:
+                    return
+        finally:
+            if not future.done():
+                future.cancel()
+
+
+_background_loop: Optional[BackgroundLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> BackgroundLoop:
+    """获取进程内共享的后台事件循环（首次调用时启动）"""
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = BackgroundLoop()
+        return _background_loop
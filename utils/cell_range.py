@@ -0,0 +1,194 @@
+"""
+单元格范围工具
+解析、拆分和合并 "B2:E10" / "B2:B10 D2:E10" 形式的单元格范围
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.cell import range_boundaries
+
+
+# (min_col, min_row, max_col, max_row)，列号从1开始
+Bounds = Tuple[int, int, int, int]
+
+# Excel工作表的最大行列（XFD1048576）
+MAX_ROW = 1048576
+MAX_COLUMN = 16384
+
+
+class RangeValidationError(ValueError):
+    """sheet名称或单元格范围校验失败"""
+
+
+def check_bounds_limits(part: str, min_col: Optional[int], min_row: Optional[int], max_col: Optional[int], max_row: Optional[int]):
+    """
+    行号、列号必须位于 1..MAX_ROW / 1..MAX_COLUMN 内（None表示整行/整列引用中缺少的一侧，不检查）
+
+    Raises:
+        RangeValidationError: 行号为0（如 B0）或超出工作表
+    """
+    for value, limit, label in ((min_row, MAX_ROW, "行号"), (max_row, MAX_ROW, "行号"),
+                                (min_col, MAX_COLUMN, "列号"), (max_col, MAX_COLUMN, "列号")):
+        if value is not None and not 1 <= value <= limit:
+            raise RangeValidationError(f"单元格范围的{label}须在1到{limit}之间: {part}")
+
+
+def parse_cell_range(cell_range: str) -> List[Bounds]:
+    """
+    解析单元格范围（支持空格分隔的多个区域）
+
+    Args:
+        cell_range: 单元格范围，如 "B2:E10" 或 "B2:B10 D2:E10"
+
+    Returns:
+        每个区域的边界列表
+
+    Raises:
+        RangeValidationError: 范围格式不正确（ValueError的子类）
+    """
+    parts = cell_range.split()
+    if not parts:
+        raise RangeValidationError("单元格范围为空")
+
+    bounds = []
+    for part in parts:
+        ref = part.replace("$", "").upper()
+        if ":" not in ref:
+            ref = f"{ref}:{ref}"
+        try:
+            min_col, min_row, max_col, max_row = range_boundaries(ref)
+        except ValueError as e:
+            raise RangeValidationError(str(e))
+        if None in (min_col, min_row, max_col, max_row):
+            raise RangeValidationError(f"单元格范围需包含行号和列号，如 B2:E10: {part}")
+        check_bounds_limits(part, min_col, min_row, max_col, max_row)
+        # 起止颠倒（如 E10:B2）时按左上到右下归一化
+        min_col, max_col = sorted((min_col, max_col))
+        min_row, max_row = sorted((min_row, max_row))
+        bounds.append((min_col, min_row, max_col, max_row))
+    return bounds
+
+
+def format_bounds(bounds: Bounds) -> str:
+    """将边界格式化为 "B2:E10" 形式"""
+    min_col, min_row, max_col, max_row = bounds
+    return f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}"
+
+
+def iter_column_spans(cell_range: str) -> Iterator[Tuple[int, int, int]]:
+    """
+    按列展开单元格范围
+
+    Yields:
+        (列号, 起始行, 结束行)
+    """
+    for min_col, min_row, max_col, max_row in parse_cell_range(cell_range):
+        for col in range(min_col, max_col + 1):
+            yield col, min_row, max_row
+
+
+def merge_column_spans(spans: Iterable[Tuple[int, int, int]]) -> str:
+    """
+    将按列展开的范围重新合并为最少的矩形区域
+
+    行范围相同的相邻列合并为一个区域，多个区域以空格分隔
+
+    Args:
+        spans: (列号, 起始行, 结束行) 序列
+
+    Returns:
+        合并后的单元格范围字符串
+    """
+    ordered = sorted(set(spans))
+    blocks: List[List[int]] = []
+    for col, min_row, max_row in ordered:
+        last = blocks[-1] if blocks else None
+        if last and last[2] == col - 1 and last[1] == min_row and last[3] == max_row:
+            last[2] = col
+        else:
+            blocks.append([col, min_row, col, max_row])
+    return " ".join(format_bounds(tuple(block)) for block in blocks)
+
+
+def count_cells(cell_range: str) -> int:
+    """计算单元格范围包含的单元格数量"""
+    return sum(
+        (max_col - min_col + 1) * (max_row - min_row + 1)
+        for min_col, min_row, max_col, max_row in parse_cell_range(cell_range)
+    )
+
+
+def ranges_overlap(first: str, second: str) -> bool:
+    """两个单元格范围是否有公共单元格"""
+    return any(
+        a_min_col <= b_max_col and b_min_col <= a_max_col and a_min_row <= b_max_row and b_min_row <= a_max_row
+        for a_min_col, a_min_row, a_max_col, a_max_row in parse_cell_range(first)
+        for b_min_col, b_min_row, b_max_col, b_max_row in parse_cell_range(second)
+    )
+
+
+def _covered_length(intervals: Iterable[Tuple[int, int]]) -> int:
+    """闭区间 (起, 止) 并集覆盖的整数个数"""
+    total = 0
+    covered_to = 0
+    for start, stop in sorted(intervals):
+        if stop > covered_to:
+            total += stop - max(start, covered_to + 1) + 1
+            covered_to = stop
+    return total
+
+
+def count_columns(cell_range: str) -> int:
+    """范围覆盖的不同列数（即 len(split_per_column(cell_range))，按边界计算，不展开各列）"""
+    return _covered_length((min_col, max_col) for min_col, _, max_col, _ in parse_cell_range(cell_range))
+
+
+def count_rows(cell_range: str) -> int:
+    """范围覆盖的不同行数（即 len(split_per_row(cell_range))，按边界计算，不展开各行）"""
+    return _covered_length((min_row, max_row) for _, min_row, _, max_row in parse_cell_range(cell_range))
+
+
+def group_columns(cell_range: str, column_keys: Dict[int, str], default_key: str) -> Dict[str, str]:
+    """
+    按列分组拆分单元格范围
+
+    Args:
+        cell_range: 单元格范围
+        column_keys: 列号到分组键的映射，未出现的列归入default_key
+        default_key: 默认分组键
+
+    Returns:
+        分组键到合并后单元格范围的映射（保持首次出现的顺序）
+    """
+    grouped: Dict[str, List[Tuple[int, int, int]]] = {}
+    for col, min_row, max_row in iter_column_spans(cell_range):
+        key = column_keys.get(col, default_key)
+        grouped.setdefault(key, []).append((col, min_row, max_row))
+    return {key: merge_column_spans(spans) for key, spans in grouped.items()}
+
+
+def split_per_column(cell_range: str) -> Dict[int, str]:
+    """
+    按列拆分单元格范围
+
+    Returns:
+        列号到该列单元格范围的映射（按列号排序）
+    """
+    spans: Dict[int, List[Tuple[int, int, int]]] = {}
+    for col, min_row, max_row in iter_column_spans(cell_range):
+        spans.setdefault(col, []).append((col, min_row, max_row))
+    return {col: merge_column_spans(spans[col]) for col in sorted(spans)}
+
+
+def split_per_row(cell_range: str) -> Dict[int, str]:
+    """
+    按行拆分单元格范围
+
+    Returns:
+        行号到该行单元格范围的映射（按行号排序）
+    """
+    rows: Dict[int, List[str]] = {}
+    for min_col, min_row, max_col, max_row in parse_cell_range(cell_range):
+        for row in range(min_row, max_row + 1):
+            rows.setdefault(row, []).append(format_bounds((min_col, row, max_col, row)))
+    return {row: " ".join(rows[row]) for row in sorted(rows)}
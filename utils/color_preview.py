@@ -0,0 +1,215 @@
+"""
+色阶预览
+按行流式读取目标范围的前N行，按色阶方案的节点向量化插值出每个单元格的颜色，
+生成可直接嵌入聊天界面的HTML表格，无需下载文件即可确认效果
+"""
+import html
+import warnings
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+from utils.cell_range import format_bounds, parse_cell_range
+from utils.color_schemes import ROBUST_PERCENTILES, SCALE_STOPS, get_scheme_registry
+
+
+# 预览的行数/列数上限（超大范围只读取前面部分）
+PREVIEW_ROW_CAP = 50
+PREVIEW_COL_CAP = 30
+
+# 应用模式对应的统计轴：range整体、per_column按列、per_row按行
+_MODE_AXIS = {"range": None, "per_column": 0, "per_row": 1}
+
+
+def _hex_to_rgb(color: str) -> np.ndarray:
+    color = color.lstrip("#")[-6:]
+    return np.array([int(color[i:i + 2], 16) for i in (0, 2, 4)], dtype=float)
+
+
+def _stop_anchor(values: np.ndarray, stop_type: str, stop_value: Any, axis: Optional[int]) -> np.ndarray:
+    """计算色阶节点对应的数值（保持维度，便于与values广播）"""
+    low = np.nanmin(values, axis=axis, keepdims=True)
+    high = np.nanmax(values, axis=axis, keepdims=True)
+    if stop_type == "min":
+        return low
+    if stop_type == "max":
+        return high
+    if stop_type == "num":
+        return np.full_like(low, float(stop_value))
+    if stop_type == "percent":
+        return low + (high - low) * float(stop_value) / 100
+    if stop_type == "percentile":
+        return np.nanpercentile(values, float(stop_value), axis=axis, keepdims=True)
+    # formula节点无法在预览中求值，按区间中点近似
+    return (low + high) / 2
+
+
+def interpolate_colors(values: np.ndarray, config: Dict[str, Any], scale_type: str, axis: Optional[int] = None) -> np.ndarray:
+    """
+    按色阶方案为数值矩阵插值颜色
+
+    Args:
+        values: 二维浮点矩阵，非数值单元格为NaN
+        config: 色阶方案配置（COLOR_SCHEMES中的一项）
+        scale_type: two_color / three_color
+        axis: None整体统计；0按列；1按行
+
+    Returns:
+        形状为 values.shape + (3,) 的RGB矩阵，非数值单元格为NaN
+    """
+    if values.size == 0:
+        return np.full(values.shape + (3,), np.nan)
+
+    stops = SCALE_STOPS[scale_type]
+    with warnings.catch_warnings():
+        # 整列/整行都不是数值时nanmin等会告警，结果为NaN，忽略即可
+        warnings.simplefilter("ignore", RuntimeWarning)
+        anchors = [_stop_anchor(values, config[f"{stop}_type"], config.get(f"{stop}_value"), axis) for stop in stops]
+    # 节点必须单调不减，与Excel一致
+    anchors = list(np.maximum.accumulate(np.stack(np.broadcast_arrays(*anchors)), axis=0))
+    colors = [_hex_to_rgb(config[f"{stop}_color"]) for stop in stops]
+
+    result = np.empty(values.shape + (3,))
+    result[:] = colors[0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for (low, low_color), (high, high_color) in zip(zip(anchors, colors), zip(anchors[1:], colors[1:])):
+            span = high - low
+            t = np.clip(np.where(span > 0, (values - low) / np.where(span > 0, span, 1), 1.0), 0, 1)
+            segment = low_color + t[..., None] * (high_color - low_color)
+            result = np.where((values >= low)[..., None], segment, result)
+    result[np.isnan(values)] = np.nan
+    return result
+
+
+def read_range_values(
+    file_path: str,
+    sheet_name: str,
+    bounds: Tuple[int, int, int, int],
+    row_cap: int = PREVIEW_ROW_CAP
+) -> List[Tuple[Any, ...]]:
+    """以只读模式流式读取范围内的前row_cap行原始值"""
+    min_col, min_row, max_col, max_row = bounds
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(
+            min_row=min_row,
+            max_row=min(max_row, min_row + row_cap - 1),
+            min_col=min_col,
+            max_col=max_col,
+            values_only=True
+        )
+        return [tuple(row) for row in rows]
+    finally:
+        workbook.close()
+
+
+def _to_matrix(rows: List[Tuple[Any, ...]], width: int) -> np.ndarray:
+    matrix = np.full((len(rows), width), np.nan)
+    for r, row in enumerate(rows):
+        for c, value in enumerate(row[:width]):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                matrix[r, c] = value
+    return matrix
+
+
+def _format_value(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:,.2f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+def render_preview_html(rows: List[Tuple[Any, ...]], colors: np.ndarray, min_col: int, min_row: int) -> str:
+    """把取值和颜色矩阵渲染为HTML表格（带列字母和行号）"""
+    width = colors.shape[1]
+    cell_style = "border:1px solid #ddd;padding:2px 6px;font-size:12px;white-space:nowrap"
+    head_style = f"{cell_style};background:#f0f2f6;color:#555;text-align:center"
+
+    parts = ['<div style="overflow:auto;max-height:420px"><table style="border-collapse:collapse">']
+    parts.append(f'<tr><th style="{head_style}"></th>')
+    parts.extend(f'<th style="{head_style}">{get_column_letter(min_col + c)}</th>' for c in range(width))
+    parts.append("</tr>")
+    for r, row in enumerate(rows):
+        parts.append(f'<tr><th style="{head_style}">{min_row + r}</th>')
+        for c in range(width):
+            value = row[c] if c < len(row) else None
+            style = cell_style + (";text-align:right" if isinstance(value, (int, float)) else "")
+            if not np.isnan(colors[r, c, 0]):
+                red, green, blue = (int(round(channel)) for channel in colors[r, c])
+                style += f";background:#{red:02X}{green:02X}{blue:02X};color:#222"
+            parts.append(f'<td style="{style}">{html.escape(_format_value(value))}</td>')
+        parts.append("</tr>")
+    parts.append("</table></div>")
+    return "".join(parts)
+
+
+def build_color_preview(
+    file_path: str,
+    sheet_name: str,
+    cell_range: str,
+    scale_type: str,
+    color_scheme: str,
+    column_schemes: Optional[Dict[str, str]] = None,
+    mode: str = "range",
+    robust: bool = False,
+    row_cap: int = PREVIEW_ROW_CAP,
+    col_cap: int = PREVIEW_COL_CAP
+) -> Dict[str, Any]:
+    """
+    生成色阶效果的HTML预览
+
+    只读取每个范围的前row_cap行、前col_cap列；min/max/百分位按读取到的行计算，
+    范围超过上限时颜色是近似值
+
+    Args:
+        file_path: xlsx文件路径（原文件或输出文件均可）
+        sheet_name: sheet名称
+        cell_range: 单元格范围（可含多个范围，空格分隔）
+        scale_type / color_scheme / column_schemes / mode / robust: 与apply_color_scale参数一致
+            （robust的两端按读取到的行的P5/P95计算）
+        row_cap: 每个范围最多预览的行数
+        col_cap: 每个范围最多预览的列数
+
+    Returns:
+        {"html": HTML片段, "preview_range": 实际预览的范围, "truncated": 是否截断}
+    """
+    registry = get_scheme_registry()
+    axis = _MODE_AXIS.get(mode)
+    column_schemes = {column.upper(): scheme for column, scheme in (column_schemes or {}).items()}
+
+    tables = []
+    preview_ranges = []
+    truncated = False
+    for min_col, min_row, max_col, max_row in parse_cell_range(cell_range):
+        shown = (min_col, min_row, min(max_col, min_col + col_cap - 1), min(max_row, min_row + row_cap - 1))
+        truncated = truncated or shown != (min_col, min_row, max_col, max_row)
+        width = shown[2] - shown[0] + 1
+
+        rows = read_range_values(file_path, sheet_name, shown, row_cap)
+        values = _to_matrix(rows, width)
+
+        # 按方案把列分组，每组独立计算色阶（与apply_color_scale对column_schemes的处理一致）
+        groups: Dict[str, List[int]] = {}
+        for c in range(width):
+            scheme = column_schemes.get(get_column_letter(min_col + c), color_scheme)
+            groups.setdefault(scheme, []).append(c)
+
+        colors = np.full(values.shape + (3,), np.nan)
+        for scheme, columns in groups.items():
+            config = registry.get_config(scale_type, scheme)
+            if robust:
+                low, high = ROBUST_PERCENTILES
+                config.update(start_type="percentile", start_value=low, end_type="percentile", end_value=high)
+            colors[:, columns] = interpolate_colors(values[:, columns], config, scale_type, axis)
+
+        tables.append(render_preview_html(rows, colors, min_col, min_row))
+        preview_ranges.append(format_bounds(shown))
+
+    return {
+        "html": "".join(tables),
+        "preview_range": " ".join(preview_ranges),
+        "truncated": truncated
+    }
@@ -0,0 +1,314 @@
+"""
+色阶方案注册表
+内置方案 + 可选的JSON配置文件，加载时统一校验，色阶模板在首次构建规则时生成
+"""
+import json
+import logging
+import math
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from openpyxl.formatting.rule import Rule
+
+
+# 内置色阶配置方案（label仅用于界面展示，不参与规则构建）
+COLOR_SCHEMES = {
+    "two_color": {
+        "red_green": {
+            "label": "红→绿 (成本：红高绿低)",
+            "start_type": "min",
+            "start_color": "F8696B",  # 红色
+            "end_type": "max",
+            "end_color": "63BE7B"  # 绿色
+        },
+        "green_red": {
+            "label": "绿→红 (收益：绿高红低)",
+            "start_type": "min",
+            "start_color": "63BE7B",  # 绿色
+            "end_type": "max",
+            "end_color": "F8696B"  # 红色
+        },
+        "blue_white_red": {
+            "label": "蓝→红 (温度)",
+            "start_type": "min",
+            "start_color": "5A8AC6",  # 蓝色
+            "end_type": "max",
+            "end_color": "F8696B"  # 红色
+        }
+    },
+    "three_color": {
+        "red_yellow_green": {
+            "label": "红→黄→绿 (传统)",
+            "start_type": "min",
+            "start_color": "F8696B",  # 红色
+            "mid_type": "percentile",
+            "mid_value": 50,
+            "mid_color": "FFEB84",  # 黄色
+            "end_type": "max",
+            "end_color": "63BE7B"  # 绿色
+        },
+        "green_yellow_red": {
+            "label": "绿→黄→红 (反向)",
+            "start_type": "min",
+            "start_color": "63BE7B",  # 绿色
+            "mid_type": "percentile",
+            "mid_value": 50,
+            "mid_color": "FFEB84",  # 黄色
+            "end_type": "max",
+            "end_color": "F8696B"  # 红色
+        },
+        "blue_white_red": {
+            "label": "蓝→白→红 (温度)",
+            "start_type": "min",
+            "start_color": "5A8AC6",  # 蓝色
+            "mid_type": "percentile",
+            "mid_value": 50,
+            "mid_color": "FFFFFF",  # 白色
+            "end_type": "max",
+            "end_color": "F8696B"  # 红色
+        },
+        # 正负值混合的数据：中间节点固定在0，正负两侧分别着色
+        "red_white_green_zero": {
+            "label": "红→白→绿 (盈亏：负红正绿，0为白)",
+            "start_type": "min",
+            "start_color": "F8696B",  # 红色
+            "mid_type": "num",
+            "mid_value": 0,
+            "mid_color": "FFFFFF",  # 白色
+            "end_type": "max",
+            "end_color": "63BE7B"  # 绿色
+        },
+        "blue_white_red_zero": {
+            "label": "蓝→白→红 (正负值：0为白)",
+            "start_type": "min",
+            "start_color": "5A8AC6",  # 蓝色
+            "mid_type": "num",
+            "mid_value": 0,
+            "mid_color": "FFFFFF",  # 白色
+            "end_type": "max",
+            "end_color": "F8696B"  # 红色
+        }
+    }
+}
+
+# 色阶类型对应的节点
+SCALE_STOPS = {
+    "two_color": ("start", "end"),
+    "three_color": ("start", "mid", "end")
+}
+
+# 支持的节点类型；除min/max外都需要提供value
+STOP_TYPES = ("min", "max", "num", "percent", "percentile", "formula")
+_VALUE_STOP_TYPES = {"num", "percent", "percentile", "formula"}
+# value必须是数值的节点类型（formula的value为公式文本）
+_NUMERIC_STOP_TYPES = {"num", "percent", "percentile"}
+
+# robust色阶两端节点使用的分位数：超出区间的离群值取端点颜色，不再拉偏整个色阶
+ROBUST_PERCENTILES = (5, 95)
+
+# 可选配置文件：环境变量优先，其次为项目根目录下的color_schemes.json
+CONFIG_ENV_VAR = "COLOR_SCHEMES_FILE"
+DEFAULT_CONFIG_FILE = Path(__file__).resolve().parent.parent / "color_schemes.json"
+
+logger = logging.getLogger(__name__)
+
+
+class ColorSchemeError(ValueError):
+    """色阶方案配置不合法"""
+
+
+def clip_stops(config: Dict[str, Any], low: float, high: float) -> Dict[str, Any]:
+    """
+    把方案的两端节点换成固定数值low / high
+
+    中间节点为min/max/percent时相对两端定义，按新区间换算为数值；percentile/num/formula保持不变
+
+    Args:
+        config: 方案的ColorScaleRule参数（get_config的结果）
+
+    Returns:
+        新的参数字典
+    """
+    clipped = {**config, "start_type": "num", "start_value": low, "end_type": "num", "end_value": high}
+    mid_type = config.get("mid_type")
+    if mid_type in ("min", "max", "percent"):
+        fraction = {"min": 0, "max": 100}.get(mid_type, config.get("mid_value"))
+        clipped["mid_type"] = "num"
+        clipped["mid_value"] = low + (high - low) * float(fraction) / 100
+    return clipped
+
+
+def _as_number(value: Any) -> Optional[float]:
+    """数值或数值字符串转换为float，其他值（布尔、NaN、无穷等）返回None"""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _validate_scheme(scale_type: str, name: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    校验单个方案配置
+
+    Returns:
+        可直接传给ColorScaleRule的参数字典
+    """
+    if scale_type not in SCALE_STOPS:
+        raise ColorSchemeError(f"方案 {name}: 不支持的色阶类型 {scale_type}")
+
+    stops = SCALE_STOPS[scale_type]
+    rule_kwargs = {}
+    for stop in stops:
+        stop_type = config.get(f"{stop}_type")
+        if stop_type not in STOP_TYPES:
+            raise ColorSchemeError(f"方案 {name}: {stop}_type 必须是 {STOP_TYPES} 之一，当前为 {stop_type!r}")
+
+        color = str(config.get(f"{stop}_color", "")).lstrip("#").upper()
+        if len(color) not in (6, 8) or any(c not in "0123456789ABCDEF" for c in color):
+            raise ColorSchemeError(f"方案 {name}: {stop}_color 必须是RRGGBB格式的颜色，当前为 {config.get(f'{stop}_color')!r}")
+
+        value = config.get(f"{stop}_value")
+        if stop_type in _VALUE_STOP_TYPES:
+            if value is None:
+                raise ColorSchemeError(f"方案 {name}: {stop}_type 为 {stop_type} 时必须提供 {stop}_value")
+            if stop_type in _NUMERIC_STOP_TYPES:
+                number = _as_number(value)
+                if number is None:
+                    raise ColorSchemeError(f"方案 {name}: {stop}_type 为 {stop_type} 时 {stop}_value 必须是数值，当前为 {value!r}")
+                if stop_type in ("percent", "percentile") and not 0 <= number <= 100:
+                    raise ColorSchemeError(f"方案 {name}: {stop}_value 必须在0-100之间")
+            rule_kwargs[f"{stop}_value"] = value
+
+        rule_kwargs[f"{stop}_type"] = stop_type
+        rule_kwargs[f"{stop}_color"] = color
+
+    unknown_stops = [key for key in config if key.startswith("mid_")] if "mid" not in stops else []
+    if unknown_stops:
+        raise ColorSchemeError(f"方案 {name}: two_color 方案不能包含 {', '.join(unknown_stops)}")
+
+    return rule_kwargs
+
+
+class ColorSchemeRegistry:
+    """
+    色阶方案注册表
+
+    注册时只校验配置（不导入openpyxl，界面读取方案列表时无需加载）；
+    ColorScale对象在第一次构建规则时生成并缓存，之后只需包一层Rule
+    """
+
+    def __init__(self, schemes: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None):
+        self._configs: Dict[str, Dict[str, Dict[str, Any]]] = {scale_type: {} for scale_type in SCALE_STOPS}
+        self._labels: Dict[str, Dict[str, str]] = {scale_type: {} for scale_type in SCALE_STOPS}
+        self._templates = {}
+        for scale_type, scale_schemes in (schemes or {}).items():
+            for name, config in scale_schemes.items():
+                self.register(scale_type, name, config)
+
+    def register(self, scale_type: str, name: str, config: Dict[str, Any]):
+        """注册（或覆盖）一个方案"""
+        rule_kwargs = _validate_scheme(scale_type, name, config)
+        self._configs[scale_type][name] = rule_kwargs
+        self._labels[scale_type][name] = config.get("label", name)
+        self._templates.pop((scale_type, name), None)
+
+    def scale_types(self) -> List[str]:
+        """所有色阶类型"""
+        return list(self._configs.keys())
+
+    def scheme_names(self, scale_type: Optional[str] = None) -> List[str]:
+        """指定色阶类型（None则全部类型）下的方案名称，去重并保持顺序"""
+        scale_types = [scale_type] if scale_type else self.scale_types()
+        names = []
+        for st in scale_types:
+            for name in self._configs.get(st, {}):
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def labels(self, scale_type: str) -> Dict[str, str]:
+        """界面展示用的 {标签: 方案名} 映射"""
+        return {label: name for name, label in self._labels.get(scale_type, {}).items()}
+
+    def validate(self, scale_type: str, color_scheme: str) -> Optional[str]:
+        """
+        校验色阶类型和方案组合
+
+        Returns:
+            错误信息，合法时返回None
+        """
+        if scale_type not in self._configs:
+            return f"不支持的色阶类型: {scale_type}，支持的类型: {self.scale_types()}"
+        if color_scheme not in self._configs[scale_type]:
+            return f"不支持的色彩方案: {color_scheme}，支持的方案: {self.scheme_names(scale_type)}"
+        return None
+
+    def get_config(self, scale_type: str, color_scheme: str) -> Dict[str, Any]:
+        """获取ColorScaleRule参数"""
+        return dict(self._configs[scale_type][color_scheme])
+
+    def build_rule(self, scale_type: str, color_scheme: str, anchors: Optional[Tuple[float, float]] = None) -> "Rule":
+        """
+        基于缓存的模板生成新的色阶规则（每次添加都需要独立的Rule以分配优先级）
+
+        anchors为(低, 高)时两端节点固定为这两个数值（见clip_stops），此时不使用模板
+        """
+        from openpyxl.formatting.rule import ColorScaleRule, Rule
+
+        if anchors is not None:
+            return ColorScaleRule(**clip_stops(self._configs[scale_type][color_scheme], *anchors))
+        key = (scale_type, color_scheme)
+        if key not in self._templates:
+            self._templates[key] = ColorScaleRule(**self._configs[scale_type][color_scheme]).colorScale
+        return Rule(type="colorScale", colorScale=self._templates[key])
+
+    @classmethod
+    def load(cls, config_file: Optional[str] = None) -> "ColorSchemeRegistry":
+        """
+        加载内置方案及可选的JSON配置文件
+
+        配置文件格式与COLOR_SCHEMES相同，同名方案覆盖内置方案。
+        配置文件无法读取、不是合法JSON或其中任一方案校验失败时，记录警告并只使用内置方案
+
+        Args:
+            config_file: 配置文件路径，None则依次尝试环境变量和默认路径
+        """
+        path = config_file or os.environ.get(CONFIG_ENV_VAR)
+        if path is None and DEFAULT_CONFIG_FILE.exists():
+            path = str(DEFAULT_CONFIG_FILE)
+        if not path:
+            return cls(COLOR_SCHEMES)
+
+        registry = cls(COLOR_SCHEMES)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                extra = json.load(f)
+            if not isinstance(extra, dict) or not all(isinstance(schemes, dict) for schemes in extra.values()):
+                raise ColorSchemeError("顶层应为 {色阶类型: {方案名: 配置}}")
+            for scale_type, scale_schemes in extra.items():
+                for name, config in scale_schemes.items():
+                    if not isinstance(config, dict):
+                        raise ColorSchemeError(f"方案 {name}: 配置应为对象")
+                    registry.register(scale_type, name, config)
+        except (OSError, ValueError) as e:
+            # json.JSONDecodeError和ColorSchemeError都是ValueError
+            logger.warning("色阶方案配置文件 %s 无效，已忽略并使用内置方案: %s", path, e)
+            return cls(COLOR_SCHEMES)
+
+        return registry
+
+
+_registry: Optional[ColorSchemeRegistry] = None
+
+
+def get_scheme_registry() -> ColorSchemeRegistry:
+    """获取进程内共享的方案注册表（首次调用时加载）"""
+    global _registry
+    if _registry is None:
+        _registry = ColorSchemeRegistry.load()
+    return _registry
@@ -0,0 +1,121 @@
+"""
+CSV流式刷色阶
+以write_only模式将CSV逐行写入xlsx并附加色阶规则，内存占用与行数无关
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from openpyxl import Workbook
+from openpyxl.formatting.rule import Rule
+from openpyxl.utils import get_column_letter
+
+from utils.xlsx_converter import CSV_SHEET_NAME, iter_csv_rows
+from utils.xlsx_writer import save_workbook
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class _RangeTracker:
+    """边写边统计：表头行数、各列数值个数、数据行数"""
+
+    def __init__(self):
+        self.header_rows = 0
+        self.seen_numeric = False
+        self.total_rows = 0
+        self.total_columns = 0
+        self.numeric_counts: List[int] = []
+
+    def feed(self, row: List[Any]):
+        self.total_rows += 1
+        self.total_columns = max(self.total_columns, len(row))
+        if len(self.numeric_counts) < len(row):
+            self.numeric_counts.extend([0] * (len(row) - len(self.numeric_counts)))
+
+        row_has_numeric = False
+        for idx, value in enumerate(row):
+            if _is_number(value):
+                row_has_numeric = True
+                self.numeric_counts[idx] += 1
+
+        # 第一个含数值的行之前的都视为表头
+        if not self.seen_numeric:
+            if row_has_numeric:
+                self.seen_numeric = True
+                # 表头行里不会有数值，之前计入的数值个数为0，无需回退
+            else:
+                self.header_rows += 1
+
+    def computed_range(self) -> Optional[str]:
+        """
+        计算数值列的数据范围
+
+        连续的数值列合并为一个区域，多个区域以空格分隔（共享同一色阶）
+        """
+        first_row = self.header_rows + 1
+        last_row = self.total_rows
+        if not self.seen_numeric or last_row < first_row:
+            return None
+
+        ranges = []
+        start = None
+        for idx, count in enumerate(self.numeric_counts + [0]):
+            if count > 0 and start is None:
+                start = idx
+            elif count == 0 and start is not None:
+                ranges.append(
+                    f"{get_column_letter(start + 1)}{first_row}:{get_column_letter(idx)}{last_row}"
+                )
+                start = None
+        return " ".join(ranges) if ranges else None
+
+
+def stream_csv_with_color_scale(
+    csv_path: str,
+    output_path: str,
+    rule_builder: Callable[[str], List[Tuple[str, Rule]]],
+    cell_range: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    将CSV流式写为xlsx并应用色阶
+
+    条件格式写在sheet XML的尾部，因此可以在所有行写完后再根据统计结果确定范围
+
+    Args:
+        csv_path: CSV文件路径
+        output_path: 输出xlsx路径
+        rule_builder: 根据最终范围生成 (单元格范围, 色阶规则) 列表的函数
+        cell_range: 单元格范围，None则自动计算为所有数值列的数据区
+
+    Returns:
+        包含应用范围、行列数的字典
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(CSV_SHEET_NAME)
+    tracker = _RangeTracker()
+
+    for row in iter_csv_rows(csv_path):
+        tracker.feed(row)
+        ws.append(row)
+
+    applied_range = cell_range or tracker.computed_range()
+    if applied_range:
+        try:
+            rule_targets = rule_builder(applied_range)
+        except Exception:
+            # 不写出文件：结束行写入并删除openpyxl暂存行数据的临时文件（否则保留到进程退出）
+            ws.close()
+            ws._writer.cleanup()
+            raise
+        for target_range, rule in rule_targets:
+            ws.conditional_formatting.add(target_range, rule)
+
+    save_workbook(wb, output_path)
+
+    return {
+        "sheet_name": CSV_SHEET_NAME,
+        "applied_range": applied_range,
+        "total_rows": tracker.total_rows,
+        "total_columns": tracker.total_columns,
+        "header_rows": tracker.header_rows
+    }
@@ -3,22 +3,57 @@ Excel分析工具
 读取并分析Excel文件结构，提取前N行数据供LLM判断
 """
 from openpyxl import load_workbook
-from typing import Dict, List, Any, Optional
+from openpyxl.workbook import Workbook
+from typing import Dict, List, Any, Optional, Tuple
+from utils.formula_eval import fill_uncalculated
+from utils.sheet_reader import read_sheet_cells, read_workbook_layout
+from utils.workbook_cache import WorkbookCache
+from utils.workbook_strategy import STRATEGY_NATIVE
+
+# 结果中最多列出的公式单元格坐标数
+MAX_LISTED_FORMULA_CELLS = 20
 
 
 class ExcelAnalyzer:
     """Excel文件分析器"""
 
-    def __init__(self, file_path: str):
+    def __init__(
+        self,
+        file_path: str,
+        read_only: bool = False,
+        workbook: Optional[Workbook] = None,
+        values_path: Optional[str] = None,
+        evaluate_formulas: bool = True,
+        native: bool = False
+    ):
+        """
+        Args:
+            file_path: Excel文件路径
+            read_only: 是否以只读流式模式打开（大文件使用，内存占用与行数无关）
+            workbook: 已打开的工作簿（如本轮缓存的格式视图），由调用方负责关闭
+            values_path: 读取单元格缓存值的文件（默认为file_path；openpyxl保存过的文件不含公式缓存值）
+            evaluate_formulas: 是否为没有缓存值的简单聚合公式补算结果
+            native: 不加载工作簿，sheet列表和维度直接从XML读取（见utils/sheet_reader.py）
+        """
         self.file_path = file_path
-        self.workbook = None
+        self.read_only = read_only
+        self.workbook = workbook
+        self.values_path = values_path or file_path
+        self.evaluate_formulas = evaluate_formulas
+        self.native = native and workbook is None
+        # native模式下的 {sheet名称: (最大行号, 最大列号)}
+        self.layout: Optional[Dict[str, Tuple[int, int]]] = None
+        self._owns_workbook = workbook is None and not self.native
 
     def __enter__(self):
-        self.workbook = load_workbook(self.file_path, data_only=True)
+        if self.native:
+            self.layout = read_workbook_layout(self.file_path)
+        elif self._owns_workbook:
+            self.workbook = load_workbook(self.file_path, data_only=True, read_only=self.read_only)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.workbook:
+        if self.workbook and self._owns_workbook:
             self.workbook.close()
 
     def analyze(self, sheet_name: Optional[str] = None, preview_rows: int = 100) -> Dict[str, Any]:
@@ -32,53 +67,74 @@ class ExcelAnalyzer:
         Returns:
             分析结果字典
         """
-        if not self.workbook:
+        if not self.workbook and self.layout is None:
             raise RuntimeError("需要在context manager中使用")
 
+        sheet_names = list(self.layout) if self.layout is not None else self.workbook.sheetnames
         result = {
-            "sheets": self.workbook.sheetnames,
+            "sheets": sheet_names,
             "sheet_data": {}
         }
 
         # 决定要分析哪些sheet
-        sheets_to_analyze = [sheet_name] if sheet_name else self.workbook.sheetnames
+        sheets_to_analyze = [sheet_name] if sheet_name else sheet_names
 
         for sheet in sheets_to_analyze:
-            if sheet not in self.workbook.sheetnames:
+            if sheet not in sheet_names:
                 continue
 
-            ws = self.workbook[sheet]
-            sheet_analysis = self._analyze_sheet(ws, preview_rows)
+            max_row, max_col = self._sheet_size(sheet)
+            sheet_analysis = self._analyze_sheet(sheet, max_row, max_col, preview_rows)
             result["sheet_data"][sheet] = sheet_analysis
 
         return result
 
-    def _analyze_sheet(self, worksheet, preview_rows: int) -> Dict[str, Any]:
+    def _sheet_size(self, sheet_name: str) -> Tuple[int, int]:
+        """sheet的最大行号和列号"""
+        if self.layout is not None:
+            return self.layout[sheet_name]
+
+        # 获取sheet的实际使用范围（只读模式下缺少dimension记录时需要扫描一遍）
+        worksheet = self.workbook[sheet_name]
+        if self.read_only and (worksheet.max_row is None or worksheet.max_column is None):
+            worksheet.calculate_dimension(force=True)
+        return worksheet.max_row or 0, worksheet.max_column or 0
+
+    def _analyze_sheet(self, sheet_name: str, max_row: int, max_col: int, preview_rows: int) -> Dict[str, Any]:
         """
         分析单个sheet
 
         Args:
-            worksheet: openpyxl worksheet对象
+            sheet_name: sheet名称
+            max_row: 最大行号
+            max_col: 最大列号
             preview_rows: 预览行数
 
         Returns:
             sheet分析结果
         """
-        # 获取sheet的实际使用范围
-        max_row = worksheet.max_row
-        max_col = worksheet.max_column
-
-        # 读取前N行数据
-        preview_data = []
+        # 预览行的缓存值和公式在一次流式解析中取得（工作簿只用于sheet列表和维度）
         actual_preview_rows = min(preview_rows, max_row)
+        cells = read_sheet_cells(self.values_path, sheet_name, actual_preview_rows, max_col) if actual_preview_rows else {}
+
+        formula_cells = sum(1 for cell in cells.values() if cell.formula is not None)
+        formula_status = {"evaluated": [], "uncalculated": []}
+        if self.evaluate_formulas:
+            formula_status = fill_uncalculated(cells, actual_preview_rows, lambda r, c: f"{self._get_column_letter(c)}{r}")
+        else:
+            formula_status["uncalculated"] = [
+                f"{self._get_column_letter(c)}{r}" for (r, c), cell in sorted(cells.items()) if cell.uncalculated
+            ]
 
+        preview_data = []
         for row_idx in range(1, actual_preview_rows + 1):
             row_data = []
             for col_idx in range(1, max_col + 1):
-                cell = worksheet.cell(row_idx, col_idx)
-                cell_value = cell.value
+                cell = cells.get((row_idx, col_idx))
+                raw_value = cell.value if cell else None
 
                 # 转换为可序列化的格式
+                cell_value = raw_value
                 if cell_value is None:
                     cell_value = ""
                 elif not isinstance(cell_value, (str, int, float, bool)):
@@ -87,16 +143,24 @@ class ExcelAnalyzer:
                 row_data.append({
                     "column": self._get_column_letter(col_idx),
                     "value": cell_value,
-                    "data_type": type(cell.value).__name__ if cell.value is not None else "NoneType"
+                    "data_type": type(raw_value).__name__ if raw_value is not None else "NoneType"
                 })
             preview_data.append(row_data)
 
-        return {
+        result = {
             "total_rows": max_row,
             "total_columns": max_col,
             "preview_rows": preview_data,
             "dimensions": f"{self._get_column_letter(1)}1:{self._get_column_letter(max_col)}{max_row}"
         }
+        # 公式没有缓存值（文件未经Excel计算保存）时预览中为空，单独标出，避免误判数据区域
+        if formula_cells:
+            result["formula_cells"] = formula_cells
+            if formula_status["evaluated"]:
+                result["evaluated_cells"] = formula_status["evaluated"][:MAX_LISTED_FORMULA_CELLS]
+            if formula_status["uncalculated"]:
+                result["uncalculated_cells"] = formula_status["uncalculated"][:MAX_LISTED_FORMULA_CELLS]
+        return result
 
     @staticmethod
     def _get_column_letter(col_idx: int) -> str:
@@ -105,7 +169,13 @@ class ExcelAnalyzer:
         return get_column_letter(col_idx)
 
 
-def analyze_excel_file(file_path: str, sheet_name: Optional[str] = None, preview_rows: int = 100) -> Dict[str, Any]:
+def analyze_excel_file(
+    file_path: str,
+    sheet_name: Optional[str] = None,
+    preview_rows: int = 100,
+    workbook_cache: Optional[WorkbookCache] = None,
+    evaluate_formulas: bool = True
+) -> Dict[str, Any]:
     """
     分析Excel文件的便捷函数
 
@@ -113,9 +183,29 @@ def analyze_excel_file(file_path: str, sheet_name: Optional[str] = None, preview
         file_path: Excel文件路径
         sheet_name: 可选的sheet名称
         preview_rows: 预览行数
+        workbook_cache: 本轮的工作簿缓存，提供时与apply_color_scale共用一次解析
+        evaluate_formulas: 是否为没有缓存值的简单聚合公式补算结果
 
     Returns:
         分析结果
     """
-    with ExcelAnalyzer(file_path) as analyzer:
-        return analyzer.analyze(sheet_name, preview_rows)
+    if workbook_cache is not None:
+        workbook = workbook_cache.open(file_path)
+        if workbook is not None:
+            analyzer = ExcelAnalyzer(
+                file_path,
+                workbook=workbook,
+                values_path=workbook_cache.values_source(file_path),
+                evaluate_formulas=evaluate_formulas
+            )
+            with analyzer:
+                result = analyzer.analyze(sheet_name, preview_rows)
+            result["load_strategy"] = "cached"
+            return result
+
+    # 没有可复用的工作簿时不加载：sheet列表、维度和预览都直接从XML流式读取，
+    # 内存占用与文件大小无关，也不再需要按大小在完整加载和只读模式之间选择
+    with ExcelAnalyzer(file_path, native=True, evaluate_formulas=evaluate_formulas) as analyzer:
+        result = analyzer.analyze(sheet_name, preview_rows)
+    result["load_strategy"] = STRATEGY_NATIVE
+    return result
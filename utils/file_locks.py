@@ -0,0 +1,30 @@
+"""
+文件写锁
+同一进程内并发执行的工具调用按输出文件路径串行写入
+"""
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator
+
+
+_registry_lock = threading.Lock()
+_file_locks: Dict[str, threading.Lock] = {}
+
+
+def get_file_lock(file_path: str) -> threading.Lock:
+    """获取文件路径对应的锁（同一路径总是返回同一把锁）"""
+    key = str(Path(file_path).resolve())
+    with _registry_lock:
+        lock = _file_locks.get(key)
+        if lock is None:
+            lock = _file_locks[key] = threading.Lock()
+        return lock
+
+
+@contextmanager
+def file_lock(file_path: str) -> Iterator[None]:
+    """在with块内独占指定文件的读改写"""
+    lock = get_file_lock(file_path)
+    with lock:
+        yield
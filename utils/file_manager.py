@@ -3,9 +3,14 @@
 处理上传文件的保存、临时存储和输出文件管理
 """
 import os
+import shutil
 import uuid
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from utils.output_registry import REGISTRY_FILE_NAME, OutputRegistry, file_sha256
+from utils.upload_stream import write_upload
+from utils.xlsx_converter import CONVERTIBLE_SUFFIXES, convert_to_xlsx
 
 
 class FileManager:
@@ -14,6 +19,10 @@ class FileManager:
     def __init__(self, base_temp_dir: str = "./temp"):
         self.base_temp_dir = Path(base_temp_dir)
         self.base_temp_dir.mkdir(parents=True, exist_ok=True)
+        # 格式转换结果缓存（按内容哈希，跨session共享）
+        self.conversion_cache_dir = self.base_temp_dir / "_converted"
+        # 输出登记表的内存索引：{session_id: (登记表修改时间, {输出文件: 记录}, {工具调用ID: 输出文件})}
+        self._output_index: Dict[str, Tuple[int, Dict[str, Dict[str, Any]], Dict[str, str]]] = {}
 
     def create_session_dir(self, session_id: str) -> Path:
         """为session创建专属目录"""
@@ -25,22 +34,103 @@ class FileManager:
         """
         保存上传的文件到临时目录
 
+        .xls / .csv 文件会在此处转换为 .xlsx，Agent只会看到转换后的文件。
+        文件分块写入并在写入时校验（见utils/upload_stream.py），损坏或类型不符的文件直接拒绝
+
         Args:
             uploaded_file: Streamlit上传的文件对象
             session_id: 会话ID
 
         Returns:
-            保存后的文件路径
+            保存后的文件路径（需要转换时为转换后的xlsx路径）
+
+        Raises:
+            InvalidUploadError: 文件为空、损坏或与扩展名不符
         """
         session_dir = self.create_session_dir(session_id)
         file_path = session_dir / uploaded_file.name
 
-        # 保存文件
-        with open(file_path, 'wb') as f:
-            f.write(uploaded_file.getbuffer())
+        # 分块保存，同时计算哈希（格式转换的缓存直接使用）
+        write_upload(uploaded_file, uploaded_file.name, str(file_path))
+
+        if file_path.suffix.lower() in CONVERTIBLE_SUFFIXES:
+            return self.convert_to_xlsx(str(file_path))
 
         return str(file_path)
 
+    def get_uploaded_path(self, file_name: str, session_id: str) -> str:
+        """获取上传文件在session目录中的原始保存路径"""
+        return str(self.base_temp_dir / session_id / file_name)
+
+    def convert_to_xlsx(self, source_path: str) -> str:
+        """
+        将 .xls / .csv 文件转换为 .xlsx
+
+        转换结果按文件内容哈希缓存，同一文件重复上传时直接复用
+
+        Args:
+            source_path: 源文件路径
+
+        Returns:
+            转换后的xlsx文件路径（与源文件同目录）
+        """
+        source = Path(source_path)
+        content_hash = self.compute_file_hash(source_path)
+
+        self.conversion_cache_dir.mkdir(parents=True, exist_ok=True)
+        cached_file = self.conversion_cache_dir / f"{content_hash}.xlsx"
+        if not cached_file.exists():
+            # 先写临时文件再原子替换，避免并发上传读到半成品
+            tmp_file = self.conversion_cache_dir / f"{content_hash}.{uuid.uuid4().hex}.tmp"
+            try:
+                convert_to_xlsx(source_path, str(tmp_file))
+                os.replace(tmp_file, cached_file)
+            finally:
+                if tmp_file.exists():
+                    tmp_file.unlink()
+
+        # 保留原扩展名，避免与同名的.xlsx上传文件冲突
+        output_file = source.parent / f"{source.stem}_{source.suffix.lstrip('.').lower()}.xlsx"
+        shutil.copyfile(cached_file, output_file)
+        return str(output_file)
+
+    @staticmethod
+    def compute_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """分块计算文件的SHA-256哈希（文件未变化时使用缓存）"""
+        return file_sha256(file_path, chunk_size)
+
+    def output_registry(self, session_id: str) -> OutputRegistry:
+        """session的输出文件登记表（工具写入输出后登记）"""
+        return OutputRegistry(str(self.base_temp_dir / session_id / REGISTRY_FILE_NAME))
+
+    def _outputs_index(self, session_id: str) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+        """登记表的内存索引，登记表文件未变化时不重新读取（每次页面重跑只需一次stat）"""
+        registry = self.output_registry(session_id)
+        try:
+            mtime = os.stat(registry.registry_path).st_mtime_ns
+        except FileNotFoundError:
+            return {}, {}
+        cached = self._output_index.get(session_id)
+        if cached is None or cached[0] != mtime:
+            outputs = registry.outputs()
+            by_tool_use = {entry["tool_use_id"]: path for path, entry in outputs.items() if entry.get("tool_use_id")}
+            cached = self._output_index[session_id] = (mtime, outputs, by_tool_use)
+        return cached[1], cached[2]
+
+    def get_outputs(self, session_id: str) -> Dict[str, Dict[str, Any]]:
+        """
+        session中已登记的输出文件
+
+        Returns:
+            {输出文件: {"size", "sha256", "tool", "tool_use_id", "created_at", ...}}
+        """
+        return self._outputs_index(session_id)[0]
+
+    def find_output_for_tool_calls(self, session_id: str, tool_use_ids: Iterable[str]) -> Optional[str]:
+        """按工具调用顺序返回第一个由这些调用生成的输出文件（没有时返回None）"""
+        _, by_tool_use = self._outputs_index(session_id)
+        return next((by_tool_use[tool_use_id] for tool_use_id in tool_use_ids if tool_use_id in by_tool_use), None)
+
     def generate_output_filename(self, original_path: str, suffix: str = "_colored") -> str:
         """
         生成输出文件名
@@ -58,9 +148,9 @@ class FileManager:
 
     def cleanup_session(self, session_id: str):
         """清理session的临时文件"""
+        self._output_index.pop(session_id, None)
         session_dir = self.base_temp_dir / session_id
         if session_dir.exists():
-            import shutil
             shutil.rmtree(session_dir)
 
     def get_session_files(self, session_id: str) -> list:
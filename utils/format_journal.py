@@ -0,0 +1,115 @@
+"""
+条件格式日志
+记录每个输出文件上已应用的色阶规则（sheet、范围、方案等），支持删除/替换单条规则，
+之后只需从原文件按日志一次性重新生成输出，不必重放整段对话的工具调用
+
+日志以JSON保存在输出文件所在的会话目录中，队列模式下的Worker进程同样可以读写
+"""
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.file_locks import file_lock
+
+
+JOURNAL_FILE_NAME = ".format_journal.json"
+
+
+class FormatJournal:
+    """
+    单个会话目录的条件格式日志
+
+    结构：{"next_id": N, "outputs": {输出文件: {"base_file": 原文件, "entries": [规则记录]}}}
+    """
+
+    def __init__(self, journal_path: str):
+        self.journal_path = journal_path
+
+    @classmethod
+    def for_file(cls, file_path: str) -> "FormatJournal":
+        """获取与文件同目录（即会话目录）的日志"""
+        return cls(str(Path(file_path).parent / JOURNAL_FILE_NAME))
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.journal_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"next_id": 1, "outputs": {}}
+
+    def _save(self, data: Dict[str, Any]):
+        temp_path = f"{self.journal_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.journal_path)
+
+    def start(self, output_file: str, base_file: str):
+        """输出文件从原文件重新生成时调用，清空该输出之前的记录"""
+        with file_lock(self.journal_path):
+            data = self._load()
+            data["outputs"][output_file] = {"base_file": base_file, "entries": []}
+            self._save(data)
+
+    def record(self, output_file: str, base_file: str, params: Dict[str, Any]) -> str:
+        """
+        追加一条规则记录
+
+        Args:
+            output_file: 输出文件
+            base_file: 生成该输出的原文件（xlsx）
+            params: 规则参数（sheet_name, cell_range, scale_type, color_scheme, column_schemes, mode, robust）
+
+        Returns:
+            规则ID（如 "r3"）
+        """
+        with file_lock(self.journal_path):
+            data = self._load()
+            output = data["outputs"].setdefault(output_file, {"base_file": base_file, "entries": []})
+            rule_id = f"r{data['next_id']}"
+            data["next_id"] += 1
+            output["entries"].append({"rule_id": rule_id, "created_at": time.time(), **params})
+            self._save(data)
+            return rule_id
+
+    def outputs(self) -> Dict[str, Dict[str, Any]]:
+        """所有输出文件及其规则记录"""
+        with file_lock(self.journal_path):
+            return self._load()["outputs"]
+
+    def find(self, rule_id: str) -> Optional[str]:
+        """查找规则所在的输出文件"""
+        for output_file, output in self.outputs().items():
+            if any(entry["rule_id"] == rule_id for entry in output["entries"]):
+                return output_file
+        return None
+
+    def remove(self, rule_id: str) -> Optional[Dict[str, Any]]:
+        """删除一条规则，返回被删除的记录（不存在时返回None）"""
+        with file_lock(self.journal_path):
+            data = self._load()
+            for output in data["outputs"].values():
+                for index, entry in enumerate(output["entries"]):
+                    if entry["rule_id"] == rule_id:
+                        removed = output["entries"].pop(index)
+                        self._save(data)
+                        return removed
+        return None
+
+    def update(self, rule_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """修改一条规则的参数（ID不变），返回修改后的记录（不存在时返回None）"""
+        with file_lock(self.journal_path):
+            data = self._load()
+            for output in data["outputs"].values():
+                for entry in output["entries"]:
+                    if entry["rule_id"] == rule_id:
+                        entry.update(changes)
+                        self._save(data)
+                        return dict(entry)
+        return None
+
+    def entries(self, output_file: str) -> List[Dict[str, Any]]:
+        """输出文件上的规则记录（按应用顺序）"""
+        return self.outputs().get(output_file, {}).get("entries", [])
@@ -0,0 +1,178 @@
+"""
+简单公式求值
+程序生成的xlsx（透视表导出、openpyxl写出的文件等）中公式没有缓存的计算结果，预览中显示为空，
+模型容易误判数据区域。这里只对常见的简单聚合补算结果：
+
+  =SUM / AVERAGE / MIN / MAX / COUNT(参数, ...)   参数为同一sheet内的单元格、范围或数字
+  =B5                                            单个单元格引用
+
+其他公式（跨sheet引用、算术表达式、其他函数）不求值，保持"未计算"
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from utils.sheet_reader import SheetCell
+
+
+_AGGREGATE = re.compile(r"^=\s*(SUM|AVERAGE|MIN|MAX|COUNT)\s*\((.*)\)\s*$", re.IGNORECASE)
+_REFERENCE = re.compile(r"^\$?([A-Z]{1,3})\$?(\d+)(?::\$?([A-Z]{1,3})\$?(\d+))?$", re.IGNORECASE)
+_NUMBER = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$")
+
+# 单次求值最多展开的单元格数，防止整列引用（如 A1:A1048576）展开过多
+MAX_REFERENCED_CELLS = 100_000
+
+
+class _Unknown(Exception):
+    """引用的单元格不在已读取的范围内，或依赖的公式无法求值"""
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + ord(char) - 64
+    return index
+
+
+def _parse_reference(text: str) -> Optional[Tuple[int, int, int, int]]:
+    """'B2' / '$B$2:D10' -> (min_col, min_row, max_col, max_row)"""
+    match = _REFERENCE.match(text.strip())
+    if not match:
+        return None
+    col1, row1 = _column_index(match.group(1)), int(match.group(2))
+    col2 = _column_index(match.group(3)) if match.group(3) else col1
+    row2 = int(match.group(4)) if match.group(4) else row1
+    return min(col1, col2), min(row1, row2), max(col1, col2), max(row1, row2)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class FormulaEvaluator:
+    """
+    对已读取的单元格求值简单公式
+
+    只使用max_row行以内的单元格；引用超出该范围时视为无法求值
+    """
+
+    def __init__(self, cells: Dict[Tuple[int, int], SheetCell], max_row: int):
+        self.cells = cells
+        self.max_row = max_row
+        self._results: Dict[Tuple[int, int], Any] = {}
+        self._evaluating: Set[Tuple[int, int]] = set()
+
+    def evaluate(self, row: int, col: int) -> Optional[Any]:
+        """
+        求值一个未计算的公式单元格
+
+        Returns:
+            计算结果；不支持的公式或无法确定结果时返回None
+        """
+        try:
+            return self._value_of(row, col)
+        except _Unknown:
+            return None
+
+    def _value_of(self, row: int, col: int) -> Any:
+        if row > self.max_row:
+            raise _Unknown()
+        cell = self.cells.get((row, col))
+        if cell is None:
+            return None
+        if not cell.uncalculated:
+            return cell.value
+
+        key = (row, col)
+        if key in self._results:
+            return self._results[key]
+        if key in self._evaluating:
+            # 循环引用
+            raise _Unknown()
+        self._evaluating.add(key)
+        try:
+            result = self._evaluate_formula(cell.formula)
+        finally:
+            self._evaluating.discard(key)
+        self._results[key] = result
+        return result
+
+    def _evaluate_formula(self, formula: str) -> Any:
+        bounds = _parse_reference(formula[1:])
+        if bounds and bounds[0] == bounds[2] and bounds[1] == bounds[3]:
+            value = self._value_of(bounds[1], bounds[0])
+            # 引用空单元格时Excel显示0
+            return 0 if value is None else value
+
+        match = _AGGREGATE.match(formula)
+        if not match:
+            raise _Unknown()
+        function = match.group(1).upper()
+        numbers = self._collect_numbers(match.group(2))
+
+        if function == "SUM":
+            return sum(numbers)
+        if function == "COUNT":
+            return len(numbers)
+        if function == "AVERAGE":
+            if not numbers:
+                raise _Unknown()
+            return sum(numbers) / len(numbers)
+        if function == "MIN":
+            return min(numbers) if numbers else 0
+        return max(numbers) if numbers else 0
+
+    def _collect_numbers(self, arguments: str) -> List[float]:
+        """展开参数中的数值：范围内只取数字（与Excel一致，忽略文本和布尔值），直接写出的数字照常计入"""
+        numbers = []
+        for argument in arguments.split(","):
+            argument = argument.strip()
+            if not argument:
+                continue
+            if _NUMBER.match(argument):
+                numbers.append(float(argument) if any(c in argument for c in ".eE") else int(argument))
+                continue
+
+            bounds = _parse_reference(argument)
+            if bounds is None:
+                raise _Unknown()
+            min_col, min_row, max_col, max_row = bounds
+            if max_row > self.max_row or (max_col - min_col + 1) * (max_row - min_row + 1) > MAX_REFERENCED_CELLS:
+                raise _Unknown()
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    value = self._value_of(row, col)
+                    if _is_number(value):
+                        numbers.append(value)
+        return numbers
+
+
+def fill_uncalculated(
+    cells: Dict[Tuple[int, int], SheetCell],
+    max_row: int,
+    format_coordinate: Callable[[int, int], str]
+) -> Dict[str, List[str]]:
+    """
+    为未计算的公式单元格补算结果（原地替换cells中的值）
+
+    Returns:
+        {"evaluated": 已补算的单元格坐标, "uncalculated": 仍无法求值的单元格坐标}
+    """
+    evaluator = FormulaEvaluator(cells, max_row)
+    values = {}
+    uncalculated = []
+    for (row, col), cell in sorted(cells.items()):
+        if not cell.uncalculated:
+            continue
+        value = evaluator.evaluate(row, col)
+        if value is None:
+            uncalculated.append(format_coordinate(row, col))
+        else:
+            values[(row, col)] = value
+
+    # 全部求值完成后再替换（求值器对依赖的公式单元格有记忆，替换顺序不影响结果）
+    for (row, col), value in values.items():
+        cells[(row, col)] = SheetCell(value, cells[(row, col)].formula)
+    return {
+        "evaluated": [format_coordinate(row, col) for row, col in values],
+        "uncalculated": uncalculated
+    }
@@ -0,0 +1,255 @@
+"""
+任务队列
+基于SQLite的本地任务队列，UI进程入队，Worker进程领取并执行，结果按job id取回
+"""
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+# 任务类型
+JOB_KINDS = ("analyze", "apply", "agent_turn")
+
+# 任务状态
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# 启用队列模式的环境变量（值为SQLite数据库路径）
+JOB_QUEUE_ENV_VAR = "JOB_QUEUE_DB"
+# UI等待单个任务的最长时间（秒）
+JOB_WAIT_TIMEOUT_ENV_VAR = "JOB_WAIT_TIMEOUT"
+DEFAULT_JOB_WAIT_TIMEOUT = 900.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    lease_expires_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class JobQueue:
+    """
+    SQLite任务队列
+
+    每次操作使用独立连接，可在多个进程间共享同一个数据库文件
+    """
+
+    def __init__(self, db_path: str = "./temp/jobs.db", lease_seconds: float = 600, max_attempts: int = 2):
+        """
+        Args:
+            db_path: SQLite数据库文件路径
+            lease_seconds: 任务租约时长，running任务的租约过期（Worker没有续约）视为Worker已失联，重新入队
+            max_attempts: 单个任务的最大执行次数，达到后租约过期的任务标记为失败
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        """
+        提交任务
+
+        Args:
+            kind: 任务类型（analyze / apply / agent_turn）
+            payload: 任务参数（需可JSON序列化）
+
+        Returns:
+            job id
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"不支持的任务类型: {kind}，支持的类型: {JOB_KINDS}")
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), STATUS_QUEUED, time.time())
+            )
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        领取最早的待执行任务（原子操作）
+
+        租约过期的running任务会被重新领取；已达到最大执行次数的直接标记为失败，
+        避免等待结果的一方永远看到running
+
+        Returns:
+            任务字典，没有可执行任务时返回None
+        """
+        now = time.time()
+        lease_expired = "lease_expires_at < ?"
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                f"""
+                UPDATE jobs SET status = ?, error = ?, finished_at = ?
+                WHERE status = ? AND {lease_expired} AND attempts >= ?
+                """,
+                (STATUS_FAILED, f"Worker失联，已执行 {self.max_attempts} 次仍未完成", now,
+                 STATUS_RUNNING, now, self.max_attempts)
+            )
+            row = conn.execute(
+                f"""
+                SELECT * FROM jobs
+                WHERE (status = ? OR (status = ? AND {lease_expired})) AND attempts < ?
+                ORDER BY created_at LIMIT 1
+                """,
+                (STATUS_QUEUED, STATUS_RUNNING, now, self.max_attempts)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                """
+                UPDATE jobs SET status = ?, worker = ?, started_at = ?, lease_expires_at = ?, attempts = attempts + 1
+                WHERE id = ?
+                """,
+                (STATUS_RUNNING, worker_id, now, now + self.lease_seconds, row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        job = self._row_to_job(row)
+        job.update(
+            status=STATUS_RUNNING, worker=worker_id, started_at=now,
+            lease_expires_at=now + self.lease_seconds, attempts=row["attempts"] + 1
+        )
+        return job
+
+    def renew(self, job_id: str, worker_id: str) -> bool:
+        """
+        续约正在执行的任务（执行时间可能超过租约时长时，Worker需定期调用）
+
+        Returns:
+            False表示任务已不属于该Worker（租约过期后被重新领取或已结束）
+        """
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (time.time() + self.lease_seconds, job_id, worker_id, STATUS_RUNNING)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: Any) -> bool:
+        """
+        标记任务完成并保存结果
+
+        Returns:
+            False表示任务已不属于该Worker（租约过期后被重新领取或已结束），结果未写入
+        """
+        return self._finish(
+            job_id, worker_id, STATUS_DONE, "result", json.dumps(result, ensure_ascii=False, default=str)
+        )
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """
+        标记任务失败
+
+        Returns:
+            False表示任务已不属于该Worker，状态未修改
+        """
+        return self._finish(job_id, worker_id, STATUS_FAILED, "error", error)
+
+    def _finish(self, job_id: str, worker_id: str, status: str, column: str, value: str) -> bool:
+        """只有仍持有任务的Worker能结束任务，失联后被重新领取的旧Worker不会覆盖新Worker的结果"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET status = ?, {column} = ?, finished_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (status, value, time.time(), job_id, worker_id, STATUS_RUNNING)
+            )
+            return cursor.rowcount == 1
+
+    def cancel(self, job_id: str, error: str) -> bool:
+        """
+        由提交方放弃任务：排队中或执行中的任务标记为失败，之后Worker的结果不再写入
+
+        Returns:
+            False表示任务已经结束
+        """
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (STATUS_FAILED, error, time.time(), job_id, STATUS_QUEUED, STATUS_RUNNING)
+            )
+            return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务状态和结果"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None, poll_interval: float = 0.5) -> Dict[str, Any]:
+        """
+        阻塞等待任务结束
+
+        Raises:
+            TimeoutError: 超时仍未结束
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                raise KeyError(f"任务不存在: {job_id}")
+            if job["status"] in (STATUS_DONE, STATUS_FAILED):
+                return job
+            if deadline is not None and time.time() >= deadline:
+                raise TimeoutError(f"任务 {job_id} 在 {timeout} 秒内未完成")
+            time.sleep(poll_interval)
+
+    def pending_count(self) -> int:
+        """排队中的任务数量"""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (STATUS_QUEUED,)).fetchone()[0]
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        if job.get("result") is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+
+
+def job_wait_timeout_from_env() -> float:
+    """UI等待任务的超时时间（环境变量JOB_WAIT_TIMEOUT，秒）"""
+    return float(os.environ.get(JOB_WAIT_TIMEOUT_ENV_VAR, DEFAULT_JOB_WAIT_TIMEOUT))
+
+
+def get_job_queue_from_env() -> Optional[JobQueue]:
+    """环境变量JOB_QUEUE_DB设置时返回对应的队列，否则返回None（直接在UI进程中执行）"""
+    db_path = os.environ.get(JOB_QUEUE_ENV_VAR)
+    return JobQueue(db_path) if db_path else None
@@ -0,0 +1,35 @@
+"""
+重依赖的延迟导入
+Streamlit每次交互都会重新执行app.py，页面首次渲染只需要轻量模块；
+agent_manager（strands / Bedrock / boto3）、色阶预览（numpy / openpyxl）等在第一次用到时才导入。
+页面渲染完成后可在后台线程中预热，用户输入第一条消息时通常已经导入完毕；
+预热尚未完成时函数内的import会等待同一模块的导入锁，不会重复导入
+"""
+import importlib
+import threading
+from typing import Iterable, Set
+
+# 本地模式下聊天需要的重模块（队列模式下Agent在Worker中运行，界面不需要agent_manager）
+AGENT_MODULES = ("agent_manager", "utils.workbook_cache")
+PREVIEW_MODULES = ("utils.color_preview",)
+
+_lock = threading.Lock()
+_preloading: Set[str] = set()
+
+
+def _preload_worker(module_names: Iterable[str]):
+    for module_name in module_names:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            # 预热失败不影响页面，真正用到时会再次导入并报出原始错误
+            print(f"警告: 预加载 {module_name} 失败: {e}")
+
+
+def preload(module_names: Iterable[str]):
+    """在后台线程中导入模块，每个模块在进程内只预热一次"""
+    with _lock:
+        pending = [name for name in module_names if name not in _preloading]
+        _preloading.update(pending)
+    if pending:
+        threading.Thread(target=_preload_worker, args=(pending,), name="module-preload", daemon=True).start()
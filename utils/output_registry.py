@@ -0,0 +1,173 @@
+"""
+输出文件登记表
+记录会话中每个输出文件的大小、哈希、生成它的工具调用和时间，以及生成它的输入指纹
+（原文件内容哈希 + 规则集哈希）。界面按输出路径或工具调用ID直接查询，不必遍历消息历史逐个检查文件；
+输入和规则集都相同的重复调用可以直接复用已有输出。
+
+登记表以JSON保存在会话目录中（与条件格式日志相同），队列模式下的Worker进程同样可以读写
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from utils.file_locks import file_lock
+
+
+REGISTRY_FILE_NAME = ".output_registry.json"
+
+# 规则集哈希不包含的字段（规则ID和时间不影响输出内容）
+_VOLATILE_RULE_KEYS = {"rule_id", "created_at"}
+
+# 文件内容哈希缓存：(路径, 大小, 修改时间) 不变时不重新读取文件
+_hash_lock = threading.Lock()
+_hash_cache: Dict[str, Tuple[int, int, str]] = {}
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """文件内容的SHA-256（按大小和修改时间缓存，同一文件反复登记时只读一次）"""
+    stat = os.stat(file_path)
+    key = str(Path(file_path).resolve())
+    with _hash_lock:
+        cached = _hash_cache.get(key)
+    if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    content_hash = digest.hexdigest()
+    with _hash_lock:
+        _hash_cache[key] = (stat.st_size, stat.st_mtime_ns, content_hash)
+    return content_hash
+
+
+def remember_file_hash(file_path: str, content_hash: str):
+    """登记边写入边计算出的文件哈希（如上传文件），之后的file_sha256不再读取文件"""
+    stat = os.stat(file_path)
+    with _hash_lock:
+        _hash_cache[str(Path(file_path).resolve())] = (stat.st_size, stat.st_mtime_ns, content_hash)
+
+
+def rules_sha256(entries: Iterable[Dict[str, Any]]) -> str:
+    """规则集的哈希：按应用顺序，忽略规则ID、时间和取值为None的参数"""
+    normalized = [
+        {key: value for key, value in entry.items() if key not in _VOLATILE_RULE_KEYS and value is not None}
+        for entry in entries
+    ]
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def fingerprint(input_hash: str, rules_hash: str) -> str:
+    return f"{input_hash}:{rules_hash}"
+
+
+class OutputRegistry:
+    """
+    单个会话目录的输出文件登记表
+
+    结构：{"outputs": {输出文件: 记录}, "fingerprints": {输入指纹: 输出文件}}
+    记录：{"size", "sha256", "mtime_ns", "tool", "tool_use_id", "input_hash", "rules_hash", "rule_count", "created_at"}
+    """
+
+    def __init__(self, registry_path: str):
+        self.registry_path = registry_path
+
+    @classmethod
+    def for_file(cls, file_path: str) -> "OutputRegistry":
+        """获取与文件同目录（即会话目录）的登记表"""
+        return cls(str(Path(file_path).parent / REGISTRY_FILE_NAME))
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.registry_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"outputs": {}, "fingerprints": {}}
+
+    def _save(self, data: Dict[str, Any]):
+        temp_path = f"{self.registry_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.registry_path)
+
+    def record(
+        self,
+        output_file: str,
+        tool_name: str,
+        tool_use_id: Optional[str] = None,
+        input_hash: Optional[str] = None,
+        rules_hash: Optional[str] = None,
+        rule_count: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        登记（或更新）一个刚写入的输出文件
+
+        Args:
+            output_file: 输出文件路径
+            tool_name: 生成该文件的工具
+            tool_use_id: 生成该文件的工具调用ID
+            input_hash: 原文件内容哈希（file_sha256）
+            rules_hash: 输出上完整规则集的哈希（rules_sha256）；与input_hash同时提供时才可被复用
+            rule_count: 输出中的条件格式规则条数
+
+        Returns:
+            登记的记录
+        """
+        stat = os.stat(output_file)
+        entry = {
+            "size": stat.st_size,
+            "sha256": file_sha256(output_file),
+            "mtime_ns": stat.st_mtime_ns,
+            "tool": tool_name,
+            "tool_use_id": tool_use_id,
+            "input_hash": input_hash,
+            "rules_hash": rules_hash,
+            "rule_count": rule_count,
+            "created_at": time.time()
+        }
+        with file_lock(self.registry_path):
+            data = self._load()
+            # 同一输出文件被覆盖后，旧指纹不再对应它的内容
+            data["fingerprints"] = {key: path for key, path in data["fingerprints"].items() if path != output_file}
+            data["outputs"][output_file] = entry
+            if input_hash and rules_hash:
+                data["fingerprints"][fingerprint(input_hash, rules_hash)] = output_file
+            self._save(data)
+        return entry
+
+    def outputs(self) -> Dict[str, Dict[str, Any]]:
+        """所有已登记的输出文件及其记录"""
+        with file_lock(self.registry_path):
+            return self._load()["outputs"]
+
+    def get(self, output_file: str) -> Optional[Dict[str, Any]]:
+        return self.outputs().get(output_file)
+
+    def find(self, input_hash: str, rules_hash: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        查找输入和规则集都相同的已有输出
+
+        文件在登记后被修改或删除（大小、修改时间与登记时不同）时视为不存在
+
+        Returns:
+            (输出文件, 记录)，没有可复用的输出时返回None
+        """
+        with file_lock(self.registry_path):
+            data = self._load()
+        output_file = data["fingerprints"].get(fingerprint(input_hash, rules_hash))
+        if output_file is None:
+            return None
+        entry = data["outputs"].get(output_file)
+        try:
+            stat = os.stat(output_file)
+        except FileNotFoundError:
+            return None
+        if entry is None or (stat.st_size, stat.st_mtime_ns) != (entry["size"], entry["mtime_ns"]):
+            return None
+        return output_file, entry
@@ -0,0 +1,266 @@
+"""
+范围数值分布统计
+一次流式扫描cell_range内的数值，精确统计个数/最小/最大/均值/标准差，
+分位数和离群值比例由固定大小的蓄水池样本估算，内存占用与范围大小无关。
+统计结果用于给出色阶类型和节点建议（如离群值较多时用固定数值节点代替min/max）；
+按列/按行分组估计的分位数用于robust色阶的两端节点
+"""
+import math
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.cell_range import count_cells, parse_cell_range
+from utils.color_schemes import get_scheme_registry
+from utils.sheet_reader import iter_numeric_chunks, iter_numeric_groups
+
+
+# 蓄水池样本大小：分位数的秩误差约为 1/sqrt(SAMPLE_SIZE)
+SAMPLE_SIZE = 20_000
+QUANTILES = (5, 25, 50, 75, 95)
+
+# 超过该比例的值落在Tukey围栏（Q1-1.5IQR, Q3+1.5IQR）之外时，min/max节点会被离群值拉偏
+OUTLIER_FRACTION_THRESHOLD = 0.02
+# 均值与中位数之差超过IQR的该比例时视为偏态，三色阶的百分位中点更合适
+SKEW_THRESHOLD = 0.25
+
+
+def _round(value: float) -> Any:
+    """保留6位有效数字，整数值输出为int（减少结果中的token）"""
+    if value is None or not math.isfinite(value):
+        return None
+    rounded = float(f"{value:.6g}")
+    return int(rounded) if rounded.is_integer() and abs(rounded) < 1e15 else rounded
+
+
+def _to_floats(values: Sequence[bytes]) -> np.ndarray:
+    """<v>文本批量转换为float数组（逐个float()比先建字节串数组再astype快一倍多）"""
+    return np.fromiter(map(float, values), np.float64, len(values))
+
+
+class StreamingStats:
+    """
+    单遍流式统计
+
+    个数、最小、最大、均值、方差精确计算（按块合并，Chan并行方差公式）；
+    分位数使用Algorithm R蓄水池样本，数据量不超过样本大小时为精确值；
+    样本数组按需增长（逐行统计时每行只有几十个值，不必预先分配整个样本）
+    """
+
+    def __init__(self, sample_size: int = SAMPLE_SIZE, seed: int = 0):
+        self.sample_size = sample_size
+        self.count = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.negative = 0
+        self._sample = np.empty(0)
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray):
+        """合并一块数值（一维float数组，不含NaN）"""
+        n = values.size
+        if n == 0:
+            return
+
+        chunk_mean = float(values.mean())
+        chunk_m2 = float(((values - chunk_mean) ** 2).sum())
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self._m2 += chunk_m2 + delta * delta * self.count * n / total
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        self.negative += int((values < 0).sum())
+
+        # 蓄水池：先填满，之后第i个值（从0计）以 sample_size/(i+1) 的概率替换随机位置
+        filled = min(self.count, self.sample_size)
+        take = min(self.sample_size - filled, n)
+        if take > 0:
+            if filled + take > self._sample.size:
+                grown = np.empty(min(self.sample_size, max(filled + take, 2 * self._sample.size)))
+                grown[:filled] = self._sample[:filled]
+                self._sample = grown
+            self._sample[filled:filled + take] = values[:take]
+        rest = values[take:]
+        if rest.size:
+            positions = self.count + take + np.arange(rest.size)
+            slots = (self._rng.random(rest.size) * (positions + 1)).astype(np.int64)
+            keep = slots < self.sample_size
+            self._sample[slots[keep]] = rest[keep]
+        self.count = total
+
+    @property
+    def sample(self) -> np.ndarray:
+        return self._sample[:min(self.count, self.sample_size)]
+
+    def summary(self) -> Dict[str, Any]:
+        """统计结果（数值已取6位有效数字）"""
+        if self.count == 0:
+            return {"numeric_cells": 0}
+
+        sample = self.sample
+        quantiles = np.percentile(sample, QUANTILES)
+        q1, q3 = quantiles[QUANTILES.index(25)], quantiles[QUANTILES.index(75)]
+        iqr = q3 - q1
+        outliers = ((sample < q1 - 1.5 * iqr) | (sample > q3 + 1.5 * iqr)).mean() if iqr > 0 else 0.0
+
+        return {
+            "numeric_cells": self.count,
+            "min": _round(self.minimum),
+            "max": _round(self.maximum),
+            "mean": _round(self.mean),
+            "std": _round(math.sqrt(self._m2 / self.count)),
+            "quantiles": {f"p{q}": _round(value) for q, value in zip(QUANTILES, quantiles)},
+            "outlier_fraction": round(float(outliers), 4),
+            "negative_fraction": round(self.negative / self.count, 4),
+            "sampled": self.count > self.sample_size
+        }
+
+
+def _matching_schemes(scale_type: str, stops: Dict[str, Dict[str, Any]], robust: bool) -> List[str]:
+    """
+    注册表中节点与stops一致的方案（robust时两端由P5/P95替换，只比较中间节点）
+    """
+    registry = get_scheme_registry()
+    names = []
+    for name in registry.scheme_names(scale_type):
+        config = registry.get_config(scale_type, name)
+        if all(
+            config.get(f"{stop}_type") == spec["type"]
+            and ("value" not in spec or float(config.get(f"{stop}_value")) == float(spec["value"]))
+            for stop, spec in stops.items()
+            if not (robust and stop in ("start", "end"))
+        ):
+            names.append(name)
+    return names
+
+
+def suggest_scale(stats: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    根据分布给出色阶建议
+
+    只给出能用apply_color_scale的参数实现的建议：color_schemes为节点与建议一致的注册方案，
+    robust为True时需传robust=true（两端固定在P5/P95）；没有匹配的方案时依次考虑下一条建议
+
+    Returns:
+        {"scale_type", "color_schemes", "robust"（可选）, "stops": {节点: {"type", "value"}}, "reason"}；
+        没有数值时返回None。颜色方向（红高还是绿高）取决于业务含义，从color_schemes中按含义选择
+    """
+    if not stats.get("numeric_cells"):
+        return None
+
+    quantiles = stats["quantiles"]
+    iqr = quantiles["p75"] - quantiles["p25"]
+
+    candidates = []
+    if stats["min"] < 0 < stats["max"]:
+        candidates.append({
+            "scale_type": "three_color",
+            "stops": {"start": {"type": "min"}, "mid": {"type": "num", "value": 0}, "end": {"type": "max"}},
+            "reason": f"正负值混合（负值占{stats['negative_fraction']:.0%}），建议中间节点固定在0的三色阶"
+        })
+
+    if stats["outlier_fraction"] > OUTLIER_FRACTION_THRESHOLD:
+        candidates.append({
+            "scale_type": "three_color",
+            "robust": True,
+            "stops": {
+                "start": {"type": "num", "value": quantiles["p5"]},
+                "mid": {"type": "percentile", "value": 50},
+                "end": {"type": "num", "value": quantiles["p95"]}
+            },
+            "reason": (
+                f"{stats['outlier_fraction']:.1%}的值为离群值，min/max节点会被拉偏导致大部分单元格颜色接近；"
+                f"建议robust=true，两端固定在P5={quantiles['p5']}和P95={quantiles['p95']}"
+            )
+        })
+
+    if iqr > 0 and abs(stats["mean"] - quantiles["p50"]) > SKEW_THRESHOLD * iqr:
+        candidates.append({
+            "scale_type": "three_color",
+            "stops": {"start": {"type": "min"}, "mid": {"type": "percentile", "value": 50}, "end": {"type": "max"}},
+            "reason": f"分布偏斜（均值{stats['mean']}，中位数{quantiles['p50']}），三色阶的中位数中点能让颜色分布更均匀"
+        })
+
+    candidates.append({
+        "scale_type": "two_color",
+        "stops": {"start": {"type": "min"}, "end": {"type": "max"}},
+        "reason": "分布较均匀、无明显离群值，双色阶即可"
+    })
+
+    for candidate in candidates:
+        schemes = _matching_schemes(candidate["scale_type"], candidate["stops"], candidate.get("robust", False))
+        if schemes:
+            return {**candidate, "color_schemes": schemes}
+    return None
+
+
+def compute_range_stats(file_path: str, sheet_name: str, cell_range: str) -> Dict[str, Any]:
+    """
+    统计xlsx中单元格范围的数值分布
+
+    只统计数值单元格（含公式的缓存结果），文本、布尔值、错误值和空单元格不计入；
+    多个范围（空格分隔）合并统计
+
+    Args:
+        file_path: xlsx文件路径
+        sheet_name: sheet名称
+        cell_range: 单元格范围
+
+    Returns:
+        StreamingStats.summary() 的结果，另含total_cells（范围内单元格总数）和suggestion
+    """
+    stats = StreamingStats()
+    for bounds in parse_cell_range(cell_range):
+        for values in iter_numeric_chunks(file_path, sheet_name, bounds):
+            stats.update(_to_floats(values))
+
+    summary = stats.summary()
+    summary["total_cells"] = count_cells(cell_range)
+    summary["suggestion"] = suggest_scale(summary)
+    return summary
+
+
+def percentile_anchors(
+    file_path: str,
+    sheet_name: str,
+    cell_range: str,
+    percentiles: Sequence[float],
+    by: Optional[str] = "column",
+    key_of: Optional[Callable[[int], Hashable]] = None
+) -> Dict[Hashable, Tuple[Any, Any]]:
+    """
+    一次流式扫描，按列或按行分组估计范围内数值的低/高分位数（用作色阶两端的固定数值节点）
+
+    Args:
+        file_path: xlsx文件路径
+        sheet_name: sheet名称
+        cell_range: 单元格范围
+        percentiles: (低分位, 高分位)，如 (5, 95)
+        by: "column"按列号分组，"row"按行号分组，None不分组（整个范围一组，键为None，扫描最快）
+        key_of: 列号/行号到分组键的映射（如列到色彩方案），None则直接以列号/行号为键
+
+    Returns:
+        {分组键: (低分位数, 高分位数)}；没有数值或两个分位数相等（无法构成区间）的分组不包含在内
+    """
+    groups: Dict[Hashable, StreamingStats] = {}
+    for bounds in parse_cell_range(cell_range):
+        chunks = ({None: values} for values in iter_numeric_chunks(file_path, sheet_name, bounds)) if by is None \
+            else iter_numeric_groups(file_path, sheet_name, bounds, by)
+        for chunk in chunks:
+            for index, values in chunk.items():
+                key = key_of(index) if key_of and index is not None else index
+                stats = groups.get(key)
+                if stats is None:
+                    stats = groups[key] = StreamingStats()
+                stats.update(_to_floats(values))
+
+    anchors = {}
+    for key, stats in groups.items():
+        low, high = np.percentile(stats.sample, percentiles)
+        low, high = _round(float(low)), _round(float(high))
+        if low is not None and high is not None and high > low:
+            anchors[key] = (low, high)
+    return anchors
@@ -0,0 +1,182 @@
+"""
+模型调用准入控制
+令牌桶限速 + 并发上限 + 限流时自适应退避（AIMD），与具体事件循环无关，可跨会话共享
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+class AdmissionLimiter:
+    """
+    单个维度（模型ID或会话）的准入控制器
+
+    - 令牌桶：平均速率rate_per_second，突发burst
+    - 并发上限：同时进行中的调用数不超过max_concurrency
+    - 自适应：被限流时速率减半并指数退避，成功后逐步恢复速率
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float = 2.0,
+        burst: int = 4,
+        max_concurrency: int = 8,
+        min_rate: float = 0.1,
+        max_backoff: float = 60.0
+    ):
+        self.max_rate = rate_per_second
+        self.rate = rate_per_second
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.min_rate = min_rate
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._in_flight = 0
+        self._waiting = 0
+        self._backoff_until = 0.0
+        self._consecutive_throttles = 0
+        self._avg_call_seconds = 5.0
+        self.throttle_count = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _wait_time(self, now: float) -> float:
+        """当前还需等待的时间（调用方需持有锁）"""
+        waits = [self._backoff_until - now]
+        if self._tokens < 1:
+            waits.append((1 - self._tokens) / self.rate)
+        if self._in_flight >= self.max_concurrency:
+            waits.append(self._avg_call_seconds / self.max_concurrency)
+        return max(0.0, *waits)
+
+    def try_acquire(self) -> float:
+        """
+        尝试获取一次调用许可
+
+        Returns:
+            0表示已获取；否则为建议的等待秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._wait_time(now)
+            if wait <= 0:
+                self._tokens -= 1
+                self._in_flight += 1
+                return 0.0
+            return wait
+
+    async def acquire(self, poll_interval: float = 0.25):
+        """异步等待直到获得调用许可"""
+        with self._lock:
+            self._waiting += 1
+        try:
+            while True:
+                wait = self.try_acquire()
+                if wait <= 0:
+                    return
+                await asyncio.sleep(min(wait, poll_interval))
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def release(self, elapsed: Optional[float] = None):
+        """调用结束，释放并发名额；elapsed用于估算平均调用时长"""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if elapsed is not None:
+                self._avg_call_seconds = 0.8 * self._avg_call_seconds + 0.2 * elapsed
+
+    def on_throttle(self):
+        """被限流：速率减半，指数退避（带抖动）"""
+        with self._lock:
+            self.throttle_count += 1
+            self._consecutive_throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            backoff = min(self.max_backoff, 2 ** self._consecutive_throttles)
+            self._backoff_until = time.monotonic() + backoff * random.uniform(0.5, 1.0)
+
+    def on_success(self):
+        """调用成功：逐步恢复速率"""
+        with self._lock:
+            self._consecutive_throttles = 0
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def estimate_wait(self) -> float:
+        """估算新请求的等待时间（秒），供界面展示"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self._wait_time(now)
+            # 排在前面的等待者按当前速率依次放行
+            wait += self._waiting / self.rate
+            if self._in_flight + self._waiting >= self.max_concurrency:
+                wait += self._avg_call_seconds * (self._waiting // self.max_concurrency + 1)
+            return wait
+
+    def is_idle(self) -> bool:
+        """没有进行中或等待中的调用，也不在退避期内（丢弃后重建不会放松限流）"""
+        with self._lock:
+            return self._in_flight == 0 and self._waiting == 0 and self._backoff_until <= time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        """当前状态快照"""
+        with self._lock:
+            return {
+                "rate_per_second": round(self.rate, 3),
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "throttle_count": self.throttle_count,
+                "backoff_remaining": round(max(0.0, self._backoff_until - time.monotonic()), 1)
+            }
+
+
+class LimiterPool:
+    """
+    按key共享的限流器集合
+
+    设置max_size时按LRU淘汰：超出数量后丢弃最久未使用的空闲限流器，
+    仍有调用在进行、等待或处于退避期的限流器保留，全部繁忙时允许暂时超出
+    """
+
+    def __init__(self, factory: Callable[[], AdmissionLimiter], max_size: Optional[int] = None):
+        self._factory = factory
+        self.max_size = max_size
+        self._limiters: "OrderedDict[str, AdmissionLimiter]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> AdmissionLimiter:
+        """获取key对应的限流器，不存在时创建"""
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is not None:
+                self._limiters.move_to_end(key)
+                return limiter
+            limiter = self._limiters[key] = self._factory()
+            if self.max_size is not None and len(self._limiters) > self.max_size:
+                self._evict(len(self._limiters) - self.max_size)
+            return limiter
+
+    def _evict(self, count: int):
+        """按最久未使用的顺序丢弃最多count个空闲限流器（调用方需持有锁）"""
+        # 最新加入的限流器（刚交给调用方）不参与淘汰
+        candidates = list(self._limiters.items())[:-1]
+        idle = [key for key, limiter in candidates if limiter.is_idle()]
+        for key in idle[:count]:
+            del self._limiters[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._limiters)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._limiters
@@ -0,0 +1,86 @@
+"""
+会话文件索引
+一个会话可以上传多个文件，每个文件按上传顺序分配文件ID（f1、f2、...），工具通过file_id（或文件名）指定目标文件。
+索引由invocation_state中的uploaded_files / source_files推导（均为普通字典，可随任务发送给队列Worker），
+上传顺序不变时文件ID保持稳定
+"""
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+class SessionFile(NamedTuple):
+    """会话中的一个上传文件"""
+    file_id: str
+    name: str
+    path: str      # Agent使用的xlsx路径（.xls / .csv 为转换后的文件）
+    source: str    # 上传的原始文件路径（CSV走流式写入路径时使用）
+
+
+class FileSelectionError(ValueError):
+    """无法确定要处理的文件（没有上传文件、ID不存在或有多个文件但未指定）"""
+
+
+def session_file_index(invocation_state: Optional[Dict[str, Any]]) -> Dict[str, SessionFile]:
+    """
+    当前会话的文件索引
+
+    Returns:
+        {文件ID: SessionFile}，按上传顺序
+    """
+    state = invocation_state or {}
+    uploaded_files = state.get("uploaded_files") or {}
+    source_files = state.get("source_files") or {}
+    return {
+        f"f{position}": SessionFile(f"f{position}", name, path, source_files.get(name, path))
+        for position, (name, path) in enumerate(uploaded_files.items(), start=1)
+    }
+
+
+def describe_files(index: Dict[str, SessionFile]) -> str:
+    """'f1=a.xlsx, f2=b.csv' 形式的文件列表（用于错误信息）"""
+    return ", ".join(f"{file_id}={session_file.name}" for file_id, session_file in index.items())
+
+
+def resolve_session_file(invocation_state: Optional[Dict[str, Any]], file_id: str = "") -> SessionFile:
+    """
+    确定工具要处理的上传文件
+
+    file_id可以是文件ID（如 "f2"）或文件名（不区分大小写，可省略扩展名）；
+    省略扩展名后匹配到多个文件（如 a.xlsx 和 a.csv）时要求改用文件ID。
+    未指定时只有一个上传文件则使用它，有多个文件时要求指定
+
+    Raises:
+        FileSelectionError: 无法确定文件
+    """
+    index = session_file_index(invocation_state)
+    if not index:
+        raise FileSelectionError("没有找到已上传的文件，请先上传Excel文件")
+
+    if file_id:
+        key = file_id.strip()
+        if key in index:
+            return index[key]
+        lowered = key.lower()
+        for session_file in index.values():
+            if session_file.name.lower() == lowered:
+                return session_file
+        matches = [session_file for session_file in index.values() if Path(session_file.name).stem.lower() == lowered]
+        if len(matches) > 1:
+            raise FileSelectionError(
+                f"有多个文件名为 {file_id}，请通过文件ID指定: {describe_files({m.file_id: m for m in matches})}"
+            )
+        if matches:
+            return matches[0]
+        raise FileSelectionError(f"文件 {file_id} 不存在，已上传的文件: {describe_files(index)}")
+
+    if len(index) > 1:
+        raise FileSelectionError(f"已上传{len(index)}个文件，请通过file_id指定要处理的文件: {describe_files(index)}")
+    return next(iter(index.values()))
+
+
+def list_session_files(invocation_state: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """文件列表（供工具结果和界面展示）"""
+    return [
+        {"file_id": session_file.file_id, "file_name": session_file.name}
+        for session_file in session_file_index(invocation_state).values()
+    ]
@@ -0,0 +1,743 @@
+"""
+sheet XML流式读取
+不经过openpyxl，一次增量解析同时取得单元格的缓存值（<v>）和公式（<f>）。
+openpyxl只能二选一：data_only=True丢失公式，data_only=False丢失缓存值，
+分析公式较多的透视表导出文件时需要两者兼得（判断哪些公式没有被Excel计算过）。
+共享字符串、日期样式等工作簿级的表按文件缓存（共享字符串建立偏移索引，大文件内存映射），
+sheet列表和维度也直接从XML读取，分析时不需要openpyxl加载工作簿。
+
+另提供按范围快速扫描数值的接口（正则提取<v>，不构建XML树，可按列或按行分组），供分布统计使用
+"""
+import html
+import mmap
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+from utils.xlsx_inspect import read_sheet_dimension, read_sheet_paths
+
+
+SHARED_STRINGS_PATH = "xl/sharedStrings.xml"
+STYLES_PATH = "xl/styles.xml"
+
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)")
+_SHEET_DATA_START = re.compile(rb"<([\w.-]+:)?sheetData[\s/>]")
+
+# 数值扫描每次解压的块大小
+_SCAN_CHUNK_SIZE = 4 * 1024 * 1024
+# 扫描维度时的块大小：正则匹配列表与块大小成正比，小块同样快而峰值内存小得多
+_DIMENSION_SCAN_CHUNK_SIZE = 256 * 1024
+# 范围不超过这么多列时，列字母直接写进正则，其他列的单元格在C层面跳过
+_MAX_ALTERNATION_COLUMNS = 64
+# 查找块内最后一个行标记时先只看末尾这么多字节
+_TAIL_WINDOW = 64 * 1024
+# 退回逐个解析时每次产出的数值个数
+_FALLBACK_BATCH_SIZE = 64 * 1024
+
+# 解压后超过该大小的sharedStrings.xml写入临时文件并内存映射，不常驻进程内存
+SHARED_STRINGS_MMAP_THRESHOLD = 16 * 1024 * 1024
+# 进程内缓存的工作簿表数量
+_TABLES_CACHE_SIZE = 8
+
+_SI_START = re.compile(rb"<(?:[\w.-]+:)?si[\s/>]")
+_SI_END = re.compile(rb"</(?:[\w.-]+:)?si\s*>|<(?:[\w.-]+:)?si\s*/>")
+# 只有一个<t>的普通字符串（绝大多数），不经过XML解析
+_PLAIN_SI = re.compile(
+    rb"<(?:[\w.-]+:)?si>\s*<(?:[\w.-]+:)?t(?:\s[^>]*)?>([^<]*)</(?:[\w.-]+:)?t>\s*</(?:[\w.-]+:)?si>"
+)
+_TAG_PREFIX = re.compile(rb"<(/?)[\w.-]+:")
+
+# 没有dimension记录时扫描sheet XML计算维度
+_ROW_TAG = re.compile(rb"<(?:[\w.-]+:)?row[\s>/]")
+_ROW_NUMBER = re.compile(rb"<(?:[\w.-]+:)?row\b[^>]*?\sr=\"(\d+)\"")
+_CELL_COLUMN = re.compile(rb"<(?:[\w.-]+:)?c\b[^>]*?\sr=\"([A-Z]{1,3})\d+\"")
+# dimension记录可能不准（部分流式导出工具只写 "A1"）：只有一个单元格，或sheet XML的大小
+# 超出记录的区域按每个单元格这么多字节能容纳的上限时，扫描sheet XML确认
+_MAX_BYTES_PER_CELL = 512
+_DIMENSION_SLACK_BYTES = 64 * 1024
+
+
+class SheetCell(NamedTuple):
+    """单元格的缓存值和公式（公式以"="开头，普通单元格为None）"""
+    value: Any
+    formula: Optional[str] = None
+
+    @property
+    def uncalculated(self) -> bool:
+        """公式没有缓存的计算结果（文件由程序生成、从未在Excel中打开保存过）"""
+        return self.formula is not None and self.value is None
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - 64
+    return index
+
+
+def _column_letters(index: int) -> str:
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _cast_number(text: str) -> Any:
+    # 与openpyxl一致：含小数点或指数时为float，否则为int
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+
+def _text_of(elem: ET.Element) -> str:
+    """<si> / <is> 的文本：直接的<t>或富文本<r><t>，跳过注音<rPh>"""
+    parts = []
+    for child in elem:
+        name = _local_name(child.tag)
+        if name == "t":
+            parts.append(child.text or "")
+        elif name == "r":
+            parts.extend(t.text or "" for t in child if _local_name(t.tag) == "t")
+    return "".join(parts)
+
+
+class SharedStringTable:
+    """
+    sharedStrings.xml的数组索引
+
+    一次扫描记录每个<si>的起始偏移，按索引取值时只解析对应的片段（解析结果缓存）；
+    解压后较大时数据写入临时文件并内存映射，常驻内存的只有偏移数组
+    """
+
+    def __init__(self, data: Union[bytes, mmap.mmap], offsets: array):
+        self._data = data
+        self._offsets = offsets
+        self._decoded: Dict[int, str] = {}
+
+    @classmethod
+    def from_archive(cls, archive: zipfile.ZipFile) -> "SharedStringTable":
+        try:
+            info = archive.getinfo(SHARED_STRINGS_PATH)
+        except KeyError:
+            return cls(b"", array("q"))
+
+        if info.file_size <= SHARED_STRINGS_MMAP_THRESHOLD:
+            data = archive.read(info)
+        else:
+            # 映射建立后临时文件即可关闭（已删除的文件在映射释放前仍然有效）
+            with tempfile.TemporaryFile() as spool:
+                with archive.open(info) as f:
+                    shutil.copyfileobj(f, spool, _SCAN_CHUNK_SIZE)
+                spool.flush()
+                data = mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data, array("q", (match.start() for match in _SI_START.finditer(data))))
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def get(self, index: int) -> Optional[str]:
+        """第index个共享字符串（索引越界时返回None）"""
+        if not 0 <= index < len(self._offsets):
+            return None
+        text = self._decoded.get(index)
+        if text is None:
+            text = self._decoded[index] = self._decode(index)
+        return text
+
+    def _decode(self, index: int) -> str:
+        start = self._offsets[index]
+        end = self._offsets[index + 1] if index + 1 < len(self._offsets) else len(self._data)
+        plain = _PLAIN_SI.match(self._data, start, end)
+        if plain is not None:
+            text = plain.group(1).decode("utf-8")
+            return html.unescape(text) if "&" in text else text
+
+        # 富文本、注音等：截取<si>片段，去掉命名空间前缀后按元素解析
+        close = _SI_END.search(self._data, start, end)
+        fragment = bytes(self._data[start:close.end() if close else end])
+        return _text_of(ET.fromstring(_TAG_PREFIX.sub(rb"<\1", fragment)))
+
+
+def _read_date_styles(archive: zipfile.ZipFile) -> Set[int]:
+    """日期/时间格式的样式索引（<c s="N">）"""
+    from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+
+    if STYLES_PATH not in archive.namelist():
+        return set()
+    root = ET.fromstring(archive.read(STYLES_PATH))
+    custom_formats = {}
+    date_styles = set()
+    for elem in root:
+        name = _local_name(elem.tag)
+        if name == "numFmts":
+            for fmt in elem:
+                custom_formats[int(fmt.get("numFmtId"))] = fmt.get("formatCode", "")
+        elif name == "cellXfs":
+            for index, xf in enumerate(elem):
+                fmt_id = int(xf.get("numFmtId", 0))
+                if is_date_format(custom_formats.get(fmt_id) or BUILTIN_FORMATS.get(fmt_id)):
+                    date_styles.add(index)
+    return date_styles
+
+
+def _uses_1904_epoch(archive: zipfile.ZipFile) -> bool:
+    root = ET.fromstring(archive.read("xl/workbook.xml"))
+    for elem in root:
+        if _local_name(elem.tag) == "workbookPr":
+            return elem.get("date1904", "false").lower() in ("1", "true")
+    return False
+
+
+class WorkbookTables:
+    """
+    工作簿级的查找表：共享字符串、日期样式、日期纪元
+
+    各表在第一次用到时构建，之后同一文件的所有sheet读取共用（见get_workbook_tables）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shared_strings: Optional[SharedStringTable] = None
+        self._date_styles: Optional[Set[int]] = None
+        self._epoch_1904: Optional[bool] = None
+
+    def shared_strings(self, archive: zipfile.ZipFile) -> SharedStringTable:
+        with self._lock:
+            if self._shared_strings is None:
+                self._shared_strings = SharedStringTable.from_archive(archive)
+            return self._shared_strings
+
+    def date_styles(self, archive: zipfile.ZipFile) -> Set[int]:
+        with self._lock:
+            if self._date_styles is None:
+                self._date_styles = _read_date_styles(archive)
+            return self._date_styles
+
+    def epoch_1904(self, archive: zipfile.ZipFile) -> bool:
+        with self._lock:
+            if self._epoch_1904 is None:
+                self._epoch_1904 = _uses_1904_epoch(archive)
+            return self._epoch_1904
+
+
+_tables_lock = threading.Lock()
+_tables_cache: "OrderedDict[str, Tuple[Tuple[int, int], WorkbookTables]]" = OrderedDict()
+
+
+def get_workbook_tables(file_path: str) -> WorkbookTables:
+    """
+    获取文件的工作簿表（按路径缓存，文件大小或修改时间变化后重建）
+
+    淘汰的表不显式关闭：仍在使用它的读取结束后随引用释放
+    """
+    stat = os.stat(file_path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    key = os.path.realpath(file_path)
+    with _tables_lock:
+        cached = _tables_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            _tables_cache.move_to_end(key)
+            return cached[1]
+        tables = WorkbookTables()
+        _tables_cache[key] = (signature, tables)
+        _tables_cache.move_to_end(key)
+        while len(_tables_cache) > _TABLES_CACHE_SIZE:
+            _tables_cache.popitem(last=False)
+        return tables
+
+
+def _parse_dimension(ref: str) -> Optional[Tuple[int, int]]:
+    """dimension记录（如 "A1:J150"）的最大行号和列号"""
+    match = _CELL_REF.fullmatch(ref.split(":")[-1].replace("$", ""))
+    if match is None:
+        return None
+    return int(match.group(2)), _column_index(match.group(1))
+
+
+def scan_sheet_extent(archive: zipfile.ZipFile, member: str) -> Tuple[int, int]:
+    """
+    扫描sheet XML得到最大行号和列号（空sheet为 (0, 0)）
+
+    按块解压后用正则提取行号和单元格列字母（块之间保留一小段重叠，只取最大值，重复计数不影响结果）；
+    单元格没有r属性时退回逐个解析
+    """
+    max_row = max_col = 0
+    has_rows = False
+    tail = b""
+    with archive.open(member) as f:
+        for chunk in iter(lambda: f.read(_DIMENSION_SCAN_CHUNK_SIZE), b""):
+            data = tail + chunk
+            has_rows = has_rows or _ROW_TAG.search(data) is not None
+            rows = _ROW_NUMBER.findall(data)
+            if rows:
+                max_row = max(max_row, max(int(row) for row in rows))
+            columns = _CELL_COLUMN.findall(data)
+            if columns:
+                max_col = max(max_col, _column_index(max(columns, key=lambda c: (len(c), c)).decode()))
+            tail = data[-256:]
+
+    if has_rows and (max_row == 0 or max_col == 0):
+        with archive.open(member) as f:
+            for row, col, *_ in _iter_raw_cells(f, sys.maxsize, None):
+                max_row, max_col = max(max_row, row), max(max_col, col)
+    return max_row, max_col
+
+
+def _dimension_is_suspicious(ref: str, bounds: Tuple[int, int], member_size: int) -> bool:
+    """dimension记录是否需要扫描确认：只有一个单元格，或XML大小超出该区域的合理上限"""
+    start, _, end = ref.replace("$", "").partition(":")
+    if not end or start == end:
+        return True
+    return member_size > bounds[0] * bounds[1] * _MAX_BYTES_PER_CELL + _DIMENSION_SLACK_BYTES
+
+
+def read_sheet_extent(archive: zipfile.ZipFile, member: str) -> Tuple[int, int, bool]:
+    """
+    sheet的最大行号和列号
+
+    dimension记录看起来可信时直接使用（只读取sheet开头），否则扫描sheet XML
+
+    Returns:
+        (最大行号, 最大列号, 是否经过扫描确认)，扫描得到的空sheet为 (0, 0, True)
+    """
+    dimension = read_sheet_dimension(archive, member)
+    bounds = _parse_dimension(dimension) if dimension else None
+    if bounds is not None and not _dimension_is_suspicious(dimension, bounds, archive.getinfo(member).file_size):
+        return bounds[0], bounds[1], False
+    max_row, max_col = scan_sheet_extent(archive, member)
+    return max_row, max_col, True
+
+
+def read_workbook_layout(file_path: str) -> Dict[str, Tuple[int, int]]:
+    """
+    不加载工作簿，读取sheet列表和各sheet的最大行号、列号
+
+    dimension记录可信时直接使用，缺失或可疑时扫描XML计算（见read_sheet_extent）；
+    空sheet与openpyxl一致记为 (1, 1)
+
+    Returns:
+        {sheet名称: (最大行号, 最大列号)}，按工作簿中的顺序
+    """
+    layout = {}
+    with zipfile.ZipFile(file_path) as archive:
+        members = set(archive.namelist())
+        for sheet_name, member in read_sheet_paths(archive).items():
+            if member not in members:
+                continue
+            max_row, max_col, _ = read_sheet_extent(archive, member)
+            layout[sheet_name] = (max(max_row, 1), max(max_col, 1))
+    return layout
+
+
+def _iter_raw_cells(stream, max_row: int, max_col: Optional[int]) -> Iterator[Tuple[int, int, str, Optional[str], Optional[str], Dict[str, str], Optional[str]]]:
+    """
+    逐个产出前max_row行的原始单元格：(行, 列, 类型, <v>文本, <f>文本, <f>属性, 样式索引)
+
+    读到max_row之后的第一行即停止，不解析sheet其余部分
+    """
+    row_idx = 0
+    col_idx = 0
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        name = _local_name(elem.tag)
+        if event == "start":
+            if name == "row":
+                row_idx = int(elem.get("r") or row_idx + 1)
+                col_idx = 0
+                if row_idx > max_row:
+                    return
+            continue
+
+        if name == "c":
+            ref = elem.get("r")
+            match = _CELL_REF.match(ref) if ref else None
+            col_idx = _column_index(match.group(1)) if match else col_idx + 1
+            if max_col is None or col_idx <= max_col:
+                value_text = formula_text = None
+                formula_attrs: Dict[str, str] = {}
+                for child in elem:
+                    child_name = _local_name(child.tag)
+                    if child_name == "v":
+                        value_text = child.text
+                    elif child_name == "f":
+                        formula_text = child.text or ""
+                        formula_attrs = dict(child.attrib)
+                    elif child_name == "is":
+                        value_text = _text_of(child)
+                yield row_idx, col_idx, elem.get("t", "n"), value_text, formula_text, formula_attrs, elem.get("s")
+            elem.clear()
+        elif name == "row":
+            elem.clear()
+        elif name == "sheetData":
+            return
+
+
+def read_sheet_cells(
+    file_path: str,
+    sheet_name: str,
+    max_row: int,
+    max_col: Optional[int] = None
+) -> Dict[Tuple[int, int], SheetCell]:
+    """
+    流式读取sheet前max_row行的单元格缓存值和公式
+
+    值的类型与openpyxl一致（int / float / str / bool / datetime），错误值为 "#DIV/0!" 等字符串；
+    共享公式按主单元格的公式平移还原
+
+    Args:
+        file_path: xlsx文件路径
+        sheet_name: sheet名称
+        max_row: 读取的行数上限
+        max_col: 读取的列数上限（None为全部列）
+
+    Returns:
+        {(行, 列): SheetCell}，只包含有值或有公式的单元格
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        sheet_paths = read_sheet_paths(archive)
+        if sheet_name not in sheet_paths:
+            raise KeyError(f"Sheet '{sheet_name}' 不存在")
+
+        with archive.open(sheet_paths[sheet_name]) as f:
+            raw_cells = list(_iter_raw_cells(f, max_row, max_col))
+
+        # 工作簿级的表按文件缓存，同一文件的其他sheet和后续调用直接复用
+        tables = get_workbook_tables(file_path)
+        has_shared = any(raw[2] == "s" and raw[3] is not None for raw in raw_cells)
+        shared_strings = tables.shared_strings(archive) if has_shared else SharedStringTable(b"", array("q"))
+        has_styled_numbers = any(raw[2] == "n" and raw[3] and raw[6] for raw in raw_cells)
+        date_styles = tables.date_styles(archive) if has_styled_numbers else set()
+        epoch_1904 = tables.epoch_1904(archive) if date_styles else False
+
+    cells = {}
+    shared_formulas: Dict[str, Tuple[str, str]] = {}
+    for row, col, cell_type, value_text, formula_text, formula_attrs, style in raw_cells:
+        value = _convert_value(cell_type, value_text, style, shared_strings, date_styles, epoch_1904)
+
+        formula = None
+        if formula_text is not None:
+            formula = _resolve_formula(formula_text, formula_attrs, f"{_column_letters(col)}{row}", shared_formulas)
+
+        if value is not None or formula is not None:
+            cells[(row, col)] = SheetCell(value, formula)
+    return cells
+
+
+def _convert_value(
+    cell_type: str,
+    text: Optional[str],
+    style: Optional[str],
+    shared_strings: SharedStringTable,
+    date_styles: Set[int],
+    epoch_1904: bool
+) -> Any:
+    if text is None or (text == "" and cell_type not in ("str", "inlineStr")):
+        return None
+    if cell_type == "s":
+        return shared_strings.get(int(text))
+    if cell_type in ("str", "inlineStr", "e"):
+        return text
+    if cell_type == "b":
+        return text.strip() in ("1", "true")
+    if cell_type == "d":
+        from openpyxl.utils.datetime import from_ISO8601
+        return from_ISO8601(text)
+
+    value = _cast_number(text)
+    if style is not None and int(style) in date_styles:
+        from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel
+        value = from_excel(value, CALENDAR_MAC_1904 if epoch_1904 else CALENDAR_WINDOWS_1900)
+    return value
+
+
+def _resolve_formula(text: str, attrs: Dict[str, str], coordinate: str, shared_formulas: Dict[str, Tuple[str, str]]) -> str:
+    """还原单元格的公式文本；共享公式的从属单元格只有si，需要从主单元格平移"""
+    if attrs.get("t") != "shared":
+        return f"={text}"
+
+    shared_id = attrs.get("si", "")
+    if text:
+        shared_formulas[shared_id] = (f"={text}", coordinate)
+        return f"={text}"
+    if shared_id not in shared_formulas:
+        return "="
+
+    from openpyxl.formula.translate import Translator
+
+    master_formula, master_coordinate = shared_formulas[shared_id]
+    return Translator(master_formula, origin=master_coordinate).translate_formula(coordinate)
+
+
+class _IrregularSheetXml(Exception):
+    """sheet XML不符合快速扫描的前提（<row> / <c>缺少r属性或r不是第一个属性）"""
+
+    def __init__(self, resume_row: int):
+        super().__init__(resume_row)
+        # 快速扫描尚未产出的第一行，逐个解析从这一行继续
+        self.resume_row = resume_row
+
+
+def _irregular_tag_pattern(prefix: bytes) -> "re.Pattern[bytes]":
+    """
+    匹配不满足快速扫描前提的<row> / <c>标签：没有属性、r不是第一个属性、标签名后不是单个空格
+
+    正常文件中没有任何匹配，每块只需一次search
+    """
+    return re.compile(rb"<" + re.escape(prefix) + rb"(?:row|c)(?:[\t\r\n>/]| (?!r=\"))")
+
+
+def _numeric_value_pattern(prefix: bytes, columns: Optional[List[str]]) -> "re.Pattern[bytes]":
+    """
+    匹配带缓存值的数值单元格，捕获<v>文本；columns为None时同时捕获列字母
+
+    要求r为第一个属性（Excel、openpyxl、xlsxwriter、LibreOffice写出的文件均如此，
+    不满足时_iter_range_blocks检查出来并退回逐个解析）；
+    t属性不是"n"的单元格（文本、布尔、错误值等）不匹配；公式单元格跳过<f>取其后的<v>
+    """
+    if columns and all(len(column) == 1 for column in columns):
+        # 单字母列用字符类，比多选分支快
+        column_group = rb"[" + "".join(columns).encode() + rb"]"
+    elif columns:
+        column_group = rb"(?:" + b"|".join(c.encode() for c in columns) + rb")"
+    else:
+        column_group = rb"([A-Z]{1,3})"
+    tag = re.escape(prefix)
+    return re.compile(
+        rb"<" + tag + rb'c r="' + column_group + rb'\d+"(?:\s+(?:t="n"|(?!t=)[\w:]+="[^"]*"))*>'
+        rb"(?:<" + tag + rb"f\b[^>]*?(?:/>|>[^<]*</" + tag + rb"f>))?"
+        rb"<" + tag + rb"v>([^<]*)</"
+    )
+
+
+def _last_match(pattern: "re.Pattern[bytes]", data: bytes) -> Optional["re.Match[bytes]"]:
+    """data中最后一个匹配（先只查末尾一段，找不到再查全部）"""
+    last = None
+    for last in pattern.finditer(data, max(0, len(data) - _TAIL_WINDOW)):
+        pass
+    if last is None and len(data) > _TAIL_WINDOW:
+        for last in pattern.finditer(data):
+            pass
+    return last
+
+
+def _row_slice(block: bytes, row_pattern: "re.Pattern[bytes]", min_row: int, max_row: int) -> bytes:
+    """截取块中行号位于[min_row, max_row]内的部分（只对跨越范围边界的块调用）"""
+    row_starts = [(int(m.group(1)), m.start()) for m in row_pattern.finditer(block)]
+    start = next((pos for row, pos in row_starts if row >= min_row), len(block))
+    end = next((pos for row, pos in row_starts if row > max_row), len(block))
+    return block[start:end]
+
+
+def _iter_range_blocks(
+    file_path: str,
+    sheet_name: str,
+    bounds: Tuple[int, int, int, int],
+    chunk_size: int
+) -> Iterator[Tuple[bytes, bytes, "re.Pattern[bytes]"]]:
+    """
+    按块产出sheet XML中位于范围行内的部分：(块, 命名空间前缀, 行标记正则)
+
+    按块解压（后台线程预读下一块，zlib解压时释放GIL），在最后一个行起始标记处切开，
+    单元格不会被块边界截断；读过范围的最后一行即停止
+
+    Raises:
+        _IrregularSheetXml: 块不满足快速扫描的前提（之前的块已正常产出）
+    """
+    min_col, min_row, max_col, max_row = bounds
+    resume_row = min_row
+    checked_block = False
+
+    with zipfile.ZipFile(file_path) as archive, ThreadPoolExecutor(max_workers=1) as prefetch:
+        sheet_paths = read_sheet_paths(archive)
+        if sheet_name not in sheet_paths:
+            raise KeyError(f"Sheet '{sheet_name}' 不存在")
+
+        with archive.open(sheet_paths[sheet_name]) as f:
+            prefix = row_pattern = None
+            buffer = b""
+            pending = prefetch.submit(f.read, chunk_size)
+            while True:
+                chunk = pending.result()
+                if chunk:
+                    pending = prefetch.submit(f.read, chunk_size)
+                buffer += chunk
+
+                if row_pattern is None:
+                    match = _SHEET_DATA_START.search(buffer)
+                    if match is None:
+                        if not chunk:
+                            return
+                        continue
+                    prefix = match.group(1) or b""
+                    row_pattern = re.compile(rb"<" + re.escape(prefix) + rb'row r="(\d+)"')
+                    any_row_tag = re.compile(rb"<" + re.escape(prefix) + rb"row\b[^>]*>")
+                    irregular_tag = _irregular_tag_pattern(prefix)
+
+                cut = len(buffer)
+                if chunk:
+                    next_row = _last_match(row_pattern, buffer)
+                    if next_row is None:
+                        # 有完整的<row>标签却没有r在首位的行标记：无法按行切块
+                        if any_row_tag.search(buffer) is not None:
+                            raise _IrregularSheetXml(resume_row)
+                        continue
+                    cut = next_row.start()
+                block, buffer = buffer[:cut], buffer[cut:]
+                # 同一sheet由同一工具写出，标签格式一致：第一块完整检查，之后每块只检查开头一段
+                # （截止在下一个"<"处，窗口内的标签都是完整的）
+                window_end = block.find(b"<", _TAIL_WINDOW) if checked_block else -1
+                if irregular_tag.search(block, 0, window_end if window_end != -1 else len(block)) is not None:
+                    raise _IrregularSheetXml(resume_row)
+                checked_block = True
+
+                # 只看块内第一行和最后一行的行号，跨越范围边界时才逐行定位
+                first = row_pattern.search(block)
+                if first is not None:
+                    first_row = int(first.group(1))
+                    if first_row > max_row:
+                        return
+                    last_row = int(_last_match(row_pattern, block).group(1))
+                    if last_row >= min_row:
+                        if first_row < min_row or last_row > max_row:
+                            block = _row_slice(block, row_pattern, min_row, max_row)
+                        yield block, prefix, row_pattern
+                        resume_row = last_row + 1
+                    if last_row >= max_row:
+                        return
+                if not chunk:
+                    return
+
+
+def _iter_numeric_cells(file_path: str, sheet_name: str, bounds: Tuple[int, int, int, int]) -> Iterator[Tuple[int, int, bytes]]:
+    """逐个解析单元格的慢速路径（不依赖属性顺序）：产出范围内数值单元格的 (行, 列, <v>文本)"""
+    min_col, min_row, max_col, max_row = bounds
+    with zipfile.ZipFile(file_path) as archive:
+        sheet_paths = read_sheet_paths(archive)
+        if sheet_name not in sheet_paths:
+            raise KeyError(f"Sheet '{sheet_name}' 不存在")
+        with archive.open(sheet_paths[sheet_name]) as f:
+            for row, col, cell_type, value_text, *_ in _iter_raw_cells(f, max_row, max_col):
+                if row >= min_row and col >= min_col and cell_type == "n" and value_text:
+                    yield row, col, value_text.encode()
+
+
+def iter_numeric_chunks(
+    file_path: str,
+    sheet_name: str,
+    bounds: Tuple[int, int, int, int],
+    chunk_size: int = _SCAN_CHUNK_SIZE
+) -> Iterator[List[bytes]]:
+    """
+    快速扫描范围内数值单元格的缓存值
+
+    不构建XML树：按块解压并按行号截取范围内的行，再用正则一次提取<v>文本
+    （数字的字节串，由调用方批量转换）。内存占用与块大小相关而与范围大小无关
+
+    Args:
+        file_path: xlsx文件路径
+        sheet_name: sheet名称
+        bounds: (min_col, min_row, max_col, max_row)
+
+    Yields:
+        每块中位于范围内的数值单元格的<v>文本列表
+    """
+    min_col, _, max_col, _ = bounds
+    width = max_col - min_col + 1
+    columns = [_column_letters(col) for col in range(min_col, max_col + 1)] if width <= _MAX_ALTERNATION_COLUMNS else None
+
+    pattern = None
+    try:
+        for block, prefix, _ in _iter_range_blocks(file_path, sheet_name, bounds, chunk_size):
+            if pattern is None:
+                pattern = _numeric_value_pattern(prefix, columns)
+            values = pattern.findall(block)
+            if columns is None:
+                values = [value for column, value in values if min_col <= _column_index(column.decode()) <= max_col]
+            if values:
+                yield values
+    except _IrregularSheetXml as e:
+        values = []
+        for _, _, value in _iter_numeric_cells(file_path, sheet_name, (min_col, e.resume_row, max_col, bounds[3])):
+            values.append(value)
+            if len(values) >= _FALLBACK_BATCH_SIZE:
+                yield values
+                values = []
+        if values:
+            yield values
+
+
+def iter_numeric_groups(
+    file_path: str,
+    sheet_name: str,
+    bounds: Tuple[int, int, int, int],
+    by: str = "column",
+    chunk_size: int = _SCAN_CHUNK_SIZE
+) -> Iterator[Dict[int, List[bytes]]]:
+    """
+    与iter_numeric_chunks相同的扫描，数值按列号或行号分组（供逐列 / 逐行色阶的统计使用）
+
+    Args:
+        by: "column"按列号分组，"row"按行号分组
+
+    Yields:
+        每块的 {列号或行号: <v>文本列表}
+    """
+    min_col, _, max_col, _ = bounds
+    width = max_col - min_col + 1
+    # 按行分组时列字母可直接写进正则；按列分组需要捕获列字母
+    columns = [_column_letters(col) for col in range(min_col, max_col + 1)] \
+        if by == "row" and width <= _MAX_ALTERNATION_COLUMNS else None
+    column_indexes: Dict[bytes, int] = {}
+
+    def in_range(column: bytes) -> Optional[int]:
+        col = column_indexes.get(column)
+        if col is None:
+            col = column_indexes[column] = _column_index(column.decode())
+        return col if min_col <= col <= max_col else None
+
+    pattern = None
+    try:
+        for block, prefix, row_pattern in _iter_range_blocks(file_path, sheet_name, bounds, chunk_size):
+            if pattern is None:
+                pattern = _numeric_value_pattern(prefix, columns)
+
+            groups: Dict[int, List[bytes]] = {}
+            if by == "row":
+                starts = list(row_pattern.finditer(block))
+                for match, following in zip(starts, starts[1:] + [None]):
+                    values = pattern.findall(block, match.start(), following.start() if following else len(block))
+                    if columns is None:
+                        values = [value for column, value in values if in_range(column) is not None]
+                    if values:
+                        groups[int(match.group(1))] = values
+            else:
+                for column, value in pattern.findall(block):
+                    col = in_range(column)
+                    if col is not None:
+                        groups.setdefault(col, []).append(value)
+            if groups:
+                yield groups
+    except _IrregularSheetXml as e:
+        groups = {}
+        count = 0
+        for row, col, value in _iter_numeric_cells(file_path, sheet_name, (min_col, e.resume_row, max_col, bounds[3])):
+            groups.setdefault(row if by == "row" else col, []).append(value)
+            count += 1
+            if count >= _FALLBACK_BATCH_SIZE:
+                yield groups
+                groups, count = {}, 0
+        if groups:
+            yield groups
@@ -0,0 +1,226 @@
+"""
+工具结果精简格式
+工具结果会作为toolResult留在对话历史中，每轮都随请求重新发送给模型。
+这里把工具内部的完整结果转换为带版本号的精简JSON（数字状态码、短键名、说明文字可选），
+并记录每个结果的字节数和估算token数
+
+精简格式（v1）：
+  {"v": 1, "c": 状态码, "e": 错误信息, "m": 说明文字（仅verbose）, ...短键名字段}
+"""
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+SCHEMA_VERSION = 1
+
+# 状态码
+CODE_OK = 0
+CODE_INVALID_INPUT = 1
+CODE_NOT_FOUND = 2
+CODE_TOO_LARGE = 3
+CODE_INTERNAL = 9
+
+# 开启后结果中保留说明文字（"m"字段），便于调试
+VERBOSE_ENV_VAR = "TOOL_RESULT_VERBOSE"
+
+# 完整键名 -> 短键名（一一对应，解码时反向还原）
+KEY_MAP = {
+    "output_file": "f",
+    "sheet_name": "s",
+    "applied_range": "r",
+    "cell_range": "cr",
+    "affected_cells": "n",
+    "scale_type": "st",
+    "color_scheme": "cs",
+    "color_schemes": "css",
+    "column_schemes": "cc",
+    "mode": "md",
+    "rule_count": "k",
+    "rule_id": "id",
+    "rules": "rl",
+    "outputs": "o",
+    "strategy": "lg",
+    "load_strategy": "ls",
+    "corrections": "fix",
+    "sheets": "ss",
+    "sheet_data": "sd",
+    "total_rows": "nr",
+    "total_columns": "nc",
+    "dimensions": "dim",
+    "preview_rows": "p",
+    "total_cells": "tc",
+    "header_rows": "hr",
+    "formula_cells": "fc",
+    "evaluated_cells": "ev",
+    "uncalculated_cells": "uc",
+    "numeric_cells": "nn",
+    "quantiles": "q",
+    "outlier_fraction": "of",
+    "negative_fraction": "neg",
+    "suggestion": "sg",
+    "stops": "sp",
+    "robust": "rb",
+    "anchors": "an",
+    "robust_fallback": "rbf",
+    "file_id": "fid",
+    "file_name": "fn",
+    "files": "fs",
+    "file_error": "fe",
+}
+_REVERSE_KEY_MAP = {short: full for full, short in KEY_MAP.items()}
+
+# 不进入精简结果的字段
+_DROPPED_KEYS = {"success", "message", "error", "code", "created_at"}
+
+# 以用户数据（sheet名、列字母、行号、方案名）为键的字段：下一层的键原样保留，只精简其值
+# （否则名为 "f"、"message" 的sheet会被当成短键名还原或丢弃）
+_DATA_KEYED = {"sheet_data", "anchors", "column_schemes"}
+
+_CJK = re.compile(r"[\u3000-\u9fff\uff00-\uffef]")
+
+
+def is_verbose() -> bool:
+    return os.environ.get(VERBOSE_ENV_VAR, "").lower() in ("1", "true", "yes")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符约1个token，其余约4个字符1个token"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def measure(text: str) -> Dict[str, int]:
+    """文本的UTF-8字节数和估算token数"""
+    return {"bytes": len(text.encode("utf-8")), "tokens": estimate_tokens(text)}
+
+
+def _compact_preview(rows: List[List[Dict[str, Any]]]) -> List[List[Any]]:
+    """预览行：单元格字典只保留值，空单元格为null，去掉行尾空单元格"""
+    compact_rows = []
+    for row in rows:
+        values = [None if cell.get("value") == "" else cell.get("value") for cell in row]
+        while values and values[-1] is None:
+            values.pop()
+        compact_rows.append(values)
+    return compact_rows
+
+
+def _expand_preview(rows: List[List[Any]], width: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    from openpyxl.utils import get_column_letter
+
+    expanded = []
+    for values in rows:
+        values = list(values) + [None] * max(0, (width or 0) - len(values))
+        expanded.append([
+            {
+                "column": get_column_letter(index),
+                "value": "" if value is None else value,
+                "data_type": type(value).__name__
+            }
+            for index, value in enumerate(values, start=1)
+        ])
+    return expanded
+
+
+def _compact(value: Any) -> Any:
+    if isinstance(value, dict):
+        compact = {}
+        for key, item in value.items():
+            if key in _DROPPED_KEYS or item is None:
+                continue
+            if key == "preview_rows":
+                item = _compact_preview(item)
+            if key in _DATA_KEYED and isinstance(item, dict):
+                item = {data_key: _compact(data_item) for data_key, data_item in item.items()}
+            else:
+                item = _compact(item)
+            compact[KEY_MAP.get(key, key)] = item
+        return compact
+    if isinstance(value, list):
+        return [_compact(item) for item in value]
+    return value
+
+
+def _expand(value: Any) -> Any:
+    if isinstance(value, dict):
+        expanded = {}
+        for key, item in value.items():
+            full_key = _REVERSE_KEY_MAP.get(key, key)
+            if full_key in _DATA_KEYED and isinstance(item, dict):
+                item = {data_key: _expand(data_item) for data_key, data_item in item.items()}
+            else:
+                item = _expand(item)
+            if full_key == "preview_rows":
+                item = _expand_preview(item, value.get(KEY_MAP["total_columns"]))
+            expanded[full_key] = item
+        return expanded
+    if isinstance(value, list):
+        return [_expand(item) for item in value]
+    return value
+
+
+def to_compact(result: Dict[str, Any], verbose: bool = False) -> Dict[str, Any]:
+    """
+    工具内部结果 -> 精简结果
+
+    Args:
+        result: 工具内部结果（{"success": ..., "error"/"message": ..., 其他字段}）
+        verbose: 是否保留说明文字
+    """
+    if result.get("success"):
+        code = CODE_OK
+    else:
+        code = result.get("code", CODE_INVALID_INPUT)
+
+    compact: Dict[str, Any] = {"v": SCHEMA_VERSION, "c": code}
+    if code != CODE_OK:
+        compact["e"] = result.get("error", "")
+    if verbose and result.get("message"):
+        compact["m"] = result["message"]
+
+    # 分析结果的数据放在data下，精简格式中直接展开
+    payload = {**result.get("data", {}), **{k: v for k, v in result.items() if k != "data"}}
+    compact.update(_compact(payload))
+    return compact
+
+
+def from_compact(compact: Dict[str, Any]) -> Dict[str, Any]:
+    """精简结果 -> 完整键名的结果（供界面展示和Worker返回使用）"""
+    if "content" in compact and "status" in compact:
+        compact = json.loads(compact["content"][0]["text"])
+    result = _expand({k: v for k, v in compact.items() if k not in ("v", "c", "e", "m")})
+    result["success"] = compact.get("c") == CODE_OK
+    result["code"] = compact.get("c")
+    if "e" in compact:
+        result["error"] = compact["e"]
+    if "m" in compact:
+        result["message"] = compact["m"]
+    return result
+
+
+def is_compact(output: Any) -> bool:
+    return isinstance(output, dict) and output.get("v") == SCHEMA_VERSION and "c" in output
+
+
+def encode_tool_result(tool_name: str, result: Dict[str, Any], invocation_state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    把工具内部结果序列化为Strands的ToolResult（精简JSON文本），并记录大小
+
+    大小统计追加到 invocation_state["tool_result_stats"]：{"tool", "bytes", "tokens"}；
+    verbose时另含 "legacy_bytes", "legacy_tokens"（原完整格式的大小，需要再序列化一次完整结果，仅调试时计算）
+    """
+    verbose = is_verbose()
+    text = json.dumps(to_compact(result, verbose), ensure_ascii=False, separators=(",", ":"), default=str)
+    stats = {"tool": tool_name, **measure(text)}
+    if verbose:
+        legacy = measure(json.dumps(result, ensure_ascii=False, default=str))
+        stats["legacy_bytes"] = legacy["bytes"]
+        stats["legacy_tokens"] = legacy["tokens"]
+    if invocation_state is not None:
+        invocation_state.setdefault("tool_result_stats", []).append(stats)
+
+    return {
+        "status": "success" if result.get("success") else "error",
+        "content": [{"text": text}]
+    }
@@ -0,0 +1,118 @@
+"""
+上传文件的流式写入与校验
+上传文件按固定大小的块写入磁盘（复用同一块缓冲区），写入时增量计算SHA-256并检查文件头，
+写完后只读取zip目录和几个很小的包结构部分校验xlsx完整性。每个上传额外占用的内存为一个块，
+与文件大小无关；损坏或类型不符的文件在进入会话（以及任何Agent调用）之前被拒绝
+"""
+import hashlib
+import os
+import uuid
+import zipfile
+import zlib
+from pathlib import Path
+from typing import BinaryIO
+
+from utils.output_registry import remember_file_hash
+
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+ZIP_SIGNATURE = b"PK\x03\x04"
+# .xls以及加密的.xlsx都是OLE复合文档
+OLE_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+# xlsx包中必需的部分（都很小，读取时校验CRC）
+XLSX_REQUIRED_PARTS = ("[Content_Types].xml", "xl/workbook.xml", "xl/_rels/workbook.xml.rels")
+
+
+class InvalidUploadError(ValueError):
+    """上传文件损坏或与扩展名不符"""
+
+
+def _check_header(file_name: str, head: bytearray, length: int):
+    """按扩展名检查文件头（第一块写入之前，直接在缓冲区上检查，不复制）"""
+    suffix = Path(file_name).suffix.lower()
+    if suffix == ".xlsx":
+        if head.startswith(OLE_SIGNATURE):
+            raise InvalidUploadError(f"{file_name} 已加密或是旧版Excel文件，请取消密码保护或另存为.xlsx后重新上传")
+        if not head.startswith(ZIP_SIGNATURE):
+            raise InvalidUploadError(f"{file_name} 不是有效的xlsx文件")
+    elif suffix == ".xls":
+        if not head.startswith(OLE_SIGNATURE):
+            raise InvalidUploadError(f"{file_name} 不是有效的xls文件")
+    elif suffix == ".csv":
+        if head.find(b"\x00", 0, length) != -1:
+            raise InvalidUploadError(f"{file_name} 不是文本格式的CSV文件")
+
+
+def validate_xlsx_package(file_path: str, file_name: str):
+    """
+    校验xlsx的zip结构：目录可读、包含必需部分且这些部分的CRC正确
+
+    只读取zip目录（文件末尾）和几KB的包结构XML，不解压sheet数据
+
+    Raises:
+        InvalidUploadError: 文件被截断、目录损坏或缺少必需部分
+    """
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            names = set(archive.namelist())
+            missing = [part for part in XLSX_REQUIRED_PARTS if part not in names]
+            if missing:
+                raise InvalidUploadError(f"{file_name} 不是有效的xlsx文件（缺少 {', '.join(missing)}）")
+            for part in XLSX_REQUIRED_PARTS:
+                archive.read(part)
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, EOFError, zlib.error) as e:
+        # 压缩数据损坏时解压抛出zlib.error，CRC不符时抛出BadZipFile
+        raise InvalidUploadError(f"{file_name} 已损坏或不完整，请重新上传（{e}）")
+
+
+def write_upload(source: BinaryIO, file_name: str, target_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    """
+    把上传文件流式写入target_path
+
+    先写入同目录的临时文件，校验通过后原子替换；校验失败时不留下任何文件。
+    写入时计算的哈希登记到文件哈希缓存，后续格式转换、输出登记不再重新读取文件
+
+    Args:
+        source: 可读的文件对象（Streamlit的UploadedFile，支持readinto）
+        file_name: 上传的文件名（决定校验方式）
+        target_path: 保存路径
+        chunk_size: 块大小
+
+    Returns:
+        文件内容的SHA-256
+
+    Raises:
+        InvalidUploadError: 文件为空、损坏或与扩展名不符
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    digest = hashlib.sha256()
+    temp_path = f"{target_path}.{uuid.uuid4().hex}.tmp"
+
+    source.seek(0)
+    try:
+        with open(temp_path, "wb") as f:
+            size = 0
+            while True:
+                read = source.readinto(buffer)
+                if not read:
+                    break
+                if size == 0:
+                    _check_header(file_name, buffer, read)
+                digest.update(view[:read])
+                f.write(view[:read])
+                size += read
+        if size == 0:
+            raise InvalidUploadError(f"{file_name} 是空文件")
+        if Path(file_name).suffix.lower() == ".xlsx":
+            validate_xlsx_package(temp_path, file_name)
+        os.replace(temp_path, target_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    content_hash = digest.hexdigest()
+    remember_file_hash(target_path, content_hash)
+    return content_hash
@@ -0,0 +1,144 @@
+"""
+单轮对话内的工作簿缓存
+同一轮中 analyze_excel 和 apply_color_scale 通常操作同一个文件，缓存完整加载的工作簿，
+分析（取值视图）和写入（格式视图）共用一次解析；写入后缓存随之迁移到输出文件
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from openpyxl import Workbook, load_workbook
+
+from utils.workbook_strategy import STRATEGY_FULL, estimate_memory, get_memory_budget
+
+
+# invocation_state中存放缓存的键
+WORKBOOK_CACHE_KEY = "workbook_cache"
+
+
+def _file_signature(file_path: str) -> Tuple[int, int]:
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _CachedWorkbook:
+    def __init__(self, workbook: Workbook, signature: Tuple[int, int], reserved: int, values_source: str):
+        self.workbook = workbook
+        self.signature = signature
+        self.reserved = reserved
+        # 单元格缓存值的来源文件：openpyxl保存的文件不含公式缓存值，迁移后仍从原文件读取
+        self.values_source = values_source
+
+
+class WorkbookCache:
+    """
+    按文件路径缓存完整加载（data_only=False）的工作簿
+
+    - 格式视图：直接使用缓存的工作簿
+    - 取值视图：单元格缓存值和公式由utils.sheet_reader从values_source流式读取
+    - 文件在磁盘上被修改（mtime/大小变化）或显式invalidate后重新加载
+    - 缓存期间占用进程内存预算，close()时释放
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _CachedWorkbook] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return os.path.realpath(file_path)
+
+    def _get_entry(self, file_path: str) -> Optional[_CachedWorkbook]:
+        """返回有效的缓存项（调用方需持有锁）"""
+        key = self._key(file_path)
+        entry = self._entries.get(key)
+        if entry is not None and entry.signature != _file_signature(file_path):
+            self._drop(key)
+            entry = None
+        return entry
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.workbook.close()
+            get_memory_budget().release(entry.reserved)
+
+    def open(self, file_path: str) -> Optional[Workbook]:
+        """
+        获取文件的格式视图工作簿（已缓存则直接返回）
+
+        Returns:
+            openpyxl工作簿；内存预算不足以完整加载时返回None，调用方应改用流式策略
+        """
+        with self._lock:
+            entry = self._get_entry(file_path)
+            if entry is not None:
+                return entry.workbook
+
+            reserved = estimate_memory(file_path, STRATEGY_FULL)
+            if not get_memory_budget().try_reserve(reserved):
+                return None
+            try:
+                signature = _file_signature(file_path)
+                workbook = load_workbook(file_path)
+            except Exception:
+                get_memory_budget().release(reserved)
+                raise
+            self._entries[self._key(file_path)] = _CachedWorkbook(workbook, signature, reserved, file_path)
+            return workbook
+
+    def values_source(self, file_path: str) -> str:
+        """
+        读取单元格缓存值应使用的文件
+
+        缓存迁移到openpyxl保存的输出文件后，输出文件中的公式没有缓存值，仍从原文件读取
+        """
+        with self._lock:
+            entry = self._get_entry(file_path)
+            return entry.values_source if entry else file_path
+
+    def move(self, source_path: str, output_path: str):
+        """
+        写入后调用：缓存的工作簿已包含新写入的内容，改挂到输出文件下，
+        源文件的缓存随之失效（下次访问源文件会重新加载）
+        """
+        with self._lock:
+            entry = self._entries.pop(self._key(source_path), None)
+            if entry is None:
+                return
+            output_key = self._key(output_path)
+            if output_key in self._entries:
+                self._drop(output_key)
+            entry.signature = _file_signature(output_path)
+            self._entries[output_key] = entry
+
+    def invalidate(self, file_path: str):
+        """丢弃指定文件的缓存"""
+        with self._lock:
+            self._drop(self._key(file_path))
+
+    def close(self):
+        """丢弃所有缓存并释放内存预算（一轮对话结束时调用）"""
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+
+def get_workbook_cache(invocation_state: Optional[Dict[str, Any]]) -> Optional[WorkbookCache]:
+    """取出本轮的工作簿缓存；调用方未创建时返回None，工具按无缓存处理"""
+    if not invocation_state:
+        return None
+    return invocation_state.get(WORKBOOK_CACHE_KEY)
+
+
+@contextmanager
+def workbook_cache_scope(invocation_state: Dict[str, Any]) -> Iterator[WorkbookCache]:
+    """在一轮对话期间为invocation_state挂载工作簿缓存，结束时释放"""
+    cache = WorkbookCache()
+    invocation_state[WORKBOOK_CACHE_KEY] = cache
+    try:
+        yield cache
+    finally:
+        invocation_state.pop(WORKBOOK_CACHE_KEY, None)
+        cache.close()
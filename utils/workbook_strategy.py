@@ -0,0 +1,125 @@
+"""
+工作簿加载策略
+根据xlsx解压后的XML大小估算openpyxl内存占用，在进程级内存上限内选择处理方式：
+  - full:      openpyxl完整加载（小文件，功能最全）
+  - read_only: openpyxl只读流式读取（大文件分析）
+  - xml_patch: 不加载工作簿，直接在sheet XML中插入条件格式（大文件写入）
+分析不经过这里：没有可复用的工作簿时直接从XML流式读取（native，见utils/sheet_reader.py），不占用预算
+"""
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from utils.xlsx_inspect import read_uncompressed_sizes
+
+
+STRATEGY_FULL = "full"
+STRATEGY_READ_ONLY = "read_only"
+STRATEGY_XML_PATCH = "xml_patch"
+STRATEGY_NATIVE = "native"
+
+# 进程内openpyxl可使用的内存上限（MB）
+MEMORY_CEILING_ENV_VAR = "EXCEL_MEMORY_CEILING_MB"
+DEFAULT_MEMORY_CEILING_MB = 1024
+
+# openpyxl完整加载时，内存占用约为XML解压大小的倍数（bench_memory.py实测约13倍）
+FULL_MODE_MEMORY_FACTOR = 14
+# 只读模式会把sharedStrings整体读入内存
+READ_ONLY_MEMORY_FACTOR = 4
+
+
+class WorkbookTooLargeError(MemoryError):
+    """任何策略都无法在内存上限内处理该文件"""
+
+
+class MemoryBudget:
+    """
+    进程级内存预算
+
+    并发的工具调用各自预留预估内存，总和不超过上限；预留失败时由调用方降级到更省内存的策略
+    """
+
+    def __init__(self, ceiling_bytes: int):
+        self.ceiling_bytes = ceiling_bytes
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+    def try_reserve(self, nbytes: int) -> bool:
+        with self._lock:
+            if self._reserved + nbytes > self.ceiling_bytes:
+                return False
+            self._reserved += nbytes
+            return True
+
+    def release(self, nbytes: int):
+        with self._lock:
+            self._reserved = max(0, self._reserved - nbytes)
+
+    @property
+    def available(self) -> int:
+        with self._lock:
+            return self.ceiling_bytes - self._reserved
+
+
+_memory_budget: Optional[MemoryBudget] = None
+_memory_budget_lock = threading.Lock()
+
+
+def get_memory_budget() -> MemoryBudget:
+    """获取进程内共享的内存预算（上限由EXCEL_MEMORY_CEILING_MB配置）"""
+    global _memory_budget
+    with _memory_budget_lock:
+        if _memory_budget is None:
+            ceiling_mb = float(os.environ.get(MEMORY_CEILING_ENV_VAR, DEFAULT_MEMORY_CEILING_MB))
+            _memory_budget = MemoryBudget(int(ceiling_mb * 1024 * 1024))
+        return _memory_budget
+
+
+def estimate_memory(file_path: str, strategy: str) -> int:
+    """估算指定策略处理该文件所需的内存（字节）"""
+    if Path(file_path).suffix.lower() not in (".xlsx", ".xlsm"):
+        # CSV等非OOXML文件走各自的流式路径，不在这里估算
+        return 0
+    sizes = read_uncompressed_sizes(file_path)
+    if strategy == STRATEGY_FULL:
+        return sizes["total"] * FULL_MODE_MEMORY_FACTOR
+    if strategy == STRATEGY_READ_ONLY:
+        return sizes["shared_strings"] * READ_ONLY_MEMORY_FACTOR
+    return 0
+
+
+@contextmanager
+def workbook_strategy(file_path: str, operation: str) -> Iterator[str]:
+    """
+    为一次读/写操作选择加载策略并在操作期间占用内存预算
+
+    Args:
+        file_path: xlsx文件路径
+        operation: "analyze"（只读）或 "apply"（写入条件格式）
+
+    Yields:
+        full / read_only / xml_patch
+
+    Raises:
+        WorkbookTooLargeError: 只读模式的内存需求也超过上限
+    """
+    budget = get_memory_budget()
+    fallback = STRATEGY_READ_ONLY if operation == "analyze" else STRATEGY_XML_PATCH
+
+    strategy = STRATEGY_FULL
+    reserved = estimate_memory(file_path, STRATEGY_FULL)
+    if not budget.try_reserve(reserved):
+        strategy = fallback
+        reserved = estimate_memory(file_path, fallback)
+        if not budget.try_reserve(reserved):
+            raise WorkbookTooLargeError(
+                f"文件过大：预计需要 {reserved / 1024 / 1024:.0f} MB 内存，"
+                f"当前可用 {budget.available / 1024 / 1024:.0f} MB"
+            )
+
+    try:
+        yield strategy
+    finally:
+        budget.release(reserved)
@@ -0,0 +1,161 @@
+"""
+格式转换工具
+将 .xls / .csv 上传文件流式转换为 .xlsx，供 openpyxl 系的工具读取
+"""
+import codecs
+import csv
+import math
+import re
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple
+
+
+# 需要转换为xlsx的文件后缀
+CONVERTIBLE_SUFFIXES = {".xls", ".csv"}
+
+# CSV转换后的sheet名称（与系统提示词中的示例保持一致）
+CSV_SHEET_NAME = "Sheet1"
+
+# CSV编码探测顺序，中文环境导出的CSV常见为GB18030/GBK
+CSV_ENCODINGS = ("utf-8-sig", "gb18030")
+
+_CHUNK_SIZE = 1024 * 1024
+
+# 按数值写入的CSV文本：十进制数字（可带符号、小数、指数）。有前导零的编号（"007"，"0"和"0.x"除外）、
+# Python字面量写法（"1_000"）、"nan"/"inf"等保留为文本，避免编号被改写或写出Excel无法表示的值
+_INT_TEXT = re.compile(r"[+-]?(?:0|[1-9][0-9]*)")
+_FLOAT_TEXT = re.compile(r"[+-]?(?:(?:0|[1-9][0-9]*)(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][+-]?[0-9]+)?")
+
+
+def detect_csv_encoding(file_path: str) -> str:
+    """
+    探测CSV文件编码
+
+    逐块增量解码，不会把整个文件读入内存
+
+    Args:
+        file_path: CSV文件路径
+
+    Returns:
+        可用的编码名称
+    """
+    for encoding in CSV_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(file_path, "rb") as f:
+                while True:
+                    chunk = f.read(_CHUNK_SIZE)
+                    if not chunk:
+                        decoder.decode(b"", final=True)
+                        break
+                    decoder.decode(chunk)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"无法识别CSV文件编码，请另存为UTF-8后重新上传: {Path(file_path).name}")
+
+
+def coerce_csv_value(raw: str) -> Any:
+    """将CSV文本转换为数值（若可能），以便色阶能识别数值单元格"""
+    if raw == "":
+        return None
+    text = raw.strip()
+    if _INT_TEXT.fullmatch(text):
+        return int(text)
+    if _FLOAT_TEXT.fullmatch(text):
+        value = float(text)
+        # 指数溢出（如"1e400"）得到inf，保留原文本
+        if math.isfinite(value):
+            return value
+    return raw
+
+
+def iter_csv_rows(file_path: str, encoding: Optional[str] = None) -> Iterator[List[Any]]:
+    """
+    逐行读取CSV并转换单元格类型
+
+    Args:
+        file_path: CSV文件路径
+        encoding: 文件编码，None则自动探测
+
+    Yields:
+        每一行的单元格值列表
+    """
+    encoding = encoding or detect_csv_encoding(file_path)
+    with open(file_path, "r", encoding=encoding, newline="") as f:
+        for row in csv.reader(f):
+            yield [coerce_csv_value(value) for value in row]
+
+
+def _iter_xls_sheets(file_path: str) -> Iterator[Tuple[str, Iterator[List[Any]]]]:
+    """逐个sheet、逐行读取.xls文件（按需加载sheet，读完即释放）"""
+    try:
+        import xlrd
+    except ImportError:
+        raise RuntimeError("读取 .xls 文件需要安装 xlrd：pip install xlrd")
+
+    book = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        for sheet_idx in range(book.nsheets):
+            sheet = book.sheet_by_index(sheet_idx)
+
+            def rows(sheet=sheet):
+                for row_idx in range(sheet.nrows):
+                    yield [_convert_xls_cell(cell, book.datemode) for cell in sheet.row(row_idx)]
+
+            yield sheet.name, rows()
+            book.unload_sheet(sheet_idx)
+    finally:
+        book.release_resources()
+
+
+def _convert_xls_cell(cell, datemode: int) -> Any:
+    """将xlrd单元格转换为openpyxl可写入的值"""
+    import xlrd
+
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return None
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        try:
+            return xlrd.xldate.xldate_as_datetime(cell.value, datemode)
+        except (xlrd.xldate.XLDateError, ValueError):
+            return cell.value
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    return cell.value
+
+
+def convert_to_xlsx(source_path: str, output_path: str) -> str:
+    """
+    将 .xls / .csv 文件流式转换为 .xlsx
+
+    使用openpyxl的write_only模式逐行写入，内存占用与行数无关
+
+    Args:
+        source_path: 源文件路径
+        output_path: 输出的xlsx文件路径
+
+    Returns:
+        输出文件路径
+    """
+    suffix = Path(source_path).suffix.lower()
+    if suffix not in CONVERTIBLE_SUFFIXES:
+        raise ValueError(f"不支持转换的文件格式: {suffix}")
+
+    # 只在真正转换时导入openpyxl，FileManager随页面加载时不必付出这部分开销
+    from openpyxl import Workbook
+    from utils.xlsx_writer import save_workbook
+
+    wb = Workbook(write_only=True)
+    if suffix == ".csv":
+        ws = wb.create_sheet(CSV_SHEET_NAME)
+        for row in iter_csv_rows(source_path):
+            ws.append(row)
+    else:
+        for sheet_name, rows in _iter_xls_sheets(source_path):
+            ws = wb.create_sheet(sheet_name)
+            for row in rows:
+                ws.append(row)
+
+    save_workbook(wb, output_path)
+    return output_path
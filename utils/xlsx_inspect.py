@@ -0,0 +1,204 @@
+"""
+xlsx轻量检查工具
+只读取zip包中的workbook.xml和sheet的dimension记录（必要时扫描sheet XML），不加载完整工作簿
+"""
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Optional, Tuple
+
+from openpyxl.utils.cell import range_boundaries
+
+from utils.cell_range import RangeValidationError, check_bounds_limits, format_bounds
+
+
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def read_sheet_paths(archive: zipfile.ZipFile) -> Dict[str, str]:
+    """
+    读取sheet名称到zip内XML路径的映射（保持工作簿中的顺序）
+
+    Args:
+        archive: 已打开的xlsx zip包
+    """
+    rels_root = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {}
+    for rel in rels_root.iter(f"{{{_PKG_REL_NS}}}Relationship"):
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            path = target.lstrip("/")
+        else:
+            path = posixpath.normpath(posixpath.join("xl", target))
+        targets[rel.get("Id")] = path
+
+    workbook_root = ET.fromstring(archive.read("xl/workbook.xml"))
+    sheet_paths = {}
+    for sheet in workbook_root.iter():
+        if _local_name(sheet.tag) == "sheet":
+            rel_id = sheet.get(f"{{{_REL_NS}}}id")
+            if rel_id in targets:
+                sheet_paths[sheet.get("name")] = targets[rel_id]
+    return sheet_paths
+
+
+def read_sheet_dimension(archive: zipfile.ZipFile, member: str) -> Optional[str]:
+    """
+    读取sheet的dimension记录（如 "A1:J150"）
+
+    dimension位于sheetData之前，增量解析读到即停止；没有该记录时返回None
+    """
+    with archive.open(member) as f:
+        for _, elem in ET.iterparse(f, events=("start",)):
+            name = _local_name(elem.tag)
+            if name == "dimension":
+                return elem.get("ref")
+            if name == "sheetData":
+                return None
+    return None
+
+
+def read_uncompressed_sizes(file_path: str) -> Dict[str, int]:
+    """
+    读取各部分XML的解压后大小（只读zip目录，不解压任何内容）
+
+    Returns:
+        {"sheets": {sheet名: 字节数}, "shared_strings": 字节数, "total": 所有成员总字节数}
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        sheet_paths = read_sheet_paths(archive)
+        infos = {info.filename: info for info in archive.infolist()}
+
+    sheets = {name: infos[path].file_size for name, path in sheet_paths.items() if path in infos}
+    shared_strings = infos["xl/sharedStrings.xml"].file_size if "xl/sharedStrings.xml" in infos else 0
+    return {
+        "sheets": sheets,
+        "shared_strings": shared_strings,
+        "total": sum(info.file_size for info in infos.values())
+    }
+
+
+def _resolve_sheet_name(sheet_name: str, sheet_names: List[str]) -> Optional[str]:
+    """精确匹配失败时，按忽略大小写和首尾空格唯一匹配"""
+    if sheet_name in sheet_names:
+        return sheet_name
+    normalized = sheet_name.strip().lower()
+    candidates = [name for name in sheet_names if name.strip().lower() == normalized]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def _parse_range_parts(cell_range: str) -> List[Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]]:
+    """
+    解析单元格范围，允许整列（B:E）和整行（2:10）引用，缺少的行号或列号为None
+
+    Raises:
+        RangeValidationError: 范围格式不正确
+    """
+    parts = cell_range.split()
+    if not parts:
+        raise RangeValidationError("单元格范围为空")
+    bounds = []
+    for part in parts:
+        ref = part.replace("$", "").upper()
+        if ":" not in ref:
+            ref = f"{ref}:{ref}"
+        try:
+            min_col, min_row, max_col, max_row = range_boundaries(ref)
+        except ValueError as e:
+            raise RangeValidationError(str(e))
+        check_bounds_limits(part, min_col, min_row, max_col, max_row)
+        if min_col is not None:
+            min_col, max_col = sorted((min_col, max_col))
+        if min_row is not None:
+            min_row, max_row = sorted((min_row, max_row))
+        if min_col is None and min_row is None:
+            raise RangeValidationError(f"单元格范围需包含行号或列号: {part}")
+        bounds.append((min_col, min_row, max_col, max_row))
+    return bounds
+
+
+def _format_extent(max_row: int, max_col: int) -> Optional[str]:
+    return format_bounds((1, 1, max_col, max_row)) if max_row and max_col else None
+
+
+def preflight_cell_range(file_path: str, sheet_name: str, cell_range: str) -> Dict[str, Any]:
+    """
+    在加载工作簿之前校验sheet名称和单元格范围
+
+    可自动修正的问题（大小写、$符号、起止颠倒、整列/整行引用、超出已用区域）会被修正并记录在corrections中。
+    dimension记录可能不准，范围超出记录的区域或需要展开整列/整行引用时，先扫描sheet XML确认实际区域，
+    只按确认后的区域裁剪或拒绝
+
+    Args:
+        file_path: xlsx文件路径
+        sheet_name: sheet名称
+        cell_range: 单元格范围
+
+    Returns:
+        {"sheet_name": 修正后的sheet名, "cell_range": 修正后的范围,
+         "dimension": sheet已用区域, "corrections": [修正说明]}
+
+    Raises:
+        RangeValidationError: 无法修正的问题（sheet不存在、范围语法错误、范围完全在数据区之外）
+    """
+    # sheet_reader依赖本模块，在函数内导入
+    from utils.sheet_reader import read_sheet_extent, scan_sheet_extent
+
+    corrections = []
+
+    try:
+        parts = _parse_range_parts(cell_range)
+    except ValueError as e:
+        raise RangeValidationError(f"单元格范围格式不正确: {cell_range}（应为 B2:E10 形式）。{e}")
+
+    with zipfile.ZipFile(file_path) as archive:
+        sheet_paths = read_sheet_paths(archive)
+        resolved_name = _resolve_sheet_name(sheet_name, list(sheet_paths))
+        if resolved_name is None:
+            raise RangeValidationError(
+                f"Sheet '{sheet_name}' 不存在。可用的sheet: {', '.join(sheet_paths)}"
+            )
+        if resolved_name != sheet_name:
+            corrections.append(f"sheet名称已修正为 '{resolved_name}'")
+        member = sheet_paths[resolved_name]
+        extent_row, extent_col, confirmed = read_sheet_extent(archive, member)
+        needs_confirm = any(
+            None in part or part[2] > extent_col or part[3] > extent_row
+            for part in parts
+        )
+        if needs_confirm and not confirmed:
+            extent_row, extent_col = scan_sheet_extent(archive, member)
+
+    dimension = _format_extent(extent_row, extent_col)
+    if dimension is None:
+        raise RangeValidationError(f"'{resolved_name}' 是空sheet，没有可应用色阶的数据")
+
+    corrected = []
+    for min_col, min_row, max_col, max_row in parts:
+        # 整列/整行引用按实际区域展开
+        if min_row is None:
+            min_row, max_row = 1, extent_row
+        if min_col is None:
+            min_col, max_col = 1, extent_col
+        # 范围超出记录的区域时上面已扫描确认，这里按实际区域裁剪或拒绝
+        if min_col > extent_col or min_row > extent_row:
+            raise RangeValidationError(
+                f"单元格范围 {cell_range} 超出了 '{resolved_name}' 的数据区域 {dimension}"
+            )
+        corrected.append(format_bounds((min_col, min_row, min(max_col, extent_col), min(max_row, extent_row))))
+
+    corrected_range = " ".join(corrected)
+    if corrected_range != cell_range:
+        corrections.append(f"单元格范围已修正为 {corrected_range}（原始: {cell_range}，数据区域: {dimension}）")
+
+    return {
+        "sheet_name": resolved_name,
+        "cell_range": corrected_range,
+        "dimension": dimension,
+        "corrections": corrections
+    }
@@ -0,0 +1,146 @@
+"""
+xlsx条件格式XML补丁
+不经过openpyxl，直接把<conditionalFormatting>插入目标sheet的XML，
+sheetData按块流式复制，内存占用与文件大小无关
+"""
+import os
+import re
+import uuid
+import zipfile
+from typing import BinaryIO, Dict, List, Tuple
+
+from openpyxl.formatting.formatting import ConditionalFormatting
+from openpyxl.formatting.rule import Rule
+from openpyxl.xml.functions import tostring
+
+from utils.xlsx_inspect import read_sheet_paths
+from utils.xlsx_writer import XlsxZipWriter
+
+
+_CHUNK_SIZE = 1024 * 1024
+
+# sheetData结束标记（可能带命名空间前缀，也可能是空的自闭合标签）
+_SHEET_DATA_END = re.compile(rb"</(?P<prefix>[\w.-]+:)?sheetData\s*>|<(?P<empty_prefix>[\w.-]+:)?sheetData\s*/>")
+
+# 按OOXML schema顺序，conditionalFormatting必须位于这些元素之前
+_ELEMENTS_AFTER_CF = (
+    "dataValidations", "hyperlinks", "printOptions", "pageMargins", "pageSetup", "headerFooter",
+    "rowBreaks", "colBreaks", "customProperties", "cellWatches", "ignoredErrors", "smartTags",
+    "drawing", "legacyDrawing", "legacyDrawingHF", "drawingHF", "picture", "oleObjects",
+    "controls", "webPublishItems", "tableParts", "extLst"
+)
+_INSERT_POINT = re.compile(
+    rb"<(?:[\w.-]+:)?(?:" + "|".join(_ELEMENTS_AFTER_CF).encode() + rb")[\s/>]|</(?:[\w.-]+:)?worksheet\s*>"
+)
+_PRIORITY = re.compile(rb"\spriority=\"(\d+)\"")
+
+
+def _copy_sheet_data(src: BinaryIO, dst: BinaryIO) -> Tuple[bytes, bytes]:
+    """
+    把sheetData及之前的部分原样复制到dst
+
+    Returns:
+        (命名空间前缀, sheetData之后的剩余XML)
+    """
+    buffer = b""
+    while True:
+        chunk = src.read(_CHUNK_SIZE)
+        buffer += chunk
+        match = _SHEET_DATA_END.search(buffer)
+        if match:
+            dst.write(buffer[:match.end()])
+            prefix = match.group("prefix") or match.group("empty_prefix") or b""
+            return prefix, buffer[match.end():] + src.read()
+        if not chunk:
+            raise ValueError("sheet XML中没有找到sheetData")
+        # 保留末尾一段，防止结束标记被块边界截断
+        dst.write(buffer[:-64])
+        buffer = buffer[-64:]
+
+
+def render_conditional_formatting(rule_targets: List[Tuple[str, Rule]], first_priority: int, prefix: bytes = b"") -> bytes:
+    """
+    把(范围, 规则)列表序列化为<conditionalFormatting>片段
+
+    Args:
+        rule_targets: (单元格范围, 规则) 列表
+        first_priority: 第一条规则的优先级，之后依次递增
+        prefix: sheet XML使用的命名空间前缀（如 b"x:"）
+    """
+    fragments = []
+    for offset, (target_range, rule) in enumerate(rule_targets):
+        rule.priority = first_priority + offset
+        cf = ConditionalFormatting(sqref=target_range)
+        cf.rules.append(rule)
+        fragments.append(tostring(cf.to_tree()))
+    xml = b"".join(fragments)
+    if prefix:
+        xml = re.sub(rb"<(/?)", rb"<\1" + prefix, xml)
+    return xml
+
+
+def _patch_sheet(src: BinaryIO, dst: BinaryIO, rule_targets: List[Tuple[str, Rule]]):
+    prefix, tail = _copy_sheet_data(src, dst)
+    first_priority = max((int(p) for p in _PRIORITY.findall(tail)), default=0) + 1
+    match = _INSERT_POINT.search(tail)
+    if match is None:
+        raise ValueError("sheet XML不完整：缺少</worksheet>")
+    dst.write(tail[:match.start()])
+    dst.write(render_conditional_formatting(rule_targets, first_priority, prefix))
+    dst.write(tail[match.start():])
+
+
+def add_conditional_formatting(
+    source_path: str,
+    output_path: str,
+    sheet_name: str,
+    rule_targets: List[Tuple[str, Rule]]
+):
+    """
+    在不加载工作簿的情况下为指定sheet追加条件格式
+
+    Args:
+        source_path: 源xlsx路径
+        output_path: 输出xlsx路径
+        sheet_name: 目标sheet名称
+        rule_targets: (单元格范围, 规则) 列表
+    """
+    patch_conditional_formatting(source_path, output_path, {sheet_name: rule_targets})
+
+
+def patch_conditional_formatting(
+    source_path: str,
+    output_path: str,
+    rules_by_sheet: Dict[str, List[Tuple[str, Rule]]]
+):
+    """
+    一次重写zip包，为多个sheet追加条件格式
+
+    其他zip成员原样复制压缩数据；先写临时文件再替换，source_path与output_path可以相同
+
+    Args:
+        source_path: 源xlsx路径
+        output_path: 输出xlsx路径
+        rules_by_sheet: {sheet名称: (单元格范围, 规则) 列表}，为空时输出与源文件内容相同
+    """
+    temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with zipfile.ZipFile(source_path) as zin:
+            sheet_paths = read_sheet_paths(zin)
+            missing = [name for name in rules_by_sheet if name not in sheet_paths]
+            if missing:
+                raise ValueError(f"Sheet '{missing[0]}' 不存在。可用的sheet: {', '.join(sheet_paths)}")
+            members = {sheet_paths[name]: rule_targets for name, rule_targets in rules_by_sheet.items() if rule_targets}
+
+            # 未修改的成员直接复制压缩数据，只有目标sheet解压、修补后重新压缩
+            with XlsxZipWriter(temp_path) as zout:
+                for info in zin.infolist():
+                    if info.filename in members:
+                        with zin.open(info) as src, zout.open(info) as dst:
+                            _patch_sheet(src, dst, members[info.filename])
+                    else:
+                        zout.copy_member(zin, info)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
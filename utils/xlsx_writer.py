@@ -0,0 +1,421 @@
+"""
+xlsx输出写入器
+openpyxl的wb.save对每个zip成员都按默认级别deflate、逐个顺序压缩，大sheet的保存时间有相当一部分花在这里。
+XlsxZipWriter实现openpyxl保存时用到的ZipFile接口（writestr / write / namelist / close），并且：
+- 压缩级别可配置（XLSX_COMPRESS_LEVEL，0为全部存储不压缩）
+- 已压缩的媒体（图片、嵌入的Office文件）直接存储，不再deflate
+- 较大的成员在线程池中压缩（zlib压缩时释放GIL）：openpyxl生成下一个sheet的XML时，上一个sheet已在后台压缩
+- 从已有xlsx复制未修改的成员时直接复制压缩数据，不解压再压缩（XML补丁路径）
+
+成员按添加顺序写入；压缩结果先写入超过8MB即溢出到磁盘的临时缓冲，排队中的成员数有上限，内存占用与文件大小无关
+"""
+import os
+import shutil
+import struct
+import tempfile
+import time
+import uuid
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import PurePosixPath
+from typing import BinaryIO, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+
+COMPRESS_LEVEL_ENV_VAR = "XLSX_COMPRESS_LEVEL"
+COMPRESS_THREADS_ENV_VAR = "XLSX_COMPRESS_THREADS"
+STORE_MEDIA_ENV_VAR = "XLSX_STORE_MEDIA"
+
+# 默认与zipfile相同的级别6，输出大小与openpyxl原生保存一致；对保存耗时敏感的部署可设为1
+# （见bench_save.py：40MB的sheet XML，级别1压缩约0.2秒、级别6约1.1秒，文件约大25%）
+DEFAULT_COMPRESS_LEVEL = 6
+DEFAULT_COMPRESS_THREADS = 4
+
+# 本身已压缩的格式，deflate几乎不能再减小体积
+STORED_SUFFIXES = {
+    ".png", ".jpg", ".jpeg", ".gif", ".wdp", ".webp", ".mp3", ".mp4", ".m4a",
+    ".zip", ".xlsx", ".xlsm", ".docx", ".pptx"
+}
+
+_CHUNK_SIZE = 1024 * 1024
+# 小于该大小的成员在调用线程中直接压缩（线程调度的开销大于压缩本身）
+_INLINE_LIMIT = 256 * 1024
+# 单个成员的压缩结果在内存中缓冲的上限，超过后溢出到临时文件
+_SPOOL_LIMIT = 8 * 1024 * 1024
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_ZIP64_END_RECORD = struct.Struct("<IQHHIIQQQQ")
+_ZIP64_LOCATOR = struct.Struct("<IIQI")
+_MAX_32 = 0xFFFFFFFF
+_FLAG_UTF8 = 0x800
+_ZIP64_VERSION = 45
+_DEFAULT_VERSION = 20
+# 与zipfile一致：非Windows上以Unix作为创建系统，新成员权限为0600
+_CREATE_SYSTEM = 0 if os.name == "nt" else 3
+_DEFAULT_ATTR = 0o600 << 16
+
+
+class ZipWriteOptions(NamedTuple):
+    """输出写入选项"""
+    compress_level: int = DEFAULT_COMPRESS_LEVEL
+    threads: int = DEFAULT_COMPRESS_THREADS
+    store_media: bool = True
+
+
+def write_options_from_env() -> ZipWriteOptions:
+    """按环境变量构建写入选项（未设置时使用默认值）"""
+    return ZipWriteOptions(
+        compress_level=min(9, max(0, int(os.environ.get(COMPRESS_LEVEL_ENV_VAR, DEFAULT_COMPRESS_LEVEL)))),
+        threads=max(1, int(os.environ.get(COMPRESS_THREADS_ENV_VAR, DEFAULT_COMPRESS_THREADS))),
+        store_media=os.environ.get(STORE_MEDIA_ENV_VAR, "1").lower() not in ("0", "false", "no")
+    )
+
+
+class _Entry(NamedTuple):
+    """压缩完成、等待写入的成员"""
+    name: str
+    method: int
+    crc: int
+    compress_size: int
+    file_size: int
+    date_time: Tuple[int, ...]
+    external_attr: int
+    data: BinaryIO
+    # 数据在data中的起始位置（-1表示从当前位置读取，读完后关闭data）
+    data_offset: int = -1
+
+
+def _dos_time(date_time: Tuple[int, ...]) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = date_time[:6]
+    return hour << 11 | minute << 5 | second // 2, max(0, year - 1980) << 9 | month << 5 | day
+
+
+def _compress(chunks: Iterable[bytes], method: int, level: int) -> Tuple[int, int, int, BinaryIO]:
+    """
+    压缩数据块
+
+    Returns:
+        (CRC32, 原始大小, 压缩后大小, 定位到开头的压缩数据)
+    """
+    buffer = tempfile.SpooledTemporaryFile(_SPOOL_LIMIT)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if method == zipfile.ZIP_DEFLATED else None
+    crc = size = 0
+    for chunk in chunks:
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+        buffer.write(compressor.compress(chunk) if compressor else chunk)
+    if compressor:
+        buffer.write(compressor.flush())
+    compress_size = buffer.tell()
+    buffer.seek(0)
+    return crc, size, compress_size, buffer
+
+
+def _read_chunks(file_path: str) -> Iterable[bytes]:
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            yield chunk
+
+
+def _compress_file(file_path: str, method: int, level: int) -> Tuple[int, int, int, BinaryIO]:
+    """压缩write()保留的文件副本，完成后删除副本"""
+    try:
+        return _compress(_read_chunks(file_path), method, level)
+    finally:
+        os.remove(file_path)
+
+
+class _MemberStream:
+    """open()返回的可写成员：写入时在调用线程中流式压缩，关闭后按添加顺序排队写入"""
+
+    def __init__(self, writer: "XlsxZipWriter", name: str, date_time: Tuple[int, ...], external_attr: int):
+        self._writer = writer
+        self._name = name
+        self._date_time = date_time
+        self._external_attr = external_attr
+        self._method = writer.method_for(name)
+        self._compressor = (
+            zlib.compressobj(writer.options.compress_level, zlib.DEFLATED, -15)
+            if self._method == zipfile.ZIP_DEFLATED else None
+        )
+        self._buffer = tempfile.SpooledTemporaryFile(_SPOOL_LIMIT)
+        self._crc = 0
+        self._size = 0
+        self._closed = False
+
+    def write(self, data: bytes) -> int:
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        self._buffer.write(self._compressor.compress(data) if self._compressor else data)
+        return len(data)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._compressor:
+            self._buffer.write(self._compressor.flush())
+        compress_size = self._buffer.tell()
+        self._buffer.seek(0)
+        self._writer._enqueue_done(_Entry(
+            self._name, self._method, self._crc, compress_size, self._size,
+            self._date_time, self._external_attr, self._buffer
+        ))
+
+    def __enter__(self) -> "_MemberStream":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._closed = True
+            self._buffer.close()
+
+
+class XlsxZipWriter:
+    """
+    按ZipWriteOptions写入xlsx（zip）包
+
+    可直接传给openpyxl的ExcelWriter；也可用copy_member从已有包中原样复制成员、
+    用open流式写入单个成员。超过ZIP64限制的成员和包自动使用ZIP64格式
+    """
+
+    def __init__(self, file_path: str, options: Optional[ZipWriteOptions] = None):
+        self.options = options or write_options_from_env()
+        self._file = open(file_path, "wb")
+        self._names: List[str] = []
+        self._pending: Deque[Future] = deque()
+        self._central: List[bytes] = []
+        self._sources: Dict[str, BinaryIO] = {}
+        # write()保留的文件副本，压缩后删除；abort时删除尚未压缩的副本
+        self._kept_files: List[str] = []
+        self._executor = ThreadPoolExecutor(self.options.threads) if self.options.threads > 1 else None
+        self._window = max(2, self.options.threads * 2)
+
+    # ---- ZipFile兼容接口（openpyxl使用） ----
+
+    def namelist(self) -> List[str]:
+        return list(self._names)
+
+    def writestr(self, name: Union[str, zipfile.ZipInfo], data: Union[bytes, str]):
+        """写入内存中的成员数据"""
+        name, date_time, external_attr = self._member_info(name)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        job = partial(_compress, (data,), self.method_for(name), self.options.compress_level)
+        self._submit(name, date_time, external_attr, job, len(data))
+
+    def write(self, filename: str, arcname: Optional[str] = None):
+        """
+        写入磁盘上的文件
+
+        openpyxl写完sheet XML后会立即删除临时文件，这里先建立硬链接（跨文件系统时复制）保留一份，
+        在后台压缩完成后删除
+        """
+        name, date_time, external_attr = self._member_info(arcname or os.path.basename(filename))
+        kept = f"{filename}.{uuid.uuid4().hex}.zip-member"
+        try:
+            os.link(filename, kept)
+        except OSError:
+            shutil.copyfile(filename, kept)
+        self._kept_files.append(kept)
+        job = partial(_compress_file, kept, self.method_for(name), self.options.compress_level)
+        self._submit(name, date_time, external_attr, job, os.path.getsize(kept))
+
+    def close(self):
+        """写出所有排队的成员和zip目录"""
+        if self._file.closed:
+            return
+        try:
+            while self._pending:
+                self._write_entry(self._pending.popleft().result())
+            self._write_central_directory()
+        finally:
+            self._shutdown()
+
+    # ---- 扩展接口 ----
+
+    def open(self, name: Union[str, zipfile.ZipInfo]) -> _MemberStream:
+        """以流的方式写入一个成员（在调用线程中压缩），关闭流后成员才加入包中"""
+        name, date_time, external_attr = self._member_info(name)
+        self._names.append(name)
+        return _MemberStream(self, name, date_time, external_attr)
+
+    def copy_member(self, archive: zipfile.ZipFile, info: zipfile.ZipInfo):
+        """从已有zip包中原样复制成员的压缩数据（不解压、不重新压缩）"""
+        source = self._sources.get(archive.filename)
+        if source is None:
+            source = self._sources[archive.filename] = open(archive.filename, "rb")
+        source.seek(info.header_offset)
+        header = _LOCAL_HEADER.unpack(source.read(_LOCAL_HEADER.size))
+        data_offset = info.header_offset + _LOCAL_HEADER.size + header[9] + header[10]
+        self._names.append(info.filename)
+        self._enqueue_done(_Entry(
+            info.filename, info.compress_type, info.CRC, info.compress_size, info.file_size,
+            info.date_time, info.external_attr, source, data_offset
+        ))
+
+    def method_for(self, name: str) -> int:
+        """成员的压缩方式：级别为0或已压缩的媒体时存储，其余deflate"""
+        if self.options.compress_level == 0:
+            return zipfile.ZIP_STORED
+        if self.options.store_media and PurePosixPath(name).suffix.lower() in STORED_SUFFIXES:
+            return zipfile.ZIP_STORED
+        return zipfile.ZIP_DEFLATED
+
+    def abort(self):
+        """放弃写入（已排队的压缩任务取消，输出文件由调用方删除）"""
+        for future in self._pending:
+            future.cancel()
+        self._shutdown()
+        # 已完成的压缩结果关闭临时缓冲，被取消的任务没有删除其文件副本
+        for future in self._pending:
+            if not future.cancelled() and future.exception() is None:
+                entry = future.result()
+                if entry.data_offset < 0:
+                    entry.data.close()
+        self._pending.clear()
+        for kept in self._kept_files:
+            if os.path.exists(kept):
+                os.remove(kept)
+        self._kept_files.clear()
+
+    def __enter__(self) -> "XlsxZipWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    # ---- 内部实现 ----
+
+    def _member_info(self, name: Union[str, zipfile.ZipInfo]) -> Tuple[str, Tuple[int, ...], int]:
+        if isinstance(name, zipfile.ZipInfo):
+            return name.filename, name.date_time, name.external_attr or _DEFAULT_ATTR
+        return name, time.localtime()[:6], _DEFAULT_ATTR
+
+    def _submit(self, name: str, date_time: Tuple[int, ...], external_attr: int, job: Callable, size: int):
+        self._names.append(name)
+
+        def finish(result: Tuple[int, int, int, BinaryIO]) -> _Entry:
+            crc, file_size, compress_size, data = result
+            return _Entry(name, self.method_for(name), crc, compress_size, file_size, date_time, external_attr, data)
+
+        if self._executor is None or size < _INLINE_LIMIT:
+            self._enqueue_done(finish(job()))
+        else:
+            self._enqueue(self._executor.submit(lambda: finish(job())))
+
+    def _enqueue_done(self, entry: _Entry):
+        future: Future = Future()
+        future.set_result(entry)
+        self._enqueue(future)
+
+    def _enqueue(self, future: Future):
+        """按添加顺序写出已完成的成员；排队过多时等待最早的成员，限制缓冲的压缩结果数量"""
+        self._pending.append(future)
+        while self._pending and (self._pending[0].done() or len(self._pending) > self._window):
+            self._write_entry(self._pending.popleft().result())
+
+    def _write_entry(self, entry: _Entry):
+        offset = self._file.tell()
+        encoded_name = entry.name.encode("utf-8")
+        flags = _FLAG_UTF8 if not entry.name.isascii() else 0
+        dos_time, dos_date = _dos_time(entry.date_time)
+
+        zip64 = max(entry.file_size, entry.compress_size) >= zipfile.ZIP64_LIMIT
+        version = _ZIP64_VERSION if zip64 else _DEFAULT_VERSION
+        local_extra = struct.pack("<HHQQ", 1, 16, entry.file_size, entry.compress_size) if zip64 else b""
+        self._file.write(_LOCAL_HEADER.pack(
+            0x04034B50, version, flags, entry.method, dos_time, dos_date, entry.crc,
+            _MAX_32 if zip64 else entry.compress_size, _MAX_32 if zip64 else entry.file_size,
+            len(encoded_name), len(local_extra)
+        ))
+        self._file.write(encoded_name)
+        self._file.write(local_extra)
+
+        if entry.data_offset >= 0:
+            entry.data.seek(entry.data_offset)
+        remaining = entry.compress_size
+        while remaining:
+            chunk = entry.data.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise IOError(f"成员 {entry.name} 的数据不完整")
+            self._file.write(chunk)
+            remaining -= len(chunk)
+        if entry.data_offset < 0:
+            entry.data.close()
+
+        # 目录中大小或偏移超过32位时，三者都放入ZIP64扩展字段
+        central_zip64 = zip64 or offset >= zipfile.ZIP64_LIMIT
+        central_extra = (
+            struct.pack("<HHQQQ", 1, 24, entry.file_size, entry.compress_size, offset) if central_zip64 else b""
+        )
+        version = _ZIP64_VERSION if central_zip64 else _DEFAULT_VERSION
+        self._central.append(_CENTRAL_HEADER.pack(
+            0x02014B50, _CREATE_SYSTEM << 8 | version, version, flags, entry.method, dos_time, dos_date, entry.crc,
+            _MAX_32 if central_zip64 else entry.compress_size, _MAX_32 if central_zip64 else entry.file_size,
+            len(encoded_name), len(central_extra), 0, 0, 0, entry.external_attr,
+            _MAX_32 if central_zip64 else offset
+        ) + encoded_name + central_extra)
+
+    def _write_central_directory(self):
+        start = self._file.tell()
+        for record in self._central:
+            self._file.write(record)
+        size = self._file.tell() - start
+        count = len(self._central)
+
+        if count >= 0xFFFF or start >= zipfile.ZIP64_LIMIT or size >= zipfile.ZIP64_LIMIT:
+            zip64_end = self._file.tell()
+            self._file.write(_ZIP64_END_RECORD.pack(
+                0x06064B50, _ZIP64_END_RECORD.size - 12, _ZIP64_VERSION, _ZIP64_VERSION, 0, 0, count, count, size, start
+            ))
+            self._file.write(_ZIP64_LOCATOR.pack(0x07064B50, 0, zip64_end, 1))
+            count, size, start = min(count, 0xFFFF), min(size, _MAX_32), min(start, _MAX_32)
+        self._file.write(_END_RECORD.pack(0x06054B50, 0, 0, count, count, size, start, 0))
+
+    def _shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        for source in self._sources.values():
+            source.close()
+        self._sources.clear()
+        self._file.close()
+
+
+def save_workbook(workbook, output_path: str, options: Optional[ZipWriteOptions] = None):
+    """
+    保存openpyxl工作簿（替代wb.save）
+
+    按写入选项压缩；先写临时文件再替换，保存失败时不破坏已有的同名输出
+
+    Args:
+        workbook: openpyxl工作簿
+        output_path: 输出xlsx路径
+        options: 写入选项，默认按环境变量
+    """
+    from openpyxl.writer.excel import ExcelWriter
+
+    if workbook.read_only:
+        raise TypeError("Workbook is read-only")
+    if workbook.write_only and not workbook.worksheets:
+        workbook.create_sheet()
+    workbook.properties.modified = datetime.now(tz=timezone.utc).replace(tzinfo=None)
+
+    temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with XlsxZipWriter(temp_path, options) as archive:
+            ExcelWriter(workbook, archive).write_data()
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+任务Worker
+从SQLite任务队列领取任务（analyze / apply / agent_turn）并执行，可启动多个进程水平扩展
+
+用法：
+  python worker.py --db ./temp/jobs.db --workers 4
+  JOB_QUEUE_DB=./temp/jobs.db streamlit run app.py
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict
+
+from utils.async_runtime import get_background_loop
+from utils.job_queue import JOB_QUEUE_ENV_VAR, JobQueue
+from utils.workbook_cache import workbook_cache_scope
+
+
+def _run_analyze(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from utils.excel_analyzer import analyze_excel_file
+
+    return analyze_excel_file(
+        payload["file_path"],
+        payload.get("sheet_name"),
+        payload.get("preview_rows", 100)
+    )
+
+
+def _run_apply(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from tools.color_scale_tool import apply_color_scale
+    from utils.tool_result import from_compact
+
+    return from_compact(get_background_loop().run(apply_color_scale(**payload)))
+
+
+def _run_agent_turn(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from agent_manager import ExcelColorAgent, extract_tool_calls
+
+    history = payload.get("messages") or []
+    agent = ExcelColorAgent(
+        model_id=payload["model_id"],
+        system_prompt=payload["system_prompt"],
+        selected_tools=payload["selected_tools"],
+        scale_type=payload["scale_type"],
+        color_scheme=payload["color_scheme"],
+        max_tokens=payload["max_tokens"],
+        messages=list(history),
+        session_id=(payload.get("invocation_state") or {}).get("session_id")
+    )
+    invocation_state = payload.get("invocation_state") or {}
+    with workbook_cache_scope(invocation_state):
+        _, messages = get_background_loop().run(
+            agent.invoke(payload["prompt"], invocation_state=invocation_state)
+        )
+
+    # 只取本轮新增的消息
+    new_messages = messages[len(history):]
+    text = ""
+    for msg in new_messages:
+        if msg.get("role") == "assistant":
+            text += "".join(block["text"] for block in msg.get("content", []) if "text" in block)
+
+    return {
+        "text": text,
+        "tool_calls": extract_tool_calls(new_messages),
+        "messages": messages
+    }
+
+
+def _keep_lease(queue: JobQueue, job_id: str, worker_id: str, stop: threading.Event):
+    """任务执行期间定期续约，避免执行时间超过租约的任务被其他Worker重复执行"""
+    interval = max(queue.lease_seconds / 3, 1.0)
+    while not stop.wait(interval):
+        if not queue.renew(job_id, worker_id):
+            print(f"⚠️ 任务 {job_id[:8]} 的租约已失效（已被重新领取或已结束）")
+            return
+
+
+JOB_HANDLERS = {
+    "analyze": _run_analyze,
+    "apply": _run_apply,
+    "agent_turn": _run_agent_turn
+}
+
+
+def run_worker(db_path: str, poll_interval: float = 1.0):
+    """
+    Worker主循环：领取任务、执行、写回结果
+
+    Args:
+        db_path: 任务队列数据库路径
+        poll_interval: 队列为空时的轮询间隔（秒）
+    """
+    queue = JobQueue(db_path)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    print(f"Worker {worker_id} 已启动，队列: {db_path}")
+
+    while True:
+        job = queue.claim(worker_id)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        started = time.time()
+        stop_renewal = threading.Event()
+        renewal = threading.Thread(target=_keep_lease, args=(queue, job["id"], worker_id, stop_renewal), daemon=True)
+        renewal.start()
+        try:
+            result = JOB_HANDLERS[job["kind"]](job["payload"])
+            if queue.complete(job["id"], worker_id, result):
+                print(f"✓ {job['kind']} {job['id'][:8]} 完成，用时 {time.time() - started:.1f}s")
+            else:
+                print(f"⚠️ 任务 {job['id'][:8]} 已不属于本Worker，结果已丢弃")
+        except Exception as e:
+            queue.fail(job["id"], worker_id, f"{type(e).__name__}: {e}")
+            print(f"✗ {job['kind']} {job['id'][:8]} 失败: {e}")
+        finally:
+            stop_renewal.set()
+            renewal.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Excel色阶处理Agent任务Worker')
+    parser.add_argument('--db', default=os.environ.get(JOB_QUEUE_ENV_VAR, './temp/jobs.db'), help='任务队列SQLite数据库路径')
+    parser.add_argument('--workers', type=int, default=2, help='Worker进程数量')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='队列为空时的轮询间隔（秒）')
+    args = parser.parse_args()
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(args.db, args.poll_interval), daemon=True)
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("\n正在停止Worker...")
+
+
+if __name__ == '__main__':
+    main()